@@ -17,28 +17,92 @@ v0.3b - Fixed incorrect map call
 IDE used: VSCode with enviroment set and controlled by Anaconda
 """
 import sys
-import pyodbc
+from startup_profile import ImportTimer
+
+# Installed first, so that all imports below are timed with --profile-startup
+STARTUP_TIMER = ImportTimer.from_argv(sys.argv)
+
 import sqlite3
 import os
-import base64
 import csv
-import docx
-from docx.enum.section import WD_ORIENT
-from SPARQLWrapper import SPARQLWrapper, JSON
-import numpy as np
-import html
 import datetime
 
-from PyQt5.QtWebEngineWidgets import QWebEngineView
+from itu_cache import prepare_cache, open_cache
+from itu_extract import ItuRepository, ItuSnapshot, load_country_codes, country_codes_registry
+from map_html import (cached_stations_map_html, wizard_map_html, wizard_entry_payload, json_for_script, file_base64,
+                      publish_map_page)
+from map_resources import LOCAL_MAP_URLS, portable_html, register_map_scheme
 
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QDesktopWidget, QWidget, QPushButton, QFileDialog, QLabel,
-                             QMessageBox, QGridLayout, QGroupBox, QDialog, QTableWidget, QTableWidgetItem, QCheckBox,
+                             QMessageBox, QGridLayout, QGroupBox, QDialog, QCheckBox,
                              QHBoxLayout, QProgressDialog, QProgressBar, QListWidget, QSpacerItem, QSizePolicy, 
-                             QListWidgetItem, QStackedLayout, QInputDialog, QAbstractItemView)
+                             QListWidgetItem, QStackedLayout, QInputDialog, QAbstractItemView, QTableView)
 
 from PyQt5.QtGui import QIcon, QPixmap, QDesktopServices, QPainter, QColor
 
-from PyQt5.QtCore import Qt, QParallelAnimationGroup, QPropertyAnimation, QRect, QEventLoop, QEasingCurve, QUrl, QTimer, QRectF
+from PyQt5.QtCore import (Qt, QParallelAnimationGroup, QPropertyAnimation, QRect, QEventLoop, QEasingCurve, QUrl, QTimer, QRectF,
+                          QObject, QRunnable, QThreadPool, pyqtSignal, QAbstractTableModel, QModelIndex,
+                          QSortFilterProxyModel)
+
+
+def new_web_view():
+    """
+    Create a QWebEngineView. QtWebEngine starts Chromium, so it is only imported once
+    the first map is shown (this needs Qt.AA_ShareOpenGLContexts, set before QApplication).
+    Map pages are published with map_html.publish_map_page and loaded from its URL; the pages,
+    their scripts, styles and tiles are served by the handler of map_scheme.py.
+    """
+    from PyQt5.QtWebEngineWidgets import QWebEngineView
+    from map_scheme import install_map_scheme
+
+    install_map_scheme()
+    return QWebEngineView()
+
+
+class OperationCancelled(Exception):
+    pass
+
+
+class WorkerSignals(QObject):
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+
+class Worker(QRunnable):
+    """
+    Runs job(progress) on a QThreadPool thread and reports through queued signals. The job
+    calls progress(done, total) regularly; after cancel() that call raises OperationCancelled,
+    so the job unwinds through its cleanup code instead of being killed.
+    """
+    def __init__(self, job):
+        super().__init__()
+        self.job = job
+        self.signals = WorkerSignals()
+        self.is_cancelled = False
+
+    def cancel(self):
+        self.is_cancelled = True
+
+    def report_progress(self, done, total):
+        if self.is_cancelled:
+            raise OperationCancelled()
+        self.signals.progress.emit(done, total)
+
+    def run(self):
+        try:
+            result = self.job(self.report_progress)
+        except OperationCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+        else:
+            if self.is_cancelled:
+                self.signals.cancelled.emit()
+            else:
+                self.signals.finished.emit(result)
+
 
 class MainApp(QMainWindow):
     """
@@ -49,7 +113,9 @@ class MainApp(QMainWindow):
         """Initialize the main application window."""
         super().__init__()
         self.dbConnection = None
+        self.itu_repository = None
         self.interactive_database = None
+        self.workers = set()
         self.desired_width = 1280
         self.desired_height = 720
         self.initUI()
@@ -142,6 +208,13 @@ class MainApp(QMainWindow):
         self.button_export_SQLite.setToolTip('Connect ITU database first.')
         gridLayoutExport.addWidget(self.button_export_SQLite, 0, 2)
 
+        self.button_export_all = QPushButton(
+            'Export all data in all formats', self)
+        self.button_export_all.clicked.connect(self.save_all)
+        self.button_export_all.setEnabled(False)
+        self.button_export_all.setToolTip('Connect ITU database first.')
+        gridLayoutExport.addWidget(self.button_export_all, 1, 0, 1, 3)
+
         self.exportToolsGroup.setLayout(gridLayoutExport)
 
         # Create a group box for IAU CPS Database tools
@@ -216,7 +289,7 @@ class MainApp(QMainWindow):
         # Selecting database callback
         options = QFileDialog.Options()
         self.database_file_name, _ = QFileDialog.getOpenFileName(
-            self, "Select ITU Database File", "", "MDB Files (*.mdb)", options=options)
+            self, "Select ITU Database File", "", "MDB Files (*.mdb);;ITU database cache (*.sqlite)", options=options)
         if self.database_file_name:
             self.statusBar().showMessage(
                 f'    Database file selected: {self.database_file_name}')
@@ -239,23 +312,43 @@ class MainApp(QMainWindow):
             self.button_export_SQLite.setEnabled(False)
             self.button_export_SQLite.setToolTip('Select a database first.')
 
+            self.button_export_all.setEnabled(False)
+            self.button_export_all.setToolTip('Select a database first.')
+
     def database_connect(self):
-        # Attempt to connect to the selected database
+        # Attempt to connect to the selected database. Hashing the file and, on first use,
+        # importing it into the local cache run in the background
         try:
-            connectionString = f'DRIVER={{Microsoft Access Driver (*.mdb, *.accdb)}};DBQ={self.database_file_name}'
-            try:
-                self.dbConnection.close() # type: ignore
-            except:
-                pass
+            self.dbConnection.close() # type: ignore
+        except:
+            pass
+        self.dbConnection = self.itu_repository = None
+        self.statusBar().showMessage('    Looking up local cache of the database...')
+        database_file_name = self.database_file_name
+
+        def import_database(progress):
+            return prepare_cache(database_file_name, progress=lambda done, total, table: progress(done, total))
+
+        def report_error(message):
+            QMessageBox.critical(self, "Database Connection Error",
+                                 f"An error occurred while connecting to the database:\n{message}")
+            self.database_connection_failed()
+
+        def report_cancelled():
+            self.statusBar().showMessage('    Database import cancelled')
+            self.button_show_list.setToolTip('Connect a database first.')
 
-            self.dbConnection = pyodbc.connect(connectionString)
+        self.run_in_background(import_database, "Importing...", "Importing table {done} of {total} into the local cache",
+                               self.database_connected, report_error, report_cancelled)
+
+    def database_connected(self, cache_path):
+        try:
+            self.dbConnection, self.itu_cache_path = open_cache(cache_path), cache_path
+            self.itu_repository = ItuRepository(self.dbConnection)
             self.updateStatusLight(
                 self.statusLight_connect, True, 'Database connected')
             self.statusBar().showMessage('    Database connected. Checking version...')
-            SQL = "SELECT d_create, comment FROM srs_ooak"
-            rows = self.parse_database(SQL)[0]
-            self.database_date = rows[0]
-            self.database_version = rows[1][0:7]
+            self.database_date, self.database_version = self.itu_repository.version()
             self.statusBar().showMessage(
                 f'Connected to database {self.database_version} published on {self.database_date.date()}')
             self.button_show_list.setEnabled(True)
@@ -269,13 +362,61 @@ class MainApp(QMainWindow):
             
             self.button_export_SQLite.setEnabled(True)
             self.button_export_SQLite.setToolTip(None)
+
+            self.button_export_all.setEnabled(True)
+            self.button_export_all.setToolTip(None)
         except Exception as e:
             QMessageBox.critical(self, "Database Connection Error",
                                  f"An error occurred while connecting to the database:\n{e}")
-            self.updateStatusLight(
-                self.statusLight_connect, True, 'Database connection error')
-            self.statusBar().showMessage('    Database connection error')
-            self.button_show_list.setToolTip('Connect a database first.')
+            self.database_connection_failed()
+
+    def database_connection_failed(self):
+        self.updateStatusLight(
+            self.statusLight_connect, True, 'Database connection error')
+        self.statusBar().showMessage('    Database connection error')
+        self.button_show_list.setToolTip('Connect a database first.')
+
+    def run_in_background(self, job, title, progress_text, on_finished=None, on_failed=None, on_cancelled=None):
+        """
+        Run job(progress) on the thread pool behind a progress dialog whose Cancel button stops it.
+        The dialog has no parent, so it stays usable while this window is disabled (e.g. while
+        browsing the interactive database).
+        """
+        worker = Worker(job)
+        progressDialog = QProgressDialog("Operation in progress...", "Cancel", 0, 0)
+        progressDialog.setWindowTitle(title)
+        progressDialog.setWindowModality(Qt.NonModal)
+        progressDialog.setMinimumDuration(500)
+        progressDialog.setAutoReset(False)
+        progressDialog.canceled.connect(worker.cancel)
+
+        def report_progress(done, total):
+            progressDialog.setMaximum(total)
+            progressDialog.setLabelText(progress_text.format(done=done, total=total))
+            progressDialog.setValue(done)
+
+        def done(callback, *args):
+            progressDialog.close()
+            progressDialog.deleteLater()
+            self.workers.discard(worker)
+            if callback:
+                callback(*args)
+
+        worker.signals.progress.connect(report_progress)
+        worker.signals.finished.connect(lambda result: done(on_finished, result))
+        worker.signals.failed.connect(lambda message: done(on_failed, message))
+        worker.signals.cancelled.connect(lambda: done(on_cancelled))
+        self.workers.add(worker)
+        QThreadPool.globalInstance().start(worker)
+        return worker
+
+    def load_snapshot(self):
+        """Extract the RAS tables through a connection of the calling thread (for workers)."""
+        connection = open_cache(self.itu_cache_path)
+        try:
+            return ItuSnapshot(connection)
+        finally:
+            connection.close()
 
     def interactive_database_show(self):
         self.animateClosing(self)
@@ -283,26 +424,42 @@ class MainApp(QMainWindow):
         self.setEnabled(False)
         self.interactive_database = InteractiveDatabase(self)
 
-    def parse_database(self, SQL):
+    def iter_database(self, SQL, parameters=()):
+        """Stream the rows of a query one by one instead of fetching them all at once."""
+        if self.itu_repository:
+            yield from self.itu_repository.iter_rows('query', SQL, parameters)
+
+    def parse_database(self, SQL, parameters=()):
         """Parse the database and display results in a new window and save to a Word document."""
         rows = []
-        if self.dbConnection:
-            try:
-                cursor = self.dbConnection.cursor()
-                cursor.execute(SQL)
-                rows = cursor.fetchall()
-                cursor.close()
-            except Exception as e:
-                QMessageBox.critical(self,
-                                     "Database Error", f"Error parsing database: {e}")
+        try:
+            rows = list(self.iter_database(SQL, parameters))
+        except Exception as e:
+            QMessageBox.critical(self,
+                                 "Database Error", f"Error parsing database: {e}")
         return rows
 
+    def query_database(self, query, *args, default=None):
+        """
+        Run a query of the ITU repository, e.g. query_database('get_beams', ntc_id),
+        reporting errors like parse_database and returning default instead.
+        """
+        try:
+            if self.itu_repository:
+                return getattr(self.itu_repository, query)(*args)
+        except Exception as e:
+            QMessageBox.critical(self,
+                                 "Database Error", f"Error parsing database: {e}")
+        return default
+
     def show_about(self):
         # Show about window.
         aboutDialog = AboutDialog(self)
         aboutDialog.exec_()
 
     def save_csv(self):
+        from ras_exporters import partial_output, write_full_csv
+
         filePath, _ = QFileDialog.getSaveFileName(
             self, "Save as CSV", f"RAS_DB_FULL_CSV_{self.database_version}_{self.database_date.date()}", "CSV Files (*.csv)")
         if filePath:
@@ -311,470 +468,51 @@ class MainApp(QMainWindow):
                     self, "Error", "This file is an important app file and cannot be overwritten.")
                 return
 
-            SQL = 'SELECT ntc_id, adm, ctry, stn_name, long_dec, lat_dec FROM com_el WHERE ntc_type=\'R\' ORDER BY adm asc, stn_name asc;'
-            com_el_rows = self.parse_database(SQL)
-            station_number = len(com_el_rows)
-
-            fields = ['Notice ID', 'Administration', 'Region/Location', 'Station name',
-                      'Longitude', 'Latitude', 'Longitude Degrees',
-                      'Longitude East/West', 'Longitude minutes', 'Longitude seconds',
-                      'Latitude Degrees', 'Latitude North/South', 'Latitude minutes',
-                      'Latitude seconds', 'Elevation minimum', 'Elevation maximum',
-                      'Azimuth from', 'Azimuth to', 'Beam name', 'Antenna pattern ID',
-                      'Antenna pattern Name', 'Centre frequency, MHz',
-                      'Group ID', 'Noise Temp, K', 'Frequency minimum, MHz',
-                      'Frequency maximum, MHz', 'Date brought into use', 'Date received',
-                      'IFIC no (wic_no)', 'Date updated', 'VLBI Support code']
-
-            with open(filePath, 'w', newline='') as file:
-                csv_writer = csv.writer(file, delimiter=',')
-                csv_writer.writerow(fields)
-                for index in range(0, station_number):
-                    ntc_id = com_el_rows[index][0]
-                    SQL = 'SELECT long_deg, long_ew, long_min, long_sec, lat_deg, lat_ns, lat_min, lat_sec, elev_min, elev_max, azm_fr, azm_to FROM e_stn WHERE ntc_id=' + \
-                        str(ntc_id)+';'
-                    e_stn_rows = self.parse_database(SQL)
-                    SQL = 'SELECT beam_name, pattern_id FROM e_ant WHERE ntc_id=' + \
-                        str(ntc_id)+';'
-                    e_ant_rows = self.parse_database(SQL)
-
-                    beam_number = len(e_ant_rows)
-                    beam_names = []
-                    ant_id = []
-                    ant_names = []
-
-                    for subindex_beam in range(0, beam_number):
-                        beam_names.append(e_ant_rows[subindex_beam][0])
-                        ant_id.append(e_ant_rows[subindex_beam][1])
-                        if ant_id[-1] == None:
-                            SQL = 'SELECT attch_e, ant_diam FROM e_ant WHERE ntc_id=' + \
-                                str(ntc_id)+';'
-                            local_ant_rows = self.parse_database(SQL)
-                            if local_ant_rows[subindex_beam][1] == None:
-                                ant_names.append('NonTypical, see attachment {} to the relevant IFIC for details.'.format(
-                                    local_ant_rows[subindex_beam][0]))
-                            else:
-                                ant_names.append('NonTypical, submitted diameter is {} meters, see attachment {} to the relevant IFIC for details.'.format(
-                                    local_ant_rows[subindex_beam][1], local_ant_rows[subindex_beam][0]))
-                        else:
-                            SQL = 'SELECT pattern FROM ant_type WHERE pattern_id=' + \
-                                str(ant_id[-1])+';'
-                            ant_type_rows = self.parse_database(SQL)
-                            try:
-                                ant_names.append(ant_type_rows[0][0])
-                            except:
-                                SQL = 'SELECT attch_e, ant_diam FROM e_ant WHERE ntc_id=' + \
-                                    str(ntc_id)+';'
-                                local_ant_rows = self.parse_database(SQL)
-                                if local_ant_rows[subindex_beam][1] == None:
-                                    ant_names.append('NonTypical, see attachment {} to the relevant IFIC for details.'.format(
-                                        local_ant_rows[subindex_beam][0]))
-                                else:
-                                    ant_names.append('NonTypical, submitted diameter is {} meters, see attachment {} to the relevant IFIC for details.'.format(
-                                        local_ant_rows[subindex_beam][1], local_ant_rows[subindex_beam][0]))
-
-                        SQL = 'SELECT grp_id, noise_t, freq_min, freq_max, d_inuse, d_rcv, wic_no, d_upd, ra_stn_type FROM grp WHERE (ntc_id='+str(
-                            ntc_id)+'and beam_name=\''+beam_names[subindex_beam]+'\''+');'
-                        grp_rows = self.parse_database(SQL)
-
-                        SQL = 'SELECT freq_mhz FROM freq WHERE (ntc_id='+str(
-                            ntc_id)+'and beam_name=\''+beam_names[subindex_beam]+'\''+');'
-                        freq_rows = self.parse_database(SQL)
-
-                        group_number = len(grp_rows)
-
-                        for subindex_group in range(0, group_number):
-                            if subindex_beam == 0 and subindex_group == 0:
-                                next_line = list(com_el_rows[index])+list(e_stn_rows[0])+list([beam_names[subindex_beam]])+list([ant_id[subindex_beam]])+list(
-                                    [ant_names[subindex_beam]])+list([str(freq_rows[subindex_group][0])])+list(grp_rows[subindex_group])
-                                csv_writer.writerow(next_line)
-                            else:
-                                next_line = list([''])*18+list([beam_names[subindex_beam]])+list([ant_id[subindex_beam]])+list(
-                                    [ant_names[subindex_beam]])+list([str(freq_rows[subindex_group][0])])+list(grp_rows[subindex_group])
-                                csv_writer.writerow(next_line)
+            def export(progress):
+                snapshot = self.load_snapshot()
+                with partial_output(filePath) as partial_path, open(partial_path, 'w', newline='') as file:
+                    write_full_csv(snapshot, csv.writer(file, delimiter=','), progress)
+
+            self.run_in_background(
+                export, "Saving...", "Now writing station {done} of {total}",
+                on_failed=lambda message: QMessageBox.critical(
+                    self, "CSV saving Error", f"An error occurred while preparing the csv file:\n{message}"))
 
     def save_word(self):
+        from ras_exporters import annex_jobs, partial_output, write_station_annex
+
         filePath, _ = QFileDialog.getSaveFileName(
             self, "Save as DOCX", f"RAS_DB_FULL_DOCX_{self.database_version}_{self.database_date.date()}", "Word Files (*.docx)")
         if filePath:
-            doc = docx.Document()
-            section = doc.sections[0]
-            section = doc.sections[0]
-            section.orientation = WD_ORIENT.PORTRAIT
-            doc.add_heading(
-                "Annex 1. The list of radio astronomy stations known to the IAU CPS", level=1)
-            doc.add_paragraph("This list is based on ITU-R IFIC database.")
-
-            SQL = 'SELECT ntc_id, adm, ctry, stn_name, long_dec, lat_dec FROM com_el WHERE ntc_type=\'R\' ORDER BY adm asc, stn_name asc;'
-            com_el_rows = self.parse_database(SQL)
-            station_number = len(com_el_rows)
-
-            progressDialog = QProgressDialog(
-                "Operation in progress...", "Cancel", 0, station_number, self)
-            progressDialog.setWindowTitle("Saving...")
-            progressDialog.setWindowModality(Qt.WindowModal)
-            progressDialog.setCancelButton(None)
-            progressDialog.show()
-                   
             country_codes_to_names=self.load_country_codes()
 
-            for index, row in enumerate(com_el_rows):
-                progressDialog.setLabelText(
-                    f"Now populating station {index+1} of {station_number}")
-                ntc_id = row[0]
-                try:
-                    admin_name = country_codes_to_names[row[1]]
-                except:
-                    admin_name = 'Unknown'
-                try:
-                    country_name = country_codes_to_names[row[2]]
-                except:
-                    country_name = 'Unknown'
-                station_name = row[3]
-                station_longitude = com_el_rows[index][4]
-                station_latitude = com_el_rows[index][5]
-
-                SQL = f'SELECT elev_min, ant_alt FROM e_stn WHERE ntc_id={ntc_id};'
-                e_stn_rows = self.parse_database(SQL)
-
-                station_min_elevation = e_stn_rows[0][0]
-                if station_min_elevation == None:
-                    station_min_elevation = 'N/A'
-                    
-                station_antenna_altitude = e_stn_rows[0][1]
-                if station_antenna_altitude == None:
-                    station_antenna_altitude = 'N/A'
-
-                SQL = 'SELECT beam_name, ant_diam, gain FROM e_ant WHERE ntc_id=' + \
-                    str(ntc_id)+';'
-                e_ant_rows = self.parse_database(SQL)
-
-                beam_number = len(e_ant_rows)
-
-                beam_names = []
-                noise_temp = []
-                ant_diameter = []
-                ant_gain = []
-                freq_min = []
-                freq_max = []
-                vlbi_type = []                
-
-                for subindex_beam in range(0, beam_number):
-                    beam_names.append(e_ant_rows[subindex_beam][0])
-                    if e_ant_rows[subindex_beam][1] == None:
-                        ant_diameter.append('N/A')
-                    else:
-                        ant_diameter.append(e_ant_rows[subindex_beam][1])
-
-                    if e_ant_rows[subindex_beam][2] == None:
-                        ant_gain.append('N/A')
-                    else:
-                        ant_gain.append(e_ant_rows[subindex_beam][2])
+            def export(progress):
+                snapshot = self.load_snapshot()
+                with partial_output(filePath) as partial_path:
+                    write_station_annex(snapshot, country_codes_to_names, partial_path, progress, annex_jobs())
 
-                    SQL = f"SELECT noise_t, freq_min, freq_max, ra_stn_type FROM grp WHERE (ntc_id={ntc_id} and beam_name='{beam_names[subindex_beam]}');"
-                    grp_rows = self.parse_database(SQL)
-                    
-                    for group_index, group in enumerate(grp_rows):
-                        noise_temp.append(grp_rows[group_index][0])
-                        freq_min.append(grp_rows[group_index][1])
-                        freq_max.append(grp_rows[group_index][2])
-                        vlbi_type.append(grp_rows[group_index][3])
-
-                station_freq_min = min(freq_min)
-                station_freq_max = max(freq_max)
-
-                # Flushing all gathered data to the document
-                doc.add_heading(f'Station "{station_name}"', level=2)
-                doc.add_heading('Overview', level=3)
-                doc.add_paragraph(f'Station number: {index+1}')
-                doc.add_paragraph(
-                    f'Responsible administration: "{admin_name}"')
-                doc.add_paragraph(f'Country/region location: "{country_name}"')
-                doc.add_paragraph(f'Station short name: "{station_name}')
-                doc.add_paragraph('Station long: name "N/A"')
-                doc.add_paragraph('Station type: "N/A"')
-                doc.add_paragraph(
-                    f'Station longitude [deg]: "{station_longitude}"')
-                doc.add_paragraph(
-                    f'Station latitude [deg]: "{station_latitude}"')
-                doc.add_paragraph(f'Station altitude (AMSL) "{station_antenna_altitude}"')
-                doc.add_paragraph(
-                    f'Minimum elevation [deg]: "{station_min_elevation}"')
-                doc.add_paragraph('Operational "N/A"')
-                doc.add_paragraph('Used for science "N/A"')
-                doc.add_paragraph(
-                    f'Minimum Station Frequency [MHz]: "{station_freq_min} MHz"')
-                doc.add_paragraph(
-                    f'Maximum Station Frequency [MHz]: "{station_freq_max} MHz"')
-                doc.add_paragraph('Contact (website) "N/A"')
-                doc.add_paragraph('Contact (address) "N/A"')
-                doc.add_paragraph('Contact (phone) "N/A"')
-                doc.add_paragraph('Contact (e-mail) "N/A"')
-
-                doc.add_heading('Antenna information', level=3)
-
-                for beam_index in range(0, beam_number):
-                    doc.add_heading(f'Antenna #{beam_index+1}', level=4)
-                    doc.add_paragraph('Feed/Rx height above ground [m] "N/A"')
-                    doc.add_paragraph(
-                        f'Noise temparature [K]: "{noise_temp[beam_index]}"')
-                    doc.add_paragraph(
-                        f'Antenna diameter [m]: "{ant_diameter[beam_index]}"')
-                    doc.add_paragraph(
-                        f'Maximum antenna gain [dBi]: "{ant_gain[beam_index]}"')
-                    doc.add_paragraph(
-                        f'Minimim antenna frequency [MHz]: "{freq_min[beam_index]}"')
-                    doc.add_paragraph(
-                        f'Maximum antenna frequency [MHz]: "{freq_max[beam_index]}"')
-                    doc.add_paragraph('Cryocooled: "N/A"')
-                    doc.add_paragraph('Supports RAS mode continuum: "N/A"')
-                    doc.add_paragraph('Supports RAS mode spectroscopy: "N/A"')
-                    
-                    # 'S' stands for single dish and 'V' for VLBI
-                    if(vlbi_type[beam_index]=='V'):
-                        doc.add_paragraph('Supports RAS mode VLBI: "Yes"')
-                    elif(vlbi_type[beam_index]=='S'):
-                        doc.add_paragraph('Supports RAS mode VLBI: "No"')
-                    else:                        
-                        doc.add_paragraph('Supports RAS mode VLBI: "N/A"')
-
-                doc.add_page_break()
-                progressDialog.setValue(index+1)
-                
+            self.run_in_background(
+                export, "Saving...", "Now populating station {done} of {total}",
+                on_failed=lambda message: QMessageBox.critical(
+                    self, "Docx saving Error", f"An error occurred while preparing the docx file:\n{message}"))
 
-            try:
-                doc.save(filePath)
-            except Exception as e:
-                QMessageBox.critical(self, "Docx saving Error",
-                                     f"An error occurred while preparing the docx file:\n{e}")
-            progressDialog.close()
     def save_DB(self):
-        def create_database(filePath):
-            if os.path.exists(filePath):
-                os.remove(filePath)
-            conn = sqlite3.connect(filePath, timeout=90)
-            cursor = conn.cursor()
-            # SQL commands to create tables
-            create_table_stations = """
-            CREATE TABLE "Stations" (
-                "CPS Station ID"	INTEGER NOT NULL UNIQUE,
-                "Country"	TEXT,
-                "Short Name"	TEXT NOT NULL,
-                "Long Name"	TEXT,
-                "Type"	TEXT CHECK("Type" IN ('single dish', 'array', 'mixed', 'unknown')),
-                "Station longitude [deg]"	NUMERIC,
-                "Station latitude [deg]"	NUMERIC,
-                "Station altitude (amsl) [m]"	NUMERIC,
-                "Operational"	INTEGER,
-                "Used for science"	INTEGER,
-                "Min station frequency [MHz]"	NUMERIC,
-                "Max station frequency [MHz]"	NUMERIC,
-                "Contact / Website"	TEXT,
-                "Contact / Address"	TEXT,
-                "Contact / Phone"	TEXT,
-                "Contact / Email"	TEXT,
-                "Registered at ITU"	INTEGER,
-                "ITU Notice ID"	INTEGER,
-                "ITU responsible Administration"	TEXT,
-                PRIMARY KEY("CPS Station ID" AUTOINCREMENT)
-            );
-            """
-            cursor.execute(create_table_stations)
-            create_table_antennas = """
-            CREATE TABLE "Antennas" (
-            	"CPS Station ID"	INTEGER,
-            	"CPS Antenna ID"	INTEGER NOT NULL UNIQUE,
-            	"Antenna longitude [deg]"	NUMERIC,
-            	"Antenna latitude [deg]"	NUMERIC,
-            	"Antenna altitude (WGS84) [m]"	NUMERIC,
-            	"Antenna altitude (amsl) [m]"	NUMERIC,
-            	"Feed/Rx height above ground [m]"	NUMERIC,
-            	"Antenna diameter [m]"	NUMERIC,
-            	"Minimum elevation [deg]"	NUMERIC,
-            	"Minimum frequency [MHz]"	NUMERIC,
-            	"Maximum frequency [MHz]"	NUMERIC,
-            	FOREIGN KEY("CPS Station ID") REFERENCES "Stations"("CPS Station ID"),
-            	PRIMARY KEY("CPS Antenna ID" AUTOINCREMENT)
-            );
-            """
-            cursor.execute(create_table_antennas)
-            create_table_frequency_bands = """
-            CREATE TABLE "Frequency_Bands" (
-            	"CPS Station ID"	INTEGER,
-            	"CPS Antenna ID"	INTEGER,
-            	"CPS Band ID"	INTEGER NOT NULL UNIQUE,
-            	"Band start [MHz]"	NUMERIC,
-            	"Band stop [MHz]"	NUMERIC,
-            	"Antenna eff. Area [m^2]"	NUMERIC,
-            	"Cryo-cooled"	INTEGER,
-            	"Polarisation"	TEXT,
-            	"Supports RAS mode continuum"	INTEGER,
-            	"Supports RAS mode spectroscopy"	INTEGER,
-            	"Supports RAS mode VLBI"	INTEGER,
-            	"Noise temperature [K]"	NUMERIC,
-            	FOREIGN KEY("CPS Station ID") REFERENCES "Stations"("CPS Station ID"),
-            	FOREIGN KEY("CPS Antenna ID") REFERENCES "Antennas",
-            	PRIMARY KEY("CPS Band ID" AUTOINCREMENT)
-            );
-            """
-            cursor.execute(create_table_frequency_bands)
-            create_table_wikidata="""
-            CREATE TABLE IF NOT EXISTS wikidata (
-                "CPS Wiki ID" INTEGER,
-                Name TEXT,
-                Country TEXT,
-                "Station longitude [deg]"	NUMERIC,
-                "Station latitude [deg]"	NUMERIC,  
-                source TEXT,              
-                "Linked ITU" INTEGER,
-            	PRIMARY KEY("CPS Wiki ID")
-            );
-            """            
-            cursor.execute(create_table_wikidata)
-            return conn, cursor
-        
-        def process_stations(cursor_ITU, cursor_CPS, country_codes_to_names):
-            """
-            Processes each station from the ITU database and inserts it into the CPS database.
-            """
-            cursor_ITU.execute('SELECT ntc_id, adm, ctry, stn_name, long_dec, lat_dec FROM com_el WHERE ntc_type=\'R\' ORDER BY adm asc, stn_name asc;')
-            com_el_rows = cursor_ITU.fetchall()
-            station_number=len(com_el_rows)
-            progressDialog = QProgressDialog(
-                "Operation in progress...", "Cancel", 0, station_number, self)
-            progressDialog.setWindowTitle("Saving...")
-            progressDialog.setWindowModality(Qt.WindowModal)
-            progressDialog.setCancelButton(None)
-            progressDialog.show()           
-            
-
-            for index, row in enumerate(com_el_rows):
-                country_name = country_codes_to_names.get(row[2], 'Unknown')
-                progressDialog.setLabelText(
-                    f"Now populating station {index+1} of {station_number}")
-                cursor_CPS.execute('''
-                    INSERT INTO stations ("ITU Notice ID", "ITU responsible Administration", "Country", "Short name",
-                                          "Station longitude [deg]", "Station latitude [deg]", "Registered at ITU")
-                    VALUES (?, ?, ?, ?, ?, ?, 1);
-                ''', (row[0], row[1], country_name, row[3], row[4], row[5]))
-                cps_station_id = cursor_CPS.lastrowid
-                process_antennas(cursor_ITU, cursor_CPS, row[0], cps_station_id, row[4], row[5])
-                progressDialog.setValue(index+1)
-                
-            progressDialog.close()
-            
-        def process_antennas(cursor_ITU, cursor_CPS, ntc_id, cps_station_id, long_dec, lat_dec):
-            """
-            Retrieves antenna data related to the station and processes frequency bands for each antenna.
-            """
-            cursor_ITU.execute(f"SELECT beam_name, ant_diam FROM e_ant WHERE ntc_id={ntc_id};")
-            e_ant_rows = cursor_ITU.fetchall()
-
-            cursor_ITU.execute(f"SELECT elev_min FROM e_stn WHERE ntc_id={ntc_id};")
-            elev_min_result = cursor_ITU.fetchone()
-            elev_min = elev_min_result[0] if elev_min_result else None
-
-            frequency_ranges = []
-
-            for beam_name, ant_diam in e_ant_rows:
-                cursor_CPS.execute('''
-                    INSERT INTO antennas ("CPS Station ID", "Antenna diameter [m]", "Minimum elevation [deg]", "Antenna longitude [deg]", "Antenna latitude [deg]")
-                    VALUES (?, ?, ?, ?, ?);
-                ''', (cps_station_id, ant_diam, elev_min, long_dec, lat_dec))
-                cps_antenna_id = cursor_CPS.lastrowid
-                freqs = process_frequency_bands(cursor_ITU, cursor_CPS, ntc_id, beam_name, cps_antenna_id, cps_station_id)
-                frequency_ranges.extend(freqs)        
-                min_freq = min(freqs)
-                max_freq = max(freqs)
-                cursor_CPS.execute('''
-                    UPDATE antennas SET "Minimum frequency [MHz]" = ?, "Maximum frequency [MHz]" = ?
-                    WHERE "CPS Antenna ID" = ?;
-                ''', (min_freq, max_freq, cps_antenna_id))
+        from ras_exporters import partial_output, write_cps_database
 
-            
-            min_freq = min(frequency_ranges)
-            max_freq = max(frequency_ranges)
-            cursor_CPS.execute('UPDATE stations SET "Min station frequency [MHz]" = ?, "Max station frequency [MHz]" = ? WHERE "CPS Station ID" = ?;', (min_freq, max_freq, cps_station_id))
-                
-
-        def process_frequency_bands(cursor_ITU, cursor_CPS, ntc_id, beam_name, cps_antenna_id, cps_station_id):
-            """
-            Processes frequency bands for each antenna and inserts them into the CPS database.
-            """
-            cursor_ITU.execute(f"SELECT freq_min, freq_max, ra_stn_type, noise_t FROM grp WHERE ntc_id={ntc_id} AND beam_name='{beam_name}';")
-            grp_rows = cursor_ITU.fetchall()
-
-            frequency_ranges = []
-
-            for freq_min, freq_max, ra_stn_type, noise_t in grp_rows:
-                vlbi_key = 1 if ra_stn_type == 'V' else 0
-                cursor_CPS.execute('''
-                    INSERT INTO Frequency_Bands ("CPS Station ID", "CPS Antenna ID", "Band start [MHz]", "Band stop [MHz]", "Supports RAS mode VLBI", "Noise temperature [K]")
-                    VALUES (?, ?, ?, ?, ?, ?);
-                ''', (cps_station_id, cps_antenna_id, freq_min, freq_max, vlbi_key, noise_t))
-                frequency_ranges.append(freq_min)
-                frequency_ranges.append(freq_max)
-
-            return frequency_ranges
-
-        def add_wiki_data(cursor_CPS):
-            sparql_query = """
-            SELECT ?item ?itemLabel ?countryLabel ?coordinate_location WHERE {
-            VALUES ?val {
-                wd:Q184356
-                wd:Q349772
-            }
-            ?item wdt:P31 ?val.
-            SERVICE wikibase:label { bd:serviceParam wikibase:language "[AUTO_LANGUAGE],en,es,ja,ru". }
-            OPTIONAL { ?item wdt:P625 ?coordinate_location. }
-            OPTIONAL { ?item wdt:P17 ?country. }
-            }
-            ORDER BY (?itemLabel)
-            LIMIT 1000
-            """
-
-            # Set up the SPARQL endpoint
-            sparql = SPARQLWrapper("https://query.wikidata.org/sparql")
-            sparql.addCustomHttpHeader('User-Agent', 'IAU_CPS_RAS_DB_APP/1.0 (ras.database@cps.iau.org)')
-            sparql.setQuery(sparql_query)
-            sparql.setReturnFormat(JSON)
-
-            results = sparql.query().convert()
-            data = results["results"]["bindings"] # type: ignore
-            insert_query = """
-            INSERT INTO wikidata (Name, Country, "Station longitude [deg]", "Station latitude [deg]", source)
-            VALUES (?, ?, ?, ?, ?)
-            """
-            for item in data:
-                name = item.get("itemLabel", {}).get("value", "") # type: ignore
-                country = item.get("countryLabel", {}).get("value", "") # type: ignore
-                coordinates = item.get("coordinate_location", {}).get("value", "") # type: ignore
-                if coordinates:
-                    longitude, latitude = coordinates.strip('Point()').split()
-                else:
-                    longitude, latitude = None, None
-                source = item.get("item", {}).get("value", "") # type: ignore
-                # push processed data to populate the wikidata DB
-                cursor_CPS.execute(insert_query, (name, country, longitude, latitude, source))
-                
-
-                
         filePath, _ = QFileDialog.getSaveFileName(
             self, "Save as SQLite", f"CPS_RAS_DB_FULL_SQLite_{self.database_version}_{self.database_date.date()}", 
             "SQLite Database Files (*.db)")
         if filePath:
             if not filePath.endswith('.db'):
                 filePath += '.db'
-            try:
-                conn, cursor = create_database(filePath)
-                country_codes_to_names=self.load_country_codes()
-                
-                process_stations(self.dbConnection.cursor(), cursor, country_codes_to_names) # type: ignore
-                add_wiki_data(cursor)
-                
-                conn.commit()
-                conn.close()
+            country_codes_to_names=self.load_country_codes()
 
+            def export(progress):
+                snapshot = self.load_snapshot()
+                with partial_output(filePath) as partial_path:
+                    write_cps_database(snapshot, country_codes_to_names, partial_path, progress)
+
+            def offer_site_link_wizard(result):
                 # Asking the user if they want to run the Site Link Wizard
                 reply = QMessageBox.question(self, 'Run Site Link Wizard',
                                             'Would you like to run Site Link Wizard?',
@@ -784,10 +522,38 @@ class MainApp(QMainWindow):
                     self.showMinimized()
                     self.setEnabled(False)
                     self.interactive_database = SiteLinkWizard(filePath, self)
-            except Exception as e:
-                QMessageBox.critical(self, "DB saving Error",
-                                     f"An error occurred while preparing the db file:\n{e}")  
-            
+
+            self.run_in_background(
+                export, "Saving...", "Now populating station {done} of {total}", offer_site_link_wizard,
+                lambda message: QMessageBox.critical(
+                    self, "DB saving Error", f"An error occurred while preparing the db file:\n{message}"))
+
+    def save_all(self):
+        """CSV, DOCX and SQLite exports of one extraction, written concurrently into a chosen folder."""
+        from ras_exporters import annex_jobs, export_all
+
+        out_dir = QFileDialog.getExistingDirectory(self, "Select folder for the CSV, DOCX and SQLite exports")
+        if out_dir:
+            country_codes_to_names = self.load_country_codes()
+            suffix = f'{self.database_version}_{self.database_date.date()}'
+
+            def export(progress):
+                snapshot = self.load_snapshot()
+                # Progress of each format, reported as one total
+                reported = {}
+
+                def report(name, done, total):
+                    reported[name] = (done, total)
+                    progress(sum(done for done, _ in reported.values()), sum(total for _, total in reported.values()))
+
+                return export_all(snapshot, country_codes_to_names, out_dir, suffix, progress=report, jobs=annex_jobs())
+
+            self.run_in_background(
+                export, "Saving...", "Now writing station records {done} of {total}",
+                lambda written: self.statusBar().showMessage(f'    Exported {", ".join(written.values())}'),
+                lambda message: QMessageBox.critical(
+                    self, "Export Error", f"An error occurred while preparing the exports:\n{message}"))
+
     def run_site_link_wizard(self):
         options = QFileDialog.Options()
         filePath, _ = QFileDialog.getOpenFileName(self, "Select CPS Database File", "", "SQLite Files (*.db);;All Files (*)", options=options)
@@ -804,15 +570,8 @@ class MainApp(QMainWindow):
         establish a link between ITU country codes and country names
         https://www.itu.int/en/ITU-R/terrestrial/fmd/Pages/geo_area_list.aspx 
         """
-        country_codes_to_names = {}
-        if filepath is None:
-            filepath = 'geographical-areas.csv'
-        with open(filepath, newline='') as csvfile:
-            reader = csv.reader(csvfile)
-            for row in reader:
-                country_codes_to_names[row[0]] = row[1]
-        return country_codes_to_names
-    
+        return load_country_codes(filepath)
+
     def updateStatusLight(self, widget, status, status_text):
         # Update the status light color based on whether connection was successfully established
         if status:
@@ -996,6 +755,11 @@ class MainApp(QMainWindow):
         # Check if the database connection is active and close it before exiting
         self.animateClosing(self)
 
+        # Stop running exports, their partial files are removed as they unwind
+        for worker in list(self.workers):
+            worker.cancel()
+        QThreadPool.globalInstance().waitForDone()
+
         if self.dbConnection:
             try:
                 self.dbConnection.close()
@@ -1074,11 +838,9 @@ class InteractiveDatabase(QMainWindow):
         self.setCentralWidget(centralWidget)
         layout = QGridLayout(centralWidget)
 
-        self.tableWidget = QTableWidget()
         headers = ["ITU Notice ID", "ITU Administration code", "ITU Country code        ", "Station Name",
                    "Provision", "Date received", "Longitude", "Latitude"]
-        self.tableWidget.setColumnCount(len(headers))
-        self.tableWidget.setHorizontalHeaderLabels(headers)
+        self.tableWidget = DataTableView(headers)
         self.tableWidget.setSortingEnabled(True)
         self.load_data()
         self.tableWidget.cellDoubleClicked.connect(
@@ -1130,90 +892,44 @@ class InteractiveDatabase(QMainWindow):
         self.activateWindow()
 
     def load_data(self):
-        SQL = "SELECT ntc_id, adm, ctry, stn_name, prov, d_rcv, long_dec, lat_dec FROM com_el WHERE ntc_type='R' ORDER BY adm asc, stn_name asc;"
-        self.rows = self.parent.parse_database(SQL) # type: ignore
-
-        self.tableWidget.setRowCount(len(self.rows))
-        for row_num, row_data in enumerate(self.rows):
-            for column_num, data in enumerate(row_data):
-                if column_num == 5:
-                    data = data.strftime("%Y-%m-%d")
-                item = QTableWidgetItem(str(data))
-                item.setFlags(item.flags() & ~Qt.ItemIsEditable)
-                self.tableWidget.setItem(row_num, column_num, item)
+        from station_dataset import StationDataset
+
+        self.rows = self.parent.query_database('ras_notices', default=[]) # type: ignore
+        self.stations = StationDataset.from_rows(self.rows, name=3, administration=1, country=2, latitude=7, longitude=6)
+
+        self.tableWidget.tableModel.setColumnFormat(
+            5, lambda data: data.strftime("%Y-%m-%d") if data is not None else str(data))
+        self.tableWidget.setRows(self.rows)
 
         self.tableWidget.resizeColumnsToContents()
         self.tableWidget.setSelectionBehavior(QAbstractItemView.SelectRows)
 
     def updateTableDisplay(self):
         displayNames = self.displayNamesCheckbox.isChecked()
+
+        def name_of(code):
+            return self.country_codes.get(code, "Unknown")
+
+        model = self.tableWidget.tableModel
         if displayNames:
-            self.tableWidget.horizontalHeaderItem(
-                1).setText("ITU Administration name")
-            self.tableWidget.horizontalHeaderItem(
-                2).setText("ITU Country name")
+            model.setColumnFormat(1, name_of, header="ITU Administration name")
+            model.setColumnFormat(2, name_of, header="ITU Country name")
             self.statusBar().showMessage(
                 '    View switched to administration and country name view')
         else:
-            self.tableWidget.horizontalHeaderItem(
-                1).setText("ITU Administration code")
-            self.tableWidget.horizontalHeaderItem(
-                2).setText("ITU Country code")
+            # Codes are shown as they are, with the name as tooltip
+            model.setColumnFormat(1, str, name_of, header="ITU Administration code")
+            model.setColumnFormat(2, str, name_of, header="ITU Country code")
             self.statusBar().showMessage(
                 '    View switched to administration and country code view')
-        for row_num, row_data in enumerate(self.rows):
-            admin_code = row_data[1]
-            admin_name = self.country_codes.get(admin_code, "Unknown")
-            display_text = admin_name if displayNames else admin_code
-            item = QTableWidgetItem(display_text)
-            item.setFlags(item.flags() & ~Qt.ItemIsEditable)
-
-            tooltip_text = admin_name if not displayNames else None
-            item.setToolTip(tooltip_text)
-            self.tableWidget.setItem(row_num, 1, item)
-
-            country_code = row_data[2]
-            country_name = self.country_codes.get(country_code, "Unknown")
-            display_text = country_name if displayNames else country_code
-            item = QTableWidgetItem(display_text)
-            item.setFlags(item.flags() & ~Qt.ItemIsEditable)
-
-            tooltip_text = country_name if not displayNames else None
-            item.setToolTip(tooltip_text)
-
-            self.tableWidget.setItem(row_num, 2, item)
 
     def showStationsOnMap(self):
-        station_data = []
-
-        for row in range(self.tableWidget.rowCount()):
-            raw_adm_info = self.tableWidget.item(row, 1).text()
-            raw_country_info = self.tableWidget.item(row, 2).text()
-            station_name = self.tableWidget.item(row, 3).text()
-            longitude = self.tableWidget.item(row, 6).text()
-            latitude = self.tableWidget.item(row, 7).text()
-
-            if self.displayNamesCheckbox.isChecked():
-                code = [key for key, value in self.country_codes.items()
-                        if value == raw_adm_info]
-                administration_info = f"{raw_adm_info} ({code[0]})" if code else raw_adm_info
-                code = [key for key, value in self.country_codes.items()
-                        if value == raw_country_info]
-                country_info = f"{raw_country_info} ({code[0]})" if code else raw_country_info
-            else:
-                administration_name = self.country_codes.get(
-                    raw_adm_info, "Unknown Country")
-                administration_info = f"{administration_name} ({raw_adm_info})"
-                country_name = self.country_codes.get(
-                    raw_country_info, "Unknown Country")
-                country_info = f"{country_name} ({raw_country_info})"
+        country_codes = country_codes_registry()
 
-            try:
-                station_data.append((station_name, administration_info, country_info, float(
-                    latitude), float(longitude)))
-            except:
-                station_data.append((station_name, administration_info, country_info, (
-                    latitude), (longitude)))
+        def label_of(code):
+            return f"{country_codes.name_of(code, 'Unknown Country')} ({code})"
+
+        station_data = self.stations.map_stations(label_of, label_of)
 
         self.parent.animateClosing(self) # type: ignore
         self.showMinimized()
@@ -1221,11 +937,8 @@ class InteractiveDatabase(QMainWindow):
         self.mapWindow = MapWindow(station_data, parent=self)
 
     def openDatabaseEntryDetails(self, row, column):
-        ntc_id_item = self.tableWidget.item(row, 0)
-        station_name_item = self.tableWidget.item(row, 3)
-
-        ntc_id = ntc_id_item.text() if ntc_id_item else "Unknown"
-        station_name = station_name_item.text() if station_name_item else "Unknown"
+        ntc_id = self.tableWidget.text(row, 0) or "Unknown"
+        station_name = self.tableWidget.text(row, 3) or "Unknown"
 
         self.parent.animateClosing(self) # type: ignore
         self.showMinimized()
@@ -1243,12 +956,11 @@ class InteractiveDatabase(QMainWindow):
             try:
                 with open(filePath, 'w', newline='', encoding='utf-8-sig') as file:
                     writer = csv.writer(file)
-                    headers = [self.tableWidget.horizontalHeaderItem(
-                        i).text() for i in range(self.tableWidget.columnCount())]
+                    headers = [self.tableWidget.headerText(
+                        i) for i in range(self.tableWidget.columnCount())]
                     writer.writerow(headers)
                     for row in range(self.tableWidget.rowCount()):
-                        rowData = [self.tableWidget.item(row, i).text() if self.tableWidget.item(
-                            row, i) else '' for i in range(self.tableWidget.columnCount())]
+                        rowData = [self.tableWidget.text(row, i) for i in range(self.tableWidget.columnCount())]
                         writer.writerow(rowData)
             except Exception as e:
                 QMessageBox.critical(self, "CSV saving Error",
@@ -1258,6 +970,9 @@ class InteractiveDatabase(QMainWindow):
         filePath, _ = QFileDialog.getSaveFileName(
             self, "Save as DOCX", f"RAS_DB_OVERVIEW_DOCX_{self.parent.database_version}_{self.parent.database_date.date()}", "Word Files (*.docx)") # type: ignore
         if filePath:
+            import docx
+            from docx.enum.section import WD_ORIENT
+
             doc = docx.Document()
             section = doc.sections[0]
             section.orientation = WD_ORIENT.LANDSCAPE
@@ -1270,15 +985,12 @@ class InteractiveDatabase(QMainWindow):
             header_cells = table.rows[0].cells
 
             for column in range(self.tableWidget.columnCount()):
-                header = self.tableWidget.horizontalHeaderItem(column)
-                if header:
-                    header_cells[column].text = header.text()
+                header_cells[column].text = self.tableWidget.headerText(column)
 
             for row in range(self.tableWidget.rowCount()):
                 row_cells = table.add_row().cells
                 for col in range(self.tableWidget.columnCount()):
-                    item = self.tableWidget.item(row, col)
-                    row_cells[col].text = item.text() if item else ""
+                    row_cells[col].text = self.tableWidget.text(row, col)
 
             try:
                 doc.save(filePath)
@@ -1373,7 +1085,7 @@ class MapWindow(QMainWindow):
         self.mapLayout = QStackedLayout()
         self.mapPanel.setLayout(self.mapLayout)
 
-        self.browser = QWebEngineView()
+        self.browser = new_web_view()
         self.loading_widget = LoadingWidget()
 
         self.mapLayout.addWidget(self.browser)
@@ -1406,160 +1118,21 @@ class MapWindow(QMainWindow):
         self.activateWindow()
 
         if self.station_data is not None:
-            self.browser.setHtml(self.generateMapHTML(self.station_data))
+            self.browser.setUrl(QUrl(publish_map_page(self.generateMapHTML(self.station_data))))
 
     def onLoadFinished(self, ok):
         if ok:
             self.mapLayout.setCurrentWidget(self.browser)
 
     def generate_base64_icon(self, icon_path):
-        with open(icon_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
+        return file_base64(icon_path)
         
     def generateMapHTML(self, station_data):
         try:
             script_dir = os.path.dirname(os.path.abspath(__file__))
             icon_path = os.path.join(script_dir, 'ras_s_icon.webp').replace('\\', '/')
-            icon_base64 = self.generate_base64_icon(icon_path)
-
-            html_parts = []
-            html_parts.append(f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <title>Full Widget Leaflet Map for Radio Astronomy Stations Database Tool</title>
-                <meta charset="utf-8" />
-                <link 
-                    rel="stylesheet" 
-                    href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css"
-                />
-                <link
-                    rel="stylesheet"
-                    href="https://unpkg.com/leaflet.markercluster/dist/MarkerCluster.css"
-                />
-                <link
-                    rel="stylesheet"
-                    href="https://unpkg.com/leaflet.markercluster/dist/MarkerCluster.Default.css"
-                />
-                <script 
-                    src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js">
-                </script>
-                <script
-                    src="https://unpkg.com/leaflet.markercluster/dist/leaflet.markercluster.js">
-                </script>
-                <style>
-                    body {{
-                        padding: 0;
-                        margin: 0;
-                    }}
-                    html, body, #map {{
-                        height: 100%;
-                        width: 100%;
-                    }}
-                    .custom-cluster-icon {{
-                        background: radial-gradient(circle, white 25%, transparent 75%);
-                        border-radius: 50%;
-                        border: 2px solid rgba(0, 0, 0, 0.5);
-                        text-align: center;
-                        color: black;
-                        font-size: 14px;
-                        font-weight: bold;
-                        width: 40px;
-                        height: 40px;
-                    }}
-                    .custom-cluster-icon img {{
-                        position: absolute;
-                        top: 50%;
-                        left: 50%;
-                        transform: translate(-50%, -50%);
-                        width: 30px;
-                        height: 30px;
-                    }}
-                    .custom-cluster-icon .cluster-count {{
-                        position: absolute;
-                        top: -10px;
-                        right: -10px;
-                        background: red;
-                        color: white;
-                        border-radius: 50%;
-                        width: 20px;
-                        height: 20px;
-                        display: flex;
-                        justify-content: center;
-                        align-items: center;
-                        font-size: 12px;
-                    }}
-                </style>
-            </head>
-            <body>
-                <div id="map"></div>
-            
-                <script>
-                    var map = L.map('map', {{attributionControl: false}}).setView([0, 0], 2);
-                    var myAttrControl = L.control.attribution().addTo(map);
-                    myAttrControl.setPrefix('<a href="https://leafletjs.com/">Leaflet</a>');
-                    
-                    mapLink = 
-                        '<a href="http://openstreetmap.org">OpenStreetMap</a>';
-                    L.tileLayer(
-                        'http://{{s}}.tile.openstreetmap.org/{{z}}/{{x}}/{{y}}.png', {{
-                        attribution: 'Map data by &copy; <a href="http://www.openstreetmap.org/copyright">OpenStreetMap</a>, under <a href="https://opendatacommons.org/licenses/odbl/">ODbL.</a>',
-                        maxZoom: 18,
-                        }}).addTo(map);
-                    
-                    var customIcon = L.icon({{
-                        iconUrl: 'data:image/webp;base64,{icon_base64}',
-                        iconSize: [30, 30],
-                        iconAnchor: [15, 15],
-                        popupAnchor: [0, 0]
-                    }}); 
-
-                    var markers = L.markerClusterGroup({{
-                        maxClusterRadius: 50,
-                        iconCreateFunction: function(cluster) {{
-                            var childCount = cluster.getChildCount();
-                            return L.divIcon({{
-                                html: '<div><img src="data:image/webp;base64,{icon_base64}" alt="cluster-icon"/><div class="cluster-count">' + childCount + '</div></div>',
-                                className: 'custom-cluster-icon',
-                                iconSize: [40, 40]
-                            }});
-                        }}
-                    }});
-            """)
-
-            for name, adm, ctr, lat, lon in station_data:
-                adm_escaped = adm.replace("'", "&#39;").replace('"', '&quot;')
-                ctr_escaped = ctr.replace("'", "&#39;").replace('"', '&quot;')
-                if self.mode == "WIKIDATA":
-                    popup = (
-                        f"<b>{name}</b><br>"
-                        f"Geographical area: <b>{ctr_escaped}</b><br>"
-                        f'Wikidata source: '
-                        f'<a href="{adm_escaped}" target="_blank" '
-                        f'rel="noopener noreferrer">{adm_escaped}</a>'
-                    )
-                else:
-                    popup = (
-                        f"<b>{name}</b><br>"
-                        f"Region country code: <b>{ctr_escaped}</b><br>"
-                        f"Responsible administration: <b>{adm_escaped}</b>"
-                    )
-
-                html_parts.append(
-                    f"""var marker = L.marker([{lat}, {lon}], {{icon: customIcon}})
-                            .bindPopup('{popup}');
-                        markers.addLayer(marker);
-                    """
-                )
-
-            html_parts.append("""
-                    map.addLayer(markers);
-                </script>
-            </body>
-            </html>
-            """)
-
-            html = ''.join(html_parts)
+            # Pages of unchanged station sets come from the cache of map_html
+            html = cached_stations_map_html(station_data, self.mode, icon_path)
 
         except Exception as e:
             html = f"""
@@ -1586,8 +1159,9 @@ class MapWindow(QMainWindow):
             self, "Save HTML", f"RAS_DB_MAP_{self.parent.parent.database_version}_{self.parent.parent.database_date}", "HTML Files (*.html)") # type: ignore
         if filePath:
             def save_html(html):
+                # The saved page loads Leaflet and the tiles from the internet again
                 with open(filePath, "w", encoding='utf-8') as file:
-                    file.write(html)
+                    file.write(portable_html(html))
             self.browser.page().toHtml(save_html)
 
     def closeEvent(self, event):
@@ -1601,23 +1175,103 @@ class MapWindow(QMainWindow):
             self.parent.activateWindow()
             self.parent.setEnabled(True)
 
-class NumericSortItem(QTableWidgetItem):
-    def __init__(self, value):
-        super().__init__(str(value))
-        try:
-            self.value = float(value)
-        except ValueError:
-            self.value = None
-
-    def __lt__(self, other):
-        if isinstance(other, NumericSortItem):
-            if self.value is not None and other.value is not None:
-                return self.value < other.value
-            elif self.value is None:
-                return False
-            else:
-                return True
-        return super().__lt__(other)
+class ColumnTableModel(QAbstractTableModel):
+    """
+    Read-only table model keeping its data as one list per column. Cells are only formatted
+    in data(), i.e. for the rows a view actually shows, and changing how a column is displayed
+    is a single dataChanged signal instead of new items for every row.
+    """
+    SortRole = Qt.UserRole
+
+    def __init__(self, headers, formatter=str, parent=None):
+        super().__init__(parent)
+        self.headers = list(headers)
+        self.formatters = [formatter] * len(self.headers)
+        self.tooltips = [None] * len(self.headers)
+        self.columns = [[] for _ in self.headers]
+        self.row_count = 0
+
+    def setRows(self, rows):
+        rows = list(rows)
+        self.beginResetModel()
+        self.columns = [list(column) for column in zip(*rows)] if rows else [[] for _ in self.headers]
+        self.row_count = len(rows)
+        self.endResetModel()
+
+    def setColumnFormat(self, column, formatter, tooltip=None, header=None):
+        """Change the display (and tooltip) function of a column, optionally renaming it."""
+        self.formatters[column] = formatter
+        self.tooltips[column] = tooltip
+        if header is not None:
+            self.headers[column] = header
+            self.headerDataChanged.emit(Qt.Horizontal, column, column)
+        if self.row_count:
+            self.dataChanged.emit(self.index(0, column), self.index(self.row_count - 1, column))
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.row_count
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        column = index.column()
+        value = self.columns[column][index.row()]
+        if role == Qt.DisplayRole:
+            return self.formatters[column](value)
+        if role == self.SortRole:
+            # Numbers sort numerically, empty values (invalid variants) after everything else
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                return value
+            return None if value is None else self.formatters[column](value)
+        if role == Qt.ToolTipRole and self.tooltips[column]:
+            return self.tooltips[column](value)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.headers[section]
+        return super().headerData(section, orientation, role)
+
+
+class DataTableView(QTableView):
+    """
+    Sortable view over a ColumnTableModel (through a QSortFilterProxyModel), with the
+    row/column accessors of QTableWidget that the windows use. Rows are in display order.
+    """
+    cellDoubleClicked = pyqtSignal(int, int)
+
+    def __init__(self, headers, formatter=str, parent=None):
+        super().__init__(parent)
+        self.tableModel = ColumnTableModel(headers, formatter, self)
+        self.proxyModel = QSortFilterProxyModel(self)
+        self.proxyModel.setSourceModel(self.tableModel)
+        self.proxyModel.setSortRole(ColumnTableModel.SortRole)
+        self.setModel(self.proxyModel)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.doubleClicked.connect(lambda index: self.cellDoubleClicked.emit(index.row(), index.column()))
+
+    def setRows(self, rows):
+        self.tableModel.setRows(rows)
+
+    def rowCount(self):
+        return self.proxyModel.rowCount()
+
+    def columnCount(self):
+        return self.proxyModel.columnCount()
+
+    def text(self, row, column):
+        return self.proxyModel.index(row, column).data()
+
+    def headerText(self, column):
+        return self.tableModel.headers[column]
+
+
+def na_if_none(value):
+    return 'N/A' if value is None else str(value)
+
 
 class DatabaseEntryDetails(QMainWindow):
     def __init__(self, ntc_id=None, station_name=None, parent=None):
@@ -1645,12 +1299,10 @@ class DatabaseEntryDetails(QMainWindow):
 
         stationInfoPanel = QGroupBox('Station Information')
         self.stationInfoLayout = QGridLayout(stationInfoPanel)
-        self.stationInfoTable = QTableWidget()
         headers = ['Notice ID', 'Longitude (Degrees)', 'East/West', 'Minutes', 'Seconds', 'Latitude (Degrees)',
                    'North/South', 'Minutes', 'Seconds', 'Min elevation', 'Max elevation', 'Min azimuth', 'Max Azimuth',
                    'Antenna altitude, m']
-        self.stationInfoTable.setColumnCount(len(headers))
-        self.stationInfoTable.setHorizontalHeaderLabels(headers)
+        self.stationInfoTable = DataTableView(headers, na_if_none)
         self.stationInfoTable.setSortingEnabled(True)
 
         self.stationInfoLayout.addWidget(self.stationInfoTable)
@@ -1658,11 +1310,9 @@ class DatabaseEntryDetails(QMainWindow):
 
         self.beamInfoPanel = QGroupBox('Beams Information')
         self.beamInfoLayout = QGridLayout(self.beamInfoPanel)
-        self.beamInfoTable = QTableWidget()
         headers = ['Beam name', 'Antenna Code', 'Antenna diameter, m', 'Antenna gain, dBi',
                    'Noise temp, K', 'Frequency minimum, MHz', 'Frequency maximum, MHz', 'VLBI type', 'Centre frequency, MHz']
-        self.beamInfoTable.setColumnCount(len(headers))
-        self.beamInfoTable.setHorizontalHeaderLabels(headers)
+        self.beamInfoTable = DataTableView(headers, na_if_none)
         self.beamInfoTable.setSortingEnabled(True)
 
         self.beamInfoLayout.addWidget(self.beamInfoTable)
@@ -1688,14 +1338,14 @@ class DatabaseEntryDetails(QMainWindow):
         self.mapPanel = QGroupBox('Map Panel')
         self.mapLayout = QGridLayout(self.mapPanel)
 
-        self.browser = QWebEngineView()
+        self.browser = new_web_view()
 
         layout.addWidget(self.mapPanel, 2, 1, 1, 3)
 
         self.mapLayout.addWidget(self.browser, 0, 0)
 
         self.load_data()
-        self.browser.setHtml(self.generateMapHTML())
+        self.browser.setUrl(QUrl(publish_map_page(self.generateMapHTML())))
 
         layout.setRowStretch(0, 1)
         layout.setRowStretch(1, 4)
@@ -1707,81 +1357,43 @@ class DatabaseEntryDetails(QMainWindow):
         self.activateWindow()
 
     def load_data(self):
-        SQL = f"SELECT long_deg, long_ew, long_min, long_sec, lat_deg, lat_ns, lat_min, lat_sec, elev_min, elev_max, azm_fr, azm_to, ant_alt FROM e_stn WHERE ntc_id={str(self.ntc_id)};"
-        self.station_rows = self.parent.parent.parse_database(SQL)
-
-        self.stationInfoTable.setRowCount(len(self.station_rows))
-        for row_num, row_data in enumerate(self.station_rows):
-            item = QTableWidgetItem(str(self.ntc_id))
-            item.setFlags(item.flags() & ~Qt.ItemIsEditable)
-            self.stationInfoTable.setItem(row_num, 0, item)
-
-            for column_num, data in enumerate(row_data):
-                if data == None:
-                    data = 'N/A'
-                item = QTableWidgetItem(str(data))
-                item.setFlags(item.flags() & ~Qt.ItemIsEditable)
-                self.stationInfoTable.setItem(row_num, column_num+1, item)
+        database = self.parent.parent
+        self.station_rows = database.query_database('get_sites', self.ntc_id, default=[])
+
+        self.stationInfoTable.setRows((str(self.ntc_id),) + tuple(row_data) for row_data in self.station_rows)
 
         self.stationInfoTable.resizeColumnsToContents()
         self.stationInfoTable.setSelectionBehavior(QAbstractItemView.SelectRows)
 
 
-        SQL = f"SELECT beam_name, pattern_id, ant_diam, gain FROM e_ant WHERE ntc_id={str(self.ntc_id)};"
-        self.beam_rows = self.parent.parent.parse_database(SQL)
-
-        self.beamInfoTable.setRowCount(0)
-        for beam_index, beam_row_data in enumerate(self.beam_rows):
-            beam_name = beam_row_data[0]
-            SQL = f"SELECT noise_t, freq_min, freq_max, ra_stn_type FROM grp WHERE ntc_id={str(self.ntc_id)} AND beam_name='{beam_name}';"
-            self.grp_rows = self.parent.parent.parse_database(SQL)
+        self.beam_rows = database.query_database('get_beams', self.ntc_id, default=[])
 
-            SQL = f"SELECT freq_mhz FROM freq WHERE ntc_id={str(self.ntc_id)} AND beam_name='{beam_name}';"
-            self.freq_rows = self.parent.parent.parse_database(SQL)
+        beam_table_rows = []
+        for beam in self.beam_rows:
+            self.grp_rows = database.query_database('get_groups', self.ntc_id, beam.beam_name, default=[])
+            self.freq_rows = database.query_database('get_frequencies', self.ntc_id, beam.beam_name, default=[])
 
-            if not beam_row_data[1] == None:
-                SQL = f"SELECT pattern FROM ant_type WHERE pattern_id={beam_row_data[1]};"
-                try:
-                    antenna_code = self.parent.parent.parse_database(SQL)[0][0]
-                except:
-                    antenna_code = 'N/A'
-            else:
+            antenna_code = None
+            if beam.pattern_id is not None:
+                antenna_code = database.query_database('get_pattern', beam.pattern_id)
+            if antenna_code is None:
                 antenna_code = 'N/A'
 
-            for grp_index, grp_row_data in enumerate(self.grp_rows):
-                current_row_count = self.beamInfoTable.rowCount()
-                self.beamInfoTable.insertRow(current_row_count)
-                freq_row_data = self.freq_rows[grp_index][0]
-
-                combined_row_data = list(beam_row_data) + list(grp_row_data) + [freq_row_data]
-
-                for column_num, data in enumerate(combined_row_data):
-                    if data == None:
-                        data = 'N/A'
-                    if column_num == 1:
-                        data = antenna_code
-                    if column_num == 7:
-                        if data == 'S':
-                            data = 'Single'
-                        elif data == 'V':
-                            data = 'VLBI'
-                    if column_num in [2, 3, 4, 5, 6, 8]:
-                        item = NumericSortItem(data)
-                    else:
-                        item = QTableWidgetItem(str(data))
-                    item.setFlags(item.flags() & ~Qt.ItemIsEditable)
-                    self.beamInfoTable.setItem(current_row_count, column_num, item)
+            for grp_index, group in enumerate(self.grp_rows):
+                vlbi_type = {'S': 'Single', 'V': 'VLBI'}.get(group.ra_stn_type, group.ra_stn_type)
+                beam_table_rows.append([beam.beam_name, antenna_code, beam.ant_diam, beam.gain, group.noise_t,
+                                        group.freq_min, group.freq_max, vlbi_type, self.freq_rows[grp_index]])
 
+        self.beamInfoTable.setRows(beam_table_rows)
         self.beamInfoTable.resizeColumnsToContents()
         self.beamInfoTable.setSelectionBehavior(QAbstractItemView.SelectRows)
 
 
     def generateMapHTML(self):
-        SQL = f"SELECT adm, ctry, stn_name, long_dec, lat_dec FROM com_el WHERE ntc_id={str(self.ntc_id)};"
-        self.rows = self.parent.parent.parse_database(SQL)[0] # type: ignore
+        self.rows = self.parent.parent.query_database('get_station', self.ntc_id) # type: ignore
 
-        adm = self.rows[0]
-        ctr = self.rows[1]
+        adm = self.rows.adm
+        ctr = self.rows.ctry
 
         administration_name = self.parent.country_codes.get( # type: ignore
             adm, "Unknown Country")
@@ -1789,13 +1401,13 @@ class DatabaseEntryDetails(QMainWindow):
         country_name = self.parent.country_codes.get(ctr, "Unknown Country") # type: ignore
         ctr = f"{country_name} ({ctr})"
 
-        name = self.rows[2]
-        lon = float(self.rows[3])
-        lat = float(self.rows[4])
+        name = self.rows.stn_name
+        lon = float(self.rows.long_dec)
+        lat = float(self.rows.lat_dec)
 
         try:
             html_parts = []
-            html_parts.append("""
+            html_parts.append(f"""
             <!DOCTYPE html>
             <html>
             <head>
@@ -1803,20 +1415,20 @@ class DatabaseEntryDetails(QMainWindow):
                 <meta charset="utf-8" />
                 <link 
                     rel="stylesheet" 
-                    href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css"
+                    href="{LOCAL_MAP_URLS.leaflet_css}"
                 />
                 <script 
-                    src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js">
+                    src="{LOCAL_MAP_URLS.leaflet_js}">
                 </script>
                 <style>
-                    body {
+                    body {{
                         padding: 0;
                         margin: 0;
-                    }
-                    html, body, #map {
+                    }}
+                    html, body, #map {{
                         height: 100%;
                         width: 100%;
-                    }
+                    }}
                 </style>
             </head>
             <body>
@@ -1827,17 +1439,17 @@ class DatabaseEntryDetails(QMainWindow):
             html_parts.append(f"""
                     var map = L.map('map', {{attributionControl: false}}).setView([{lat}, {lon}], 5);
                     """)
-            html_parts.append("""
+            html_parts.append(f"""
                     var myAttrControl = L.control.attribution().addTo(map);
                     myAttrControl.setPrefix('<a href="https://leafletjs.com/">Leaflet</a>');
                     
                     mapLink = 
                         '<a href="http://openstreetmap.org">OpenStreetMap</a>';
                     L.tileLayer(
-                        'http://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
+                        '{LOCAL_MAP_URLS.tiles}', {{
                         attribution: 'Map data by &copy; <a href="http://www.openstreetmap.org/copyright">OpenStreetMap</a>, under <a href="https://opendatacommons.org/licenses/odbl/">ODbL.</a>',
                         maxZoom: 18,
-                        }).addTo(map);
+                        }}).addTo(map);
             """)
             adm_escaped = adm.replace("'", "&#39;").replace('"', '&quot;')
             ctr_escaped = ctr.replace("'", "&#39;").replace('"', '&quot;')
@@ -1880,22 +1492,20 @@ class DatabaseEntryDetails(QMainWindow):
                 with open(filePath, 'w', newline='', encoding='utf-8-sig') as file:
                     writer = csv.writer(file)
 
-                    headers = [self.stationInfoTable.horizontalHeaderItem(
-                        i).text() for i in range(self.stationInfoTable.columnCount())]
+                    headers = [self.stationInfoTable.headerText(
+                        i) for i in range(self.stationInfoTable.columnCount())]
                     writer.writerow(headers)
                     for row in range(self.stationInfoTable.rowCount()):
-                        rowData = [self.stationInfoTable.item(row, i).text() if self.stationInfoTable.item(
-                            row, i) else '' for i in range(self.stationInfoTable.columnCount())]
+                        rowData = [self.stationInfoTable.text(row, i) for i in range(self.stationInfoTable.columnCount())]
                         writer.writerow(rowData)
 
                     writer.writerow([])
 
-                    headers = [self.beamInfoTable.horizontalHeaderItem(
-                        i).text() for i in range(self.beamInfoTable.columnCount())]
+                    headers = [self.beamInfoTable.headerText(
+                        i) for i in range(self.beamInfoTable.columnCount())]
                     writer.writerow(headers)
                     for row in range(self.beamInfoTable.rowCount()):
-                        rowData = [self.beamInfoTable.item(row, i).text() if self.beamInfoTable.item(
-                            row, i) else '' for i in range(self.beamInfoTable.columnCount())]
+                        rowData = [self.beamInfoTable.text(row, i) for i in range(self.beamInfoTable.columnCount())]
                         writer.writerow(rowData)
             except Exception as e:
                 QMessageBox.critical(self, "CSV saving Error",
@@ -1905,6 +1515,9 @@ class DatabaseEntryDetails(QMainWindow):
         filePath, _ = QFileDialog.getSaveFileName(
             self, "Save as DOCX", f"RAS_DB_DOCX_{self.station_name}_{self.parent.parent.database_version}_{self.parent.parent.database_date.date()}", "Word Files (*.docx)") # type: ignore
         if filePath:
+            import docx
+            from docx.enum.section import WD_ORIENT
+
             doc = docx.Document()
             section = doc.sections[0]
             section.orientation = WD_ORIENT.LANDSCAPE
@@ -1913,21 +1526,20 @@ class DatabaseEntryDetails(QMainWindow):
             doc.add_heading(
                 f'Station "{self.station_name}" information as per database {self.parent.parent.database_version} published on {self.parent.parent.database_date.date()}', level=1) # type: ignore
             doc.add_heading("General information", level=2)
-            SQL = f"SELECT adm, ctry, long_dec, lat_dec FROM com_el WHERE ntc_id={self.ntc_id};"
-            rows = self.parent.parent.parse_database(SQL)[0] # type: ignore
-            adm = rows[0]
+            station = self.parent.parent.query_database('get_station', self.ntc_id) # type: ignore
+            adm = station.adm
             administration_name = self.parent.country_codes.get( # type: ignore
                 adm, "Unknown Country")
             doc.add_paragraph(
                 f"Responsible administration: {administration_name}")
-            ctry = rows[1]
+            ctry = station.ctry
             country_name = self.parent.country_codes.get( # type: ignore
                 ctry, "Unknown Country")
             doc.add_paragraph(f"Region country code: {country_name}")
-            long_dec = rows[2]
+            long_dec = station.long_dec
             doc.add_paragraph(
                 f"Longitude {abs(long_dec)} {self.station_rows[0][1]}")
-            lat_dec = rows[3]
+            lat_dec = station.lat_dec
             doc.add_paragraph(
                 f"Latitude {abs(lat_dec)} {self.station_rows[0][5]}")
 
@@ -1939,13 +1551,11 @@ class DatabaseEntryDetails(QMainWindow):
             header_cells = table.rows[0].cells
 
             for col in range(self.stationInfoTable.columnCount()):
-                header_cells[col].text = self.stationInfoTable.horizontalHeaderItem(
-                    col).text()
+                header_cells[col].text = self.stationInfoTable.headerText(col)
             for row in range(self.stationInfoTable.rowCount()):
                 row_cells = table.add_row().cells
                 for col in range(self.stationInfoTable.columnCount()):
-                    row_cells[col].text = self.stationInfoTable.item(
-                        row, col).text() if self.stationInfoTable.item(row, col) else ''
+                    row_cells[col].text = self.stationInfoTable.text(row, col)
 
             doc.add_paragraph("")
 
@@ -1958,13 +1568,11 @@ class DatabaseEntryDetails(QMainWindow):
             header_cells = table.rows[0].cells
 
             for col in range(self.beamInfoTable.columnCount()):
-                header_cells[col].text = self.beamInfoTable.horizontalHeaderItem(
-                    col).text()
+                header_cells[col].text = self.beamInfoTable.headerText(col)
             for row in range(self.beamInfoTable.rowCount()):
                 row_cells = table.add_row().cells
                 for col in range(self.beamInfoTable.columnCount()):
-                    row_cells[col].text = self.beamInfoTable.item(
-                        row, col).text() if self.beamInfoTable.item(row, col) else ''
+                    row_cells[col].text = self.beamInfoTable.text(row, col)
 
             doc.add_paragraph("")
 
@@ -2007,15 +1615,13 @@ class IAUStationListWindow(QMainWindow):
         self.setCentralWidget(centralWidget)
         layout = QGridLayout(centralWidget)
 
-        self.tableWidget = QTableWidget()
         headers = ["CPS Station ID", "Country", "Short Name", "Long Name", "Type", 
                    "Station longitude [deg]", "Station latitude [deg]", 
                    "Station altitude (amsl) [m]", "Min station frequency [MHz]", 
                    "Max station frequency [MHz]", "Contact / Website", "Contact / Address", 
                    "Contact / Phone", "Contact / Email", "Registered at ITU", "ITU Notice ID", 
                    "ITU responsible Administration"]
-        self.tableWidget.setColumnCount(len(headers))
-        self.tableWidget.setHorizontalHeaderLabels(headers)
+        self.tableWidget = DataTableView(headers, na_if_none)
         self.tableWidget.setSortingEnabled(True)
         self.load_data()
         self.tableWidget.cellDoubleClicked.connect(self.openStationDetails)
@@ -2051,6 +1657,8 @@ class IAUStationListWindow(QMainWindow):
         self.activateWindow()
 
     def load_data(self):
+        from station_dataset import StationDataset
+
         query = '''SELECT 
                 "CPS Station ID", "Country", "Short Name", "Long Name", "Type", 
                 "Station longitude [deg]", "Station latitude [deg]", 
@@ -2062,26 +1670,17 @@ class IAUStationListWindow(QMainWindow):
         cursor = self.parent.iau_db_connection.cursor()
         cursor.execute(query)
         self.rows = cursor.fetchall()
+        self.stations = StationDataset.from_rows(self.rows, name=2, administration=16, country=1, latitude=6, longitude=5)
 
-        self.tableWidget.setRowCount(len(self.rows))
-        for row_num, row_data in enumerate(self.rows):
-            for column_num, data in enumerate(row_data):
-                if data is None:
-                    data = 'N/A'
-                item = QTableWidgetItem(str(data))
-                item.setFlags(item.flags() & ~Qt.ItemIsEditable)
-                self.tableWidget.setItem(row_num, column_num, item)
+        self.tableWidget.setRows(self.rows)
 
         self.tableWidget.resizeColumnsToContents()
         self.tableWidget.setSelectionBehavior(QAbstractItemView.SelectRows)
 
 
     def openStationDetails(self, row, column):
-        station_id_item = self.tableWidget.item(row, 0)
-        station_name_item = self.tableWidget.item(row, 2)
-
-        station_id = station_id_item.text() if station_id_item else "Unknown"
-        station_name = station_name_item.text() if station_name_item else "Unknown"
+        station_id = self.tableWidget.text(row, 0) or "Unknown"
+        station_name = self.tableWidget.text(row, 2) or "Unknown"
 
         self.parent.animateClosing(self)
         self.showMinimized()
@@ -2095,12 +1694,11 @@ class IAUStationListWindow(QMainWindow):
             try:
                 with open(filePath, 'w', newline='', encoding='utf-8-sig') as file:
                     writer = csv.writer(file)
-                    headers = [self.tableWidget.horizontalHeaderItem(
-                        i).text() for i in range(self.tableWidget.columnCount())]
+                    headers = [self.tableWidget.headerText(
+                        i) for i in range(self.tableWidget.columnCount())]
                     writer.writerow(headers)
                     for row in range(self.tableWidget.rowCount()):
-                        rowData = [self.tableWidget.item(row, i).text() if self.tableWidget.item(
-                            row, i) else '' for i in range(self.tableWidget.columnCount())]
+                        rowData = [self.tableWidget.text(row, i) for i in range(self.tableWidget.columnCount())]
                         writer.writerow(rowData)
             except Exception as e:
                 QMessageBox.critical(self, "CSV saving Error",
@@ -2110,6 +1708,9 @@ class IAUStationListWindow(QMainWindow):
         filePath, _ = QFileDialog.getSaveFileName(
             self, "Save as DOCX", f"IAU_CPS_RAS_DB_OVERVIEW_DOCX", "Word Files (*.docx)")
         if filePath:
+            import docx
+            from docx.enum.section import WD_ORIENT
+
             doc = docx.Document()
             section = doc.sections[0]
             section.orientation = WD_ORIENT.LANDSCAPE
@@ -2121,15 +1722,12 @@ class IAUStationListWindow(QMainWindow):
             header_cells = table.rows[0].cells
 
             for column in range(self.tableWidget.columnCount()):
-                header = self.tableWidget.horizontalHeaderItem(column)
-                if header:
-                    header_cells[column].text = header.text()
+                header_cells[column].text = self.tableWidget.headerText(column)
 
             for row in range(self.tableWidget.rowCount()):
                 row_cells = table.add_row().cells
                 for col in range(self.tableWidget.columnCount()):
-                    item = self.tableWidget.item(row, col)
-                    row_cells[col].text = item.text() if item else ""
+                    row_cells[col].text = self.tableWidget.text(row, col)
 
             try:
                 doc.save(filePath)
@@ -2138,19 +1736,8 @@ class IAUStationListWindow(QMainWindow):
                                      f"An error occurred while preparing the docx file:\n{e}")
                 
     def showMap(self):
-        station_data = []
-        for row in range(self.tableWidget.rowCount()):
-            admin = html.escape(self.tableWidget.item(row, 16).text())  # CPS Station ID
-            country = html.escape(self.tableWidget.item(row, 1).text())  # Country
-            latitude = self.tableWidget.item(row, 6).text()  # Latitude
-            longitude = self.tableWidget.item(row, 5).text()  # Longitude
-            short_name = html.escape(self.tableWidget.item(row, 2).text())  # Long Name
-
-            if latitude and longitude:
-                try:
-                    station_data.append((short_name, admin, country, float(latitude), float(longitude)))
-                except ValueError:
-                    continue  # Skip rows with invalid latitude/longitude
+        # Stations without valid coordinates are left out
+        station_data = self.stations.map_stations(na_if_none, na_if_none)
 
         # Open the MapWindow and pass the station data
         self.parent.animateClosing(self) # type: ignore
@@ -2191,10 +1778,8 @@ class IAUStationDetailsWindow(QMainWindow):
 
         antennasInfoPanel = QGroupBox('Antennas Information [ITU Beams]')
         self.antennasInfoLayout = QGridLayout(antennasInfoPanel)
-        self.antennasInfoTable = QTableWidget()
         antenna_headers = ["Antenna ID", "Longitude", "Latitude", "Altitude (WGS84)", "Diameter (m)", "Min Frequency (MHz)", "Max Frequency (MHz)"]
-        self.antennasInfoTable.setColumnCount(len(antenna_headers))
-        self.antennasInfoTable.setHorizontalHeaderLabels(antenna_headers)
+        self.antennasInfoTable = DataTableView(antenna_headers, na_if_none)
         self.antennasInfoTable.setSortingEnabled(True)
 
         self.load_antenna_details()
@@ -2204,10 +1789,8 @@ class IAUStationDetailsWindow(QMainWindow):
 
         frequencyBandsInfoPanel = QGroupBox('Frequency Bands Information ()')
         self.frequencyBandsInfoLayout = QGridLayout(frequencyBandsInfoPanel)
-        self.frequencyBandsInfoTable = QTableWidget()
         frequency_headers = ["Band ID", "Min Frequency (MHz)", "Max Frequency (MHz)", "Bandwidth (MHz)"]
-        self.frequencyBandsInfoTable.setColumnCount(len(frequency_headers))
-        self.frequencyBandsInfoTable.setHorizontalHeaderLabels(frequency_headers)
+        self.frequencyBandsInfoTable = DataTableView(frequency_headers, na_if_none)
         self.frequencyBandsInfoTable.setSortingEnabled(True)
 
         self.frequencyBandsInfoLayout.addWidget(self.frequencyBandsInfoTable)
@@ -2232,17 +1815,7 @@ class IAUStationDetailsWindow(QMainWindow):
         cursor.execute(query, (self.station_id,))
         antennas = cursor.fetchall()
 
-        self.antennasInfoTable.setRowCount(len(antennas))
-        for row_idx, antenna in enumerate(antennas):
-            for col_idx, data in enumerate(antenna):
-                if data == None:
-                    data = 'N/A'
-                if col_idx in [0,1,2,5,6]:
-                    item = NumericSortItem(data)
-                else:
-                    item = QTableWidgetItem(str(data))                
-                item.setFlags(item.flags() & ~Qt.ItemIsEditable)
-                self.antennasInfoTable.setItem(row_idx, col_idx, item)
+        self.antennasInfoTable.setRows(antennas)
         self.antennasInfoTable.resizeColumnsToContents()
 
         if len(antennas) > 0:
@@ -2280,10 +1853,8 @@ class IAUStationListWindow_wikidata(QMainWindow):
         self.setCentralWidget(centralWidget)
         layout = QGridLayout(centralWidget)
 
-        self.tableWidget = QTableWidget()
         headers = ["Name", "Country", "Station longitude [deg]", "Station latitude [deg]", "Source"]
-        self.tableWidget.setColumnCount(len(headers))
-        self.tableWidget.setHorizontalHeaderLabels(headers)
+        self.tableWidget = DataTableView(headers)
         self.tableWidget.setSortingEnabled(True)
         self.load_data()
         layout.addWidget(self.tableWidget, 0, 0, 8, 1)
@@ -2319,6 +1890,8 @@ class IAUStationListWindow_wikidata(QMainWindow):
         self.activateWindow()
 
     def load_data(self):
+        from station_dataset import StationDataset
+
         query = (
             "SELECT "
             "\"Name\", \"Country\", \"Station longitude [deg]\", \"Station latitude [deg]\", \"Source\" "
@@ -2327,12 +1900,8 @@ class IAUStationListWindow_wikidata(QMainWindow):
         cursor = self.parent.iau_db_connection.cursor()
         cursor.execute(query)
         rows = cursor.fetchall()
-        self.tableWidget.setRowCount(len(rows))
-        for row_idx, row_data in enumerate(rows):
-            for col_idx, data in enumerate(row_data):
-                item = QTableWidgetItem(str(data))
-                item.setFlags(item.flags() & ~Qt.ItemIsEditable)
-                self.tableWidget.setItem(row_idx, col_idx, item)
+        self.stations = StationDataset.from_rows(rows, name=0, administration=4, country=1, latitude=3, longitude=2)
+        self.tableWidget.setRows(rows)
         self.tableWidget.resizeColumnsToContents()
         self.tableWidget.setSelectionBehavior(QAbstractItemView.SelectRows)
 
@@ -2347,15 +1916,12 @@ class IAUStationListWindow_wikidata(QMainWindow):
                 writer = csv.writer(file)
 
                 # Write the header
-                headers = [self.tableWidget.horizontalHeaderItem(col).text() for col in range(self.tableWidget.columnCount())]
+                headers = [self.tableWidget.headerText(col) for col in range(self.tableWidget.columnCount())]
                 writer.writerow(headers)
 
                 # Write the table data
                 for row in range(self.tableWidget.rowCount()):
-                    row_data = []
-                    for col in range(self.tableWidget.columnCount()):
-                        item = self.tableWidget.item(row, col)
-                        row_data.append(item.text() if item else '')
+                    row_data = [self.tableWidget.text(row, col) for col in range(self.tableWidget.columnCount())]
                     writer.writerow(row_data)
 
             # Show a message indicating the file has been saved
@@ -2368,6 +1934,8 @@ class IAUStationListWindow_wikidata(QMainWindow):
 
         # If the user provided a file path
         if file_path:
+            import docx
+
             doc = docx.Document()
 
             # Add a title to the document
@@ -2381,7 +1949,7 @@ class IAUStationListWindow_wikidata(QMainWindow):
 
             # Write the header row
             hdr_cells = table.rows[0].cells
-            headers = [self.tableWidget.horizontalHeaderItem(col).text() for col in range(self.tableWidget.columnCount())]
+            headers = [self.tableWidget.headerText(col) for col in range(self.tableWidget.columnCount())]
             for col_idx, header in enumerate(headers):
                 hdr_cells[col_idx].text = header
 
@@ -2389,8 +1957,7 @@ class IAUStationListWindow_wikidata(QMainWindow):
             for row_idx in range(self.tableWidget.rowCount()):
                 row_cells = table.rows[row_idx + 1].cells
                 for col_idx in range(self.tableWidget.columnCount()):
-                    item = self.tableWidget.item(row_idx, col_idx)
-                    row_cells[col_idx].text = item.text() if item else ''
+                    row_cells[col_idx].text = self.tableWidget.text(row_idx, col_idx)
 
             # Save the document
             doc.save(file_path)
@@ -2398,19 +1965,8 @@ class IAUStationListWindow_wikidata(QMainWindow):
             # Show a message indicating the file has been saved
             self.statusBar().showMessage(f'DOCX saved to {file_path}')
     def showMap(self):
-        # Gather the data from the table to pass it to the MapWindow
-        station_data = []
-        for row in range(self.tableWidget.rowCount()):
-            name = html.escape(self.tableWidget.item(row, 0).text())  # Station name
-            country = html.escape(self.tableWidget.item(row, 1).text())  # Country
-            latitude = self.tableWidget.item(row, 3).text()  # Latitude
-            longitude = self.tableWidget.item(row, 2).text()  # Longitude
-            source = html.escape(self.tableWidget.item(row, 4).text())  # Source
-            if latitude and longitude:
-                try:
-                    station_data.append((name, source, country, float(latitude), float(longitude)))
-                except ValueError:
-                    continue  # Skip rows with invalid latitude/longitude
+        # The Wikidata source takes the place of the administration on the map
+        station_data = self.stations.map_stations()
 
         # Open the MapWindow and pass the station data
         self.parent.animateClosing(self) # type: ignore
@@ -2430,6 +1986,9 @@ class IAUStationListWindow_wikidata(QMainWindow):
 
 
 class SiteLinkWizard(QMainWindow):
+    # Number of upcoming entries whose closest stations are computed ahead of time
+    CANDIDATES_LOOKAHEAD = 5
+
     def __init__(self, filePath=None, parent=None):
         super().__init__(parent)
         self.parent = parent
@@ -2437,9 +1996,13 @@ class SiteLinkWizard(QMainWindow):
         self.country_codes=self.parent.load_country_codes() # type: ignore
         self.desired_width=1600
         self.desired_height=900
-        self.map_html = ""
+        # The map page is loaded once, entries are shown by script calls once it is ready
+        self.map_ready = False
+        self.pending_map_script = None
+        self.candidates = {}
         self.initUI()
-        self.csv_file_path = "CPS_unlinked_wikidata_stations.csv"
+        # Entries left unlinked are listed next to their CPS database, so a resumed session keeps its own list
+        self.csv_file_path = os.path.splitext(self.filePath)[0] + "_unlinked_wikidata_stations.csv" # type: ignore
         self.initCSV()
         self.initialised='True'
 
@@ -2457,7 +2020,12 @@ class SiteLinkWizard(QMainWindow):
         self.layout = QGridLayout(central_widget)
 
         self.instructions = QLabel("Find and link corresponding stations.")
-        self.layout.addWidget(self.instructions, 0, 0, 1, 4)
+        self.layout.addWidget(self.instructions, 0, 0, 1, 3)
+
+        self.autoLinkButton = QPushButton("Auto-link confident matches")
+        self.autoLinkButton.setToolTip("Link all entries with a close ITU station of a similar name and only review the rest")
+        self.autoLinkButton.clicked.connect(self.auto_link)
+        self.layout.addWidget(self.autoLinkButton, 0, 3)
 
         self.progressBar = QProgressBar()
         self.layout.addWidget(self.progressBar, 1, 0, 1, 4)
@@ -2488,13 +2056,15 @@ class SiteLinkWizard(QMainWindow):
         self.MapGroup = QGroupBox("Station locations")
         self.mapLayout = QStackedLayout()
         self.MapGroup.setLayout(self.mapLayout)
-        self.browser = QWebEngineView()
+        self.browser = new_web_view()
         self.loading_widget = LoadingWidget()
 
         self.mapLayout.addWidget(self.browser)
         self.mapLayout.addWidget(self.loading_widget)
         self.mapLayout.setCurrentWidget(self.loading_widget)
         self.layout.addWidget(self.MapGroup, 4, 0, 2, 4)
+        self.browser.loadFinished.connect(self.onLoadFinished)
+        self.browser.setUrl(QUrl(publish_map_page(self.generateMapHTML())))
 
         self.buttonsLayout = QHBoxLayout()
         self.confirmButton = QPushButton()
@@ -2538,13 +2108,36 @@ class SiteLinkWizard(QMainWindow):
 
     def onLoadFinished(self, ok):
         if ok:
+            self.map_ready = True
             self.mapLayout.setCurrentWidget(self.browser)
+            if self.pending_map_script:
+                self.browser.page().runJavaScript(self.pending_map_script)
+                self.pending_map_script = None
+
+    def update_map(self):
+        """Show the markers of the current entry on the map page, or keep them until the page is loaded."""
+        script = f'showEntry({json_for_script(wizard_entry_payload(self.station_data))});'
+        if self.map_ready:
+            self.browser.page().runJavaScript(script)
+        else:
+            self.pending_map_script = script
 
     def initCSV(self):
-        """Initialize the CSV file with headers."""
+        """
+        Initialize the CSV file with headers. When resuming a session the rows of the entries
+        reviewed so far are kept, rows of entries that are still pending (written just before
+        the wizard was interrupted) are dropped as these entries will be reviewed again.
+        """
+        kept_rows = []
+        if self.reviewed_count and os.path.exists(self.csv_file_path):
+            pending_sources = {entry[5] for entry in self.wikidata_entries}
+            with open(self.csv_file_path, newline='') as csvfile:
+                kept_rows = [row for row in list(csv.reader(csvfile))[1:]
+                             if len(row) > 3 and row[3] not in pending_sources]
         with open(self.csv_file_path, 'w', newline='') as csvfile:
             csvwriter = csv.writer(csvfile)
             csvwriter.writerow(["Station Name", "Country", "Coordinates", "Source", "Comment"])
+            csvwriter.writerows(kept_rows)
 
     def addToCSV(self, station_name, country, coordinates, source, comment):
         """Add a new row to the CSV file."""
@@ -2553,16 +2146,14 @@ class SiteLinkWizard(QMainWindow):
             csvwriter.writerow([station_name, country, coordinates, source, comment])
 
     def load_data(self):
+        from station_index import StationIndex
+
         self.conn = sqlite3.connect(self.filePath) # type: ignore
         self.cursor = self.conn.cursor()
 
-        # Drop link table if already exist
-        drop_link_table_query = "DROP TABLE IF EXISTS wikidata_stations_link"
-        self.cursor.execute(drop_link_table_query)
-
-        # Create the link table
+        # Create the link table, links made in previous sessions are kept
         create_link_table_query = """
-        CREATE TABLE wikidata_stations_link (
+        CREATE TABLE IF NOT EXISTS wikidata_stations_link (
             "CPS Wiki ID" INTEGER,
             "CPS Station ID" INTEGER,
             FOREIGN KEY("CPS Wiki ID") REFERENCES "wikidata"("CPS Wiki ID"),
@@ -2570,19 +2161,31 @@ class SiteLinkWizard(QMainWindow):
         );
         """
         self.cursor.execute(create_link_table_query)
-        
-        self.cursor.execute("SELECT * FROM wikidata")
+
+        # Entries are reviewed once "Linked ITU" is set, links of entries interrupted before that are redone
+        self.cursor.execute("""DELETE FROM wikidata_stations_link WHERE "CPS Wiki ID" IN
+                            (SELECT "CPS Wiki ID" FROM wikidata WHERE "Linked ITU" IS NULL)""")
+        self.conn.commit()
+        self.cursor.execute("SELECT COUNT(*), COUNT(\"Linked ITU\") FROM wikidata")
+        self.total_entries, self.reviewed_count = self.cursor.fetchone()
+
+        self.cursor.execute("SELECT * FROM wikidata WHERE \"Linked ITU\" IS NULL ORDER BY \"CPS Wiki ID\"")
         self.wikidata_entries = self.cursor.fetchall()
+        if self.reviewed_count:
+            self.instructions.setText(
+                f"Find and link corresponding stations. Resuming: {self.reviewed_count} of {self.total_entries} entries already reviewed.")
 
         self.cursor.execute("SELECT * FROM Stations")
         self.stations_entries = self.cursor.fetchall()
 
-        self.progressBar.setMaximum(len(self.wikidata_entries))
-        self.progressBar.setValue(0)
+        self.progressBar.setMaximum(self.total_entries)
+        self.progressBar.setValue(self.reviewed_count)
 
-        # Convert stations entries to numpy arrays for efficient calculations
-        self.stations_coords = np.array([(station[6], station[5]) for station in self.stations_entries])
-        self.station_names = [station[2] for station in self.stations_entries]
+        # Spatial index over the station coordinates for the closest stations search
+        self.station_index = StationIndex([station[6] for station in self.stations_entries],
+                                          [station[5] for station in self.stations_entries])
+        # List items carry the CPS Station ID, short names are not unique
+        self.stations_by_id = {station[0]: station for station in self.stations_entries}
 
     def show_entry(self):
         if self.current_index < len(self.wikidata_entries):
@@ -2590,7 +2193,7 @@ class SiteLinkWizard(QMainWindow):
             entry = self.wikidata_entries[self.current_index]
             self.display_wikidata_entry(entry)
             self.find_closest_stations(entry)
-            self.progressBar.setValue(self.current_index + 1)
+            self.progressBar.setValue(self.total_entries - len(self.wikidata_entries) + self.current_index + 1)
             
             latitude = entry[4]
             longitude = entry[3]
@@ -2599,14 +2202,13 @@ class SiteLinkWizard(QMainWindow):
             else:
                 self.confirmButton.setEnabled(True)
             
-            self.browser.loadFinished.connect(self.onLoadFinished)
-            self.mapLayout.setCurrentWidget(self.loading_widget)
-            self.map_html = self.generateMapHTML(self.station_data)
-            self.browser.setHtml(self.map_html)
+            self.update_map()
+            QTimer.singleShot(0, self.prefetch_candidates)
         else:
             self.instructions.setText("No more entries.")
             self.confirmButton.setEnabled(False)
             self.noMatchButton.setEnabled(False)
+            self.autoLinkButton.setEnabled(False)
             self.clear_layout(self.wikidataLayout)
             self.clear_layout(self.stationDetailsLayout)
 
@@ -2645,9 +2247,7 @@ class SiteLinkWizard(QMainWindow):
         self.clear_layout(self.stationDetailsLayout)
         selected_items = self.stationsList.selectedItems()
         if selected_items:
-            selected_item = selected_items[0].text()
-            station_name = selected_item.split(' (')[0]
-            matched_station = next((s for s in self.stations_entries if s[2] == station_name), None)
+            matched_station = self.stations_by_id.get(selected_items[0].data(Qt.UserRole))
             if matched_station:
                 self.stationDetailsLayout.setSpacing(2)
                 self.stationDetailsLayout.setContentsMargins(0, 0, 0, 0)
@@ -2673,8 +2273,7 @@ class SiteLinkWizard(QMainWindow):
         if self.parent.dbConnection: # type: ignore
             selected_items = self.stationsList.selectedItems()
             if selected_items:
-                station_name = selected_items[0].text().split(' (')[0]
-                matched_station = next((s for s in self.stations_entries if s[2] == station_name), None)
+                matched_station = self.stations_by_id.get(selected_items[0].data(Qt.UserRole))
                 if matched_station:
                     self.parent.animateClosing(self) # type: ignore
                     self.showMinimized()
@@ -2689,40 +2288,42 @@ class SiteLinkWizard(QMainWindow):
         longitude = entry[3]
 
         if latitude is not None and longitude is not None:
-            distances = self.calculate_distances(latitude, longitude)
             # Select 10 closest stations
-            closest_indices = np.argsort(distances)[:10]
+            closest_indices, distances = self.closest_candidates(entry)
 
             self.stationsList.clear()
-            for idx in closest_indices:
-                station_name = self.station_names[idx]
-                distance = distances[idx]
-                item = QListWidgetItem(f"{station_name} ({distance:.2f} km)")
+            for idx, distance in zip(closest_indices, distances):
+                matched_station = self.stations_entries[idx]
+                item = QListWidgetItem(f"{matched_station[2]} ({distance:.2f} km)")
+                item.setData(Qt.UserRole, matched_station[0])
                 item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
                 item.setCheckState(Qt.Unchecked)
                 self.stationsList.addItem(item)
 
-                matched_station = next((s for s in self.stations_entries if s[2] == station_name), None)
-                if matched_station:
-                    self.station_data.append((matched_station[2], matched_station[18], matched_station[1], matched_station[6], matched_station[5]))
+                self.station_data.append((matched_station[2], matched_station[18], matched_station[1], matched_station[6], matched_station[5]))
 
             self.stationsList.setCurrentRow(0)
         else:
             self.stationsList.clear()
             self.stationsList.addItem("No coordinates available.")
 
-    def calculate_distances(self, lat1, lon1):
-        lat1_rad, lon1_rad = np.radians(lat1), np.radians(lon1)
-        lat2_rad, lon2_rad = np.radians(self.stations_coords[:, 0]), np.radians(self.stations_coords[:, 1])
-        
-        dlat = lat2_rad - lat1_rad
-        dlon = lon2_rad - lon1_rad
-        
-        a = np.sin(dlat / 2)**2 + np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(dlon / 2)**2
-        c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
-        distance = 6371 * c  # Earth radius in kilometers
-        return distance
-    
+    def closest_candidates(self, entry):
+        """Indices and distances of the 10 stations closest to a Wikidata entry, from the look-ahead queue if there."""
+        candidates = self.candidates.pop(entry[0], None)
+        if candidates is None:
+            candidates = self.station_index.nearest(entry[4], entry[3], 10)
+        return candidates
+
+    def prefetch_candidates(self):
+        """Compute the closest stations of the next few entries while the current one is reviewed."""
+        upcoming = self.wikidata_entries[self.current_index + 1:self.current_index + 1 + self.CANDIDATES_LOOKAHEAD]
+        upcoming_ids = {entry[0] for entry in upcoming}
+        for entry_id in [entry_id for entry_id in self.candidates if entry_id not in upcoming_ids]:
+            del self.candidates[entry_id]
+        for entry in upcoming:
+            if entry[0] not in self.candidates and entry[4] is not None and entry[3] is not None:
+                self.candidates[entry[0]] = self.station_index.nearest(entry[4], entry[3], 10)
+
     def confirm_match(self):
         entry = self.wikidata_entries[self.current_index]
         entry_id = entry[0]
@@ -2736,8 +2337,7 @@ class SiteLinkWizard(QMainWindow):
             item = self.stationsList.item(i)
             if item.checkState() == Qt.Checked:
                 any_checked = True
-                station_name = item.text().split(' (')[0]
-                matched_station = next((s for s in self.stations_entries if s[2] == station_name), None)
+                matched_station = self.stations_by_id.get(item.data(Qt.UserRole))
                 if matched_station:
                     self.update_wikidata_entry(self.current_index, matched_station[0])
         if any_checked:
@@ -2761,6 +2361,8 @@ class SiteLinkWizard(QMainWindow):
                     else:
                         QMessageBox.warning(self, "Warning", "Comment is required")
                         self.conn.rollback()
+                else:
+                    self.conn.rollback()
         else:
             QMessageBox.critical(self, "Error", 'You need to select at least one corresponding ITU station or to use "No match" button')
 
@@ -2804,206 +2406,59 @@ class SiteLinkWizard(QMainWindow):
         
 
 
+    def auto_link(self):
+        """Link the confident matches among the remaining entries at once and keep the others for review."""
+        from site_matching import prematch, write_links
+
+        result = prematch(self.wikidata_entries[self.current_index:], self.stations_entries)
+        if not result.links:
+            QMessageBox.information(self, "Automatic linking", "No confident matches found, all entries are left for review.")
+            return
+        try:
+            write_links(self.conn, result.links)
+        except sqlite3.Error as e:
+            QMessageBox.critical(self, "Automatic linking", f"Links could not be saved: {e}")
+            return
+        self.wikidata_entries = self.wikidata_entries[:self.current_index] + result.review
+        QMessageBox.information(
+            self, "Automatic linking",
+            f"{len(result.confident)} entries linked to {len(result.links)} ITU stations, {len(result.review)} left for review.")
+        self.show_entry()
+
     def next_entry(self):
         self.confidentCheckBox.setChecked(False)
         self.current_index += 1
         self.show_entry()
 
     def update_wikidata_entry(self, index, station_id):
+        # Committed by the caller together with "Linked ITU", so an interrupted review leaves no links behind
         entry_id = self.wikidata_entries[index][0]
         self.cursor.execute("INSERT INTO wikidata_stations_link (\"CPS Wiki ID\", \"CPS Station ID\") VALUES (?, ?)",
                             (entry_id, station_id))
-        self.conn.commit()
 
     def generate_base64_icon(self, icon_path):
-        with open(icon_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
+        return file_base64(icon_path)
         
-    def generateMapHTML(self, station_data):
-        wikidata_station = station_data[0]
-        wikidata_name = wikidata_station[0]
-        wikidata_country = wikidata_station[2]
-        wikidata_lat = wikidata_station[3]
-        wikidata_lon = wikidata_station[4]
-        if wikidata_lon is None or wikidata_lat is None:            
+    def generateMapHTML(self):
+        try:
+            script_dir = os.path.dirname(os.path.abspath(__file__))
+            icon_path = os.path.join(script_dir, 'ras_s_icon.webp').replace('\\', '/')
+            icon_base64 = self.generate_base64_icon(icon_path)
+            html = wizard_map_html(icon_base64)
+
+        except Exception as e:
             html = f"""
         <!DOCTYPE html>
         <html>
         <head>
-            <title>No coordinates</title>
+            <title>Error</title>
         </head>
         <body>
-            <p>No coordinates for wikidata station to show the map</p>
+            <p>Error generating map: {str(e)}</p>
         </body>
         </html>
         """
-        else:
-            try:
-                script_dir = os.path.dirname(os.path.abspath(__file__))
-                icon_path = os.path.join(script_dir, 'ras_s_icon.webp').replace('\\', '/')
-                icon_base64 = self.generate_base64_icon(icon_path)
-                html_parts = []
-                html_parts.append("""
-                <!DOCTYPE html>
-                <html>
-                <head>
-                    <title>Full Widget Leaflet Map for Site Link Wizard</title>
-                    <meta charset="utf-8" />
-                    <link 
-                        rel="stylesheet" 
-                        href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css"
-                    />
-                    <link
-                        rel="stylesheet"
-                        href="https://unpkg.com/leaflet.markercluster/dist/MarkerCluster.css"
-                    />
-                    <link
-                        rel="stylesheet"
-                        href="https://unpkg.com/leaflet.markercluster/dist/MarkerCluster.Default.css"
-                    />
-                    <script 
-                        src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js">
-                    </script>
-                    <script
-                        src="https://unpkg.com/leaflet.markercluster/dist/leaflet.markercluster.js">
-                    </script>
-                    <style>
-                        body {
-                            padding: 0;
-                            margin: 0;
-                        }
-                        html, body, #map {
-                            height: 100%;
-                            width: 100%;
-                        }
-                        .custom-cluster-icon {
-                            background: radial-gradient(circle, white 25%, transparent 75%);
-                            border-radius: 50%;
-                            border: 2px solid rgba(0, 0, 0, 0.5);
-                            text-align: center;
-                            color: black;
-                            font-size: 14px;
-                            font-weight: bold;
-                            width: 40px;
-                            height: 40px;
-                        }
-                        .custom-cluster-icon img {
-                            position: absolute;
-                            top: 50%;
-                            left: 50%;
-                            transform: translate(-50%, -50%);
-                            width: 30px;
-                            height: 30px;
-                        }
-                        .custom-cluster-icon .cluster-count {
-                            position: absolute;
-                            top: -10px;
-                            right: -10px;
-                            background: red;
-                            color: white;
-                            border-radius: 50%;
-                            width: 20px;
-                            height: 20px;
-                            display: flex;
-                            justify-content: center;
-                            align-items: center;
-                            font-size: 12px;
-                        }
-                    </style>
-                </head>
-                <body>
-                    <div id="map"></div>
-                
-                    <script>
-                    """)
-                html_parts.append(f"""
-                        var map = L.map('map', {{attributionControl: false}}).setView([{wikidata_lat}, {wikidata_lon}], 16);
-                        """)
-                html_parts.append("""
-                        var myAttrControl = L.control.attribution().addTo(map);
-                        myAttrControl.setPrefix('<a href="https://leafletjs.com/">Leaflet</a>');
-                        
-                        mapLink = 
-                            '<a href="http://openstreetmap.org">OpenStreetMap</a>';
-                        L.tileLayer(
-                            'http://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
-                            attribution: 'Map data by &copy; <a href="http://www.openstreetmap.org/copyright">OpenStreetMap</a>, under <a href="https://opendatacommons.org/licenses/odbl/">ODbL.</a>',
-                            maxZoom: 18,
-                            }).addTo(map);
-                            
-                        var redIcon = new L.Icon({
-                            iconUrl: 'https://raw.githubusercontent.com/pointhi/leaflet-color-markers/master/img/marker-icon-red.png',
-                            shadowUrl: 'https://cdnjs.cloudflare.com/ajax/libs/leaflet/1.3.1/images/marker-shadow.png',
-                            iconSize: [25, 41],
-                            iconAnchor: [12, 41],
-                            popupAnchor: [1, -34],
-                            shadowSize: [41, 41]
-                        });
-                """)
-                html_parts.append(f"""
-                        var customIcon = L.icon({{
-                            iconUrl: 'data:image/webp;base64,{icon_base64}',
-                            iconSize: [30, 30],
-                            iconAnchor: [15, 15],
-                            popupAnchor: [0, 0]
-                        }}); 
-                        var markers = L.markerClusterGroup({{
-                            maxClusterRadius: 50,
-                            iconCreateFunction: function(cluster) {{
-                                var childCount = cluster.getChildCount();
-                                return L.divIcon({{
-                                    html: '<div><img src="data:image/webp;base64,{icon_base64}" alt="cluster-icon"/><div class="cluster-count">' + childCount + '</div></div>',
-                                    className: 'custom-cluster-icon',
-                                    iconSize: [40, 40]
-                                }});
-                            }}
-                        }});
-                                  
-                """)
-
-                for name, adm, ctr, lat, lon in station_data[1:]:
-                    adm_escaped = adm.replace("'", "&#39;").replace('"', '&quot;')
-                    ctr_escaped = ctr.replace("'", "&#39;").replace('"', '&quot;')
-                    name_escaped = name.replace("'", "&#39;").replace('"', '&quot;')                    
-                    html_parts.append(f"""                                  
-                                    var marker = L.marker([{lat}, {lon}], {{icon: customIcon}}).bindPopup('ITU station: <b>{name}</b><br>Region country code:<b>{ctr_escaped}</b><br>Responsible administration: <b>{adm_escaped}</b>');
-                                    markers.addLayer(marker);
-                                    """)
-
-                html_parts.append(
-                    f"        L.marker([{wikidata_lat}, {wikidata_lon}], {{icon: redIcon}}).addTo(map).bindPopup('Wikidata station: <b>{wikidata_name.replace("'", "&#39;").replace('"', '&quot;')}</b><br>Country:<b>{wikidata_country.replace("'", "&#39;").replace('"', '&quot;')}</b>').openPopup();")
-
-                html_parts.append("""
-                    map.addLayer(markers);
-                    </script>
-                </body>
-                </html>
-                """)
-
-                html = ''.join(html_parts)
-
-            except Exception as e:
-                html = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <title>Error</title>
-            </head>
-            <body>
-                <p>Error generating map: {str(e)}</p>
-            </body>
-            </html>
-            """
         return html
-    def showEvent(self, event):
-        super().showEvent(event)
-        if self.map_html:
-            self.mapLayout.removeWidget(self.browser)
-            self.browser.deleteLater()
-            self.browser = QWebEngineView()
-            self.mapLayout.addWidget(self.browser)
-            self.browser.loadFinished.connect(self.onLoadFinished)
-            self.browser.setHtml(self.map_html)
 
     def closeEvent(self, event):
         if self.parent:
@@ -3018,6 +2473,25 @@ class SiteLinkWizard(QMainWindow):
 
 
 if __name__ == '__main__':
+    # The DOCX annex is rendered in spawned worker processes, which frozen builds have to dispatch
+    import multiprocessing
+    multiprocessing.freeze_support()
+    # QtWebEngine is only imported when the first map opens, i.e. after QApplication exists
+    QApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
+    # Custom URL schemes on the other hand must be declared before
+    register_map_scheme()
+    if STARTUP_TIMER:
+        STARTUP_TIMER.mark('module imports done')
     qt_app = QApplication(sys.argv)
     qt_gui = MainApp()
+    if STARTUP_TIMER:
+        STARTUP_TIMER.mark('main window created')
+
+        def report_startup():
+            # Runs from the event loop, i.e. once the first window is on screen
+            STARTUP_TIMER.mark('first window shown')
+            STARTUP_TIMER.uninstall()
+            STARTUP_TIMER.report()
+            qt_app.quit()
+        QTimer.singleShot(0, report_startup)
     sys.exit(qt_app.exec_())
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming writer of simple Word documents (headings, paragraphs and page breaks).
+
+python-docx keeps the whole document as an element tree until it is saved. Here the
+WordprocessingML of word/document.xml is written into the .docx zip while it is
+generated, so memory does not grow with the document. All the other package parts
+(styles, settings, content types, ...) are taken from an empty python-docx document,
+and the paragraphs are the same as the ones python-docx writes for add_heading,
+add_paragraph and add_page_break.
+
+@author: boris.sorokin@skao.int
+"""
+import io
+import re
+import zipfile
+
+DOCUMENT_PART = 'word/document.xml'
+
+_INVALID_XML_CHARACTERS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_RUN_BREAKS = re.compile('([\t\n\r])')
+_RUN_BREAK_XML = {'\t': '<w:tab/>', '\n': '<w:br/>', '\r': '<w:br/>'}
+
+PAGE_BREAK_XML = '<w:p><w:r><w:br w:type="page"/></w:r></w:p>'
+
+
+def _text_xml(text):
+    if _INVALID_XML_CHARACTERS.search(text):
+        raise ValueError('All strings must be XML compatible: Unicode or ASCII, no NULL bytes or control characters')
+    text = text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    if text.strip() != text:
+        return f'<w:t xml:space="preserve">{text}</w:t>'
+    return f'<w:t>{text}</w:t>'
+
+
+def paragraph_xml(text, style=None):
+    """<w:p> element of a paragraph with one run of text, as python-docx writes it."""
+    properties = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ''
+    text = str(text)
+    if not text:
+        return f'<w:p>{properties}</w:p>' if properties else '<w:p/>'
+    content = ''.join(_RUN_BREAK_XML[part] if part in _RUN_BREAK_XML else _text_xml(part)
+                      for part in _RUN_BREAKS.split(text) if part)
+    return f'<w:p>{properties}<w:r>{content}</w:r></w:p>'
+
+
+def heading_xml(text, level=1):
+    return paragraph_xml(text, 'Title' if level == 0 else f'Heading{level}')
+
+
+class StreamingDocument:
+    """
+    Word document written to filePath as it is built, to be used as a context manager:
+
+        with StreamingDocument(path) as doc:
+            doc.heading('Title', level=1)
+            doc.paragraph('Text')
+
+    configure(document), if given, is called with the empty python-docx document the package
+    is made from, e.g. to set the page orientation of its section.
+    """
+
+    def __init__(self, filePath, configure=None):
+        self.filePath = filePath
+        self.configure = configure
+        self.archive = None
+        self.stream = None
+        self.remaining_parts = []
+        self.document_end = ''
+
+    def __enter__(self):
+        import docx
+
+        skeleton = docx.Document()
+        if self.configure:
+            self.configure(skeleton)
+        package = io.BytesIO()
+        skeleton.save(package)
+        package.seek(0)
+
+        self.archive = zipfile.ZipFile(self.filePath, 'w', zipfile.ZIP_DEFLATED)
+        with zipfile.ZipFile(package) as source:
+            parts = source.infolist()
+            names = [part.filename for part in parts]
+            position = names.index(DOCUMENT_PART)
+            for part in parts[:position]:
+                self.archive.writestr(part, source.read(part))
+            self.remaining_parts = [(part, source.read(part)) for part in parts[position + 1:]]
+            document = source.read(DOCUMENT_PART).decode('utf-8')
+
+        # The empty document has no body content apart from its section properties
+        body_start = document.index('<w:body>') + len('<w:body>')
+        body_end = document.index('<w:sectPr')
+        self.document_end = document[body_end:]
+        part = zipfile.ZipInfo(DOCUMENT_PART, date_time=parts[position].date_time)
+        part.compress_type = zipfile.ZIP_DEFLATED
+        self.stream = io.TextIOWrapper(
+            io.BufferedWriter(self.archive.open(part, 'w'), 1 << 16), encoding='utf-8')
+        self.stream.write(document[:body_start])
+        return self
+
+    def write(self, xml):
+        """Append ready-made body XML, e.g. paragraphs precompiled with paragraph_xml."""
+        self.stream.write(xml)
+
+    def heading(self, text, level=1):
+        self.stream.write(heading_xml(text, level))
+
+    def paragraph(self, text=''):
+        self.stream.write(paragraph_xml(text))
+
+    def page_break(self):
+        self.stream.write(PAGE_BREAK_XML)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self.stream.write(self.document_end)
+            self.stream.close()
+            if exc_type is None:
+                for part, data in self.remaining_parts:
+                    self.archive.writestr(part, data)
+        finally:
+            self.archive.close()
+        return False
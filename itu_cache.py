@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+"""
+Local SQLite mirror of the RAS-relevant tables of an ITU IFIC .mdb snapshot.
+
+The .mdb is imported once (through ODBC, or the pure-Python reader of mdb_reader.py where
+the Microsoft Access driver is not available) into an indexed SQLite file named after the
+srs_ooak version string and the hash of the .mdb file. Later sessions find the mirror
+by hashing the selected file and never read the .mdb again, so they start instantly.
+
+@author: boris.sorokin@skao.int
+"""
+import datetime
+import decimal
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+
+CACHE_FORMAT = '1'
+
+# Tables copied into the mirror, with the filter restricting them to RAS notices. Each filter
+# is given both as SQL, for sources that can run it, and as a (column, kind of key set) rule
+# for sources that can only scan: 'ras_type' is {'R'}, 'ras' the set of RAS ntc_id, 'pattern' the pattern_id
+# of their antennas, both read back from the part of the mirror already written.
+RAS_NOTICES = "SELECT ntc_id FROM com_el WHERE ntc_type='R'"
+CACHED_TABLES = (
+    ('srs_ooak', '', None),
+    ('com_el', "WHERE ntc_type='R'", ('ntc_type', 'ras_type')),
+    ('e_stn', f'WHERE ntc_id IN ({RAS_NOTICES})', ('ntc_id', 'ras')),
+    ('e_ant', f'WHERE ntc_id IN ({RAS_NOTICES})', ('ntc_id', 'ras')),
+    ('grp', f'WHERE ntc_id IN ({RAS_NOTICES})', ('ntc_id', 'ras')),
+    ('freq', f'WHERE ntc_id IN ({RAS_NOTICES})', ('ntc_id', 'ras')),
+    ('ant_type', f'WHERE pattern_id IN (SELECT pattern_id FROM e_ant WHERE ntc_id IN ({RAS_NOTICES}))',
+     ('pattern_id', 'pattern')),
+)
+KEY_SETS = {
+    'ras_type': lambda target: {'R'},
+    'ras': lambda target: {row[0] for row in target.execute('SELECT ntc_id FROM com_el;')},
+    'pattern': lambda target: {row[0] for row in target.execute('SELECT DISTINCT pattern_id FROM e_ant;')},
+}
+CACHE_INDEXES = (
+    'CREATE INDEX idx_com_el_ntc_id ON com_el (ntc_id);',
+    'CREATE INDEX idx_com_el_adm_name ON com_el (adm, stn_name);',
+    'CREATE INDEX idx_e_stn_ntc_id ON e_stn (ntc_id);',
+    'CREATE INDEX idx_e_ant_ntc_id ON e_ant (ntc_id, beam_name);',
+    'CREATE INDEX idx_grp_ntc_id ON grp (ntc_id, beam_name);',
+    'CREATE INDEX idx_freq_ntc_id ON freq (ntc_id, beam_name);',
+    'CREATE INDEX idx_ant_type_pattern_id ON ant_type (pattern_id);',
+)
+
+FETCH_BATCH_SIZE = 5000
+HASH_CHUNK_SIZE = 1 << 20
+
+# Access dates come back as datetime objects and the GUI relies on that (.date(), strftime),
+# so they are stored under dedicated declared types and converted back on read.
+sqlite3.register_converter('ITU_DATETIME', lambda value: datetime.datetime.fromisoformat(value.decode()))
+sqlite3.register_converter('ITU_DATE', lambda value: datetime.date.fromisoformat(value.decode()))
+
+
+def default_cache_dir():
+    return os.environ.get('RAS_DB_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.ras_db_cache'))
+
+
+def _read_index(index_path):
+    try:
+        with open(index_path, encoding='utf-8') as index_file:
+            return json.load(index_file)
+    except (OSError, ValueError):
+        return {}
+
+
+# Serializes the updates of index.json between the threads of this process
+_INDEX_LOCK = threading.Lock()
+
+
+def file_hash(filepath, cache_dir=None):
+    """
+    BLAKE2 hash of the whole file. Hashes are remembered per path, size and mtime in
+    index.json of the cache directory, so an unchanged multi-GB file is hashed only once.
+    index.json is rewritten under a temporary name and renamed, like the mirrors, so a
+    concurrent reader never sees it half written.
+    """
+    cache_dir = cache_dir or default_cache_dir()
+    index_path = os.path.join(cache_dir, 'index.json')
+    stat = os.stat(filepath)
+    key = os.path.realpath(filepath)
+    known = _read_index(index_path).get(key)
+    if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+        return known['hash']
+
+    digest = hashlib.blake2b(digest_size=20)
+    with open(filepath, 'rb') as source_file:
+        for chunk in iter(lambda: source_file.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    os.makedirs(cache_dir, exist_ok=True)
+    with _INDEX_LOCK:
+        # Read again, other files may have been hashed in the meantime
+        index = _read_index(index_path)
+        index[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': digest.hexdigest()}
+        partial_path = f'{index_path}.{os.getpid()}.partial'
+        with open(partial_path, 'w', encoding='utf-8') as index_file:
+            json.dump(index, index_file, indent=1)
+        os.replace(partial_path, index_path)
+    return digest.hexdigest()
+
+
+def find_cache(mdb_path, cache_dir=None):
+    """Path of an up to date mirror of mdb_path, or None if it has to be imported."""
+    cache_dir = cache_dir or default_cache_dir()
+    if not os.path.isdir(cache_dir):
+        return None
+    mdb_hash = file_hash(mdb_path, cache_dir)
+    for name in os.listdir(cache_dir):
+        if name.endswith(f'_{mdb_hash[:16]}.sqlite'):
+            cache_path = os.path.join(cache_dir, name)
+            meta = read_cache_meta(cache_path)
+            if meta.get('file_hash') == mdb_hash and meta.get('format') == CACHE_FORMAT:
+                return cache_path
+    return None
+
+
+def read_cache_meta(cache_path):
+    try:
+        conn = sqlite3.connect(f'file:{cache_path}?mode=ro', uri=True)
+        try:
+            return dict(conn.execute('SELECT key, value FROM cache_meta').fetchall())
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return {}
+
+
+def open_cache(cache_path, check_same_thread=True):
+    """Open a mirror for reading. Dates are returned as datetime objects, as with ODBC."""
+    return sqlite3.connect(cache_path, detect_types=sqlite3.PARSE_DECLTYPES,
+                           check_same_thread=check_same_thread)
+
+
+def iter_query(connection, SQL, batch_size=FETCH_BATCH_SIZE):
+    """Stream the rows of a statement in batches instead of materializing them with fetchall()."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(SQL)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield cursor.description, rows
+    finally:
+        cursor.close()
+
+
+def _declared_type(python_type):
+    """SQLite declared type for a source column of the given Python type."""
+    if not isinstance(python_type, type):
+        return ''
+    if issubclass(python_type, datetime.datetime):
+        return 'ITU_DATETIME'
+    if issubclass(python_type, datetime.date):
+        return 'ITU_DATE'
+    if issubclass(python_type, (bool, int)):
+        return 'INTEGER'
+    if issubclass(python_type, (float, decimal.Decimal)):
+        return 'REAL'
+    if issubclass(python_type, str):
+        return 'TEXT COLLATE NOCASE'
+    if issubclass(python_type, (bytes, bytearray)):
+        return 'BLOB'
+    return ''
+
+
+def _to_sqlite(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(' ')
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+def connect_odbc(mdb_path):
+    """Connect to the .mdb through the Microsoft Access ODBC driver (Windows only)."""
+    import pyodbc
+
+    return pyodbc.connect(f'DRIVER={{Microsoft Access Driver (*.mdb, *.accdb)}};DBQ={mdb_path}')
+
+
+class OdbcSource:
+    """
+    ITU database read through the Access ODBC driver.
+
+    Sources give the column names and Python types of a table and stream its rows with
+    iter_rows(table, columns, where, keep); where is the SQL form of the (column, keys) filter keep.
+    """
+    def __init__(self, mdb_path):
+        self.connection = connect_odbc(mdb_path)
+
+    def close(self):
+        self.connection.close()
+
+    def columns(self, table):
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(f'SELECT * FROM {table} WHERE 1=0;')
+            return [(column[0], column[1]) for column in cursor.description]
+        finally:
+            cursor.close()
+
+    def iter_rows(self, table, columns=None, where='', keep=None):
+        select = ', '.join(columns) if columns else '*'
+        for _, rows in iter_query(self.connection, f'SELECT {select} FROM {table} {where};'):
+            yield from rows
+
+
+class MdbSource:
+    """ITU database decoded straight from the .mdb file by mdb_reader, on any platform."""
+    def __init__(self, mdb_path):
+        from mdb_reader import MdbFile
+
+        self.mdb = MdbFile(mdb_path)
+
+    def close(self):
+        self.mdb.close()
+
+    def columns(self, table):
+        return [(column.name, column.python_type) for column in self.mdb.table(table).columns]
+
+    def iter_rows(self, table, columns=None, where='', keep=None):
+        if keep is None:
+            yield from self.mdb.iter_rows(table, columns)
+            return
+        key_column, keys = keep
+        names = list(columns or self.mdb.table(table).column_names())
+        for row in self.mdb.iter_rows(table, names + [key_column]):
+            if row[-1] in keys:
+                yield row[:-1]
+
+
+def open_source(mdb_path, backend=None):
+    """
+    Source for reading an .mdb: 'odbc', 'mdb' or 'auto' (default, or the RAS_DB_BACKEND variable),
+    which uses the Access ODBC driver when it is installed and the pure-Python reader otherwise.
+    """
+    backend = backend or os.environ.get('RAS_DB_BACKEND', 'auto')
+    if backend not in ('auto', 'odbc', 'mdb'):
+        raise ValueError(f'Unknown ITU database backend {backend}')
+    if backend != 'mdb':
+        try:
+            return OdbcSource(mdb_path)
+        except Exception:
+            # pyodbc or the Access driver is not available (e.g. on Linux)
+            if backend == 'odbc':
+                raise
+    return MdbSource(mdb_path)
+
+
+def _batched(rows, batch_size=FETCH_BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _copy_table(source, target, table, where, keep):
+    columns = source.columns(table)
+    declarations = ', '.join(f'"{name}" {_declared_type(python_type)}' for name, python_type in columns)
+    target.execute(f'CREATE TABLE "{table}" ({declarations});')
+    insert = f'INSERT INTO "{table}" VALUES ({", ".join("?" * len(columns))});'
+    for rows in _batched(source.iter_rows(table, where=where, keep=keep)):
+        target.executemany(insert, ([_to_sqlite(value) for value in row] for row in rows))
+
+
+def import_snapshot(source, mdb_path, cache_dir=None, progress=None):
+    """
+    Copy the RAS-relevant tables from a source (see open_source) into a new mirror and return
+    its path. The mirror is written under a temporary name and renamed when complete.
+    """
+    cache_dir = cache_dir or default_cache_dir()
+    os.makedirs(cache_dir, exist_ok=True)
+    mdb_hash = file_hash(mdb_path, cache_dir)
+
+    rows = source.iter_rows('srs_ooak', ['d_create', 'comment'])
+    try:
+        d_create, comment = next(rows)
+    finally:
+        rows.close()
+    version = (comment or '')[0:7]
+    safe_version = re.sub(r'[^0-9A-Za-z]+', '_', version).strip('_') or 'unknown'
+    cache_path = os.path.join(cache_dir, f'ITU_{safe_version}_{mdb_hash[:16]}.sqlite')
+    partial_path = cache_path + '.partial'
+    if os.path.exists(partial_path):
+        os.remove(partial_path)
+
+    target = sqlite3.connect(partial_path)
+    completed = False
+    try:
+        target.execute('PRAGMA journal_mode=OFF;')
+        target.execute('PRAGMA synchronous=OFF;')
+        for index, (table, where, rule) in enumerate(CACHED_TABLES):
+            if progress:
+                progress(index, len(CACHED_TABLES), table)
+            keep = (rule[0], KEY_SETS[rule[1]](target)) if rule else None
+            _copy_table(source, target, table, where, keep)
+        for create_index in CACHE_INDEXES:
+            target.execute(create_index)
+        target.execute('CREATE TABLE cache_meta (key TEXT PRIMARY KEY, value TEXT);')
+        target.executemany('INSERT INTO cache_meta VALUES (?, ?);', [
+            ('format', CACHE_FORMAT),
+            ('version', version),
+            ('d_create', str(d_create)),
+            ('file_hash', mdb_hash),
+            ('source', os.path.basename(mdb_path)),
+            ('imported', datetime.datetime.now().isoformat(' ', 'seconds')),
+        ])
+        target.commit()
+        if progress:
+            progress(len(CACHED_TABLES), len(CACHED_TABLES), None)
+        completed = True
+    finally:
+        target.close()
+        if not completed:
+            # Failed or cancelled through the progress callback
+            os.remove(partial_path)
+    os.replace(partial_path, cache_path)
+    return cache_path
+
+
+def prepare_cache(database_path, cache_dir=None, progress=None, backend=None):
+    """
+    Path of the mirror to use for an ITU database. A mirror file is used as it is; for an .mdb
+    the matching mirror is looked up, importing it first if there is none yet.
+    """
+    if database_path.lower().endswith('.sqlite'):
+        return database_path
+    cache_path = find_cache(database_path, cache_dir)
+    if cache_path is None:
+        source = open_source(database_path, backend)
+        try:
+            cache_path = import_snapshot(source, database_path, cache_dir, progress)
+        finally:
+            source.close()
+    return cache_path
+
+
+def open_itu_database(database_path, cache_dir=None, progress=None, backend=None):
+    """Return (connection, cache_path) for an ITU database, see prepare_cache."""
+    cache_path = prepare_cache(database_path, cache_dir, progress, backend)
+    return open_cache(cache_path), cache_path
@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""
+Bulk extraction layer for the RAS part of the ITU IFIC database.
+
+Instead of querying the child tables once per station/beam, every table is pulled
+once (restricted to ntc_type='R' notices) and indexed in memory, so exporters run
+a constant number of queries no matter how many stations the snapshot holds.
+
+@author: boris.sorokin@skao.int
+"""
+import csv
+import os
+import threading
+import time
+from collections import namedtuple
+
+from itu_cache import FETCH_BATCH_SIZE
+
+# Sub-query selecting the notices of radio astronomy stations
+RAS_NOTICES = "SELECT ntc_id FROM com_el WHERE ntc_type='R'"
+
+COM_EL_COLUMNS = ('ntc_id', 'adm', 'ctry', 'stn_name', 'long_dec', 'lat_dec')
+E_STN_COLUMNS = ('long_deg', 'long_ew', 'long_min', 'long_sec', 'lat_deg', 'lat_ns', 'lat_min', 'lat_sec',
+                 'elev_min', 'elev_max', 'azm_fr', 'azm_to', 'ant_alt')
+E_ANT_COLUMNS = ('beam_name', 'pattern_id', 'ant_diam', 'gain', 'attch_e')
+GRP_COLUMNS = ('grp_id', 'noise_t', 'freq_min', 'freq_max', 'd_inuse', 'd_rcv', 'wic_no', 'd_upd', 'ra_stn_type')
+NOTICE_COLUMNS = ('ntc_id', 'adm', 'ctry', 'stn_name', 'prov', 'd_rcv', 'long_dec', 'lat_dec')
+
+# ITU geographical area codes, https://www.itu.int/en/ITU-R/terrestrial/fmd/Pages/geo_area_list.aspx
+COUNTRY_CODES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'geographical-areas.csv')
+
+StationRow = namedtuple('StationRow', COM_EL_COLUMNS)
+SiteRow = namedtuple('SiteRow', E_STN_COLUMNS)
+BeamRow = namedtuple('BeamRow', E_ANT_COLUMNS)
+GroupRow = namedtuple('GroupRow', GRP_COLUMNS)
+NoticeRow = namedtuple('NoticeRow', NOTICE_COLUMNS)
+QueryStats = namedtuple('QueryStats', 'calls rows seconds')
+
+
+class CountryCodes:
+    """
+    ITU geographical area codes and names of a CSV file, with maps in both directions.
+    The file is parsed again only when its modification time changes.
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.mtime = None
+        self.names = {}
+        self.codes = {}
+
+    def refresh(self):
+        mtime = os.stat(self.filepath).st_mtime_ns
+        if mtime != self.mtime:
+            names = {}
+            with open(self.filepath, newline='') as csvfile:
+                for row in csv.reader(csvfile):
+                    names[row[0]] = row[1]
+            codes = {}
+            for code, name in names.items():
+                codes.setdefault(name, code)
+            # New dicts rather than updates, readers holding the old ones are not disturbed
+            self.names, self.codes, self.mtime = names, codes, mtime
+        return self
+
+    def name_of(self, code, default='Unknown'):
+        return self.names.get(code, default)
+
+    def code_of(self, name, default=None):
+        return self.codes.get(name, default)
+
+
+_country_codes = {}
+_country_codes_lock = threading.Lock()
+
+
+def country_codes_registry(filepath=None):
+    """Process-wide CountryCodes of a file (the shipped one by default), up to date with the file."""
+    filepath = os.path.abspath(filepath or COUNTRY_CODES_FILE)
+    with _country_codes_lock:
+        registry = _country_codes.get(filepath)
+        if registry is None:
+            registry = _country_codes[filepath] = CountryCodes(filepath)
+        return registry.refresh()
+
+
+def load_country_codes(filepath=None):
+    """
+    Loads country codes and their corresponding names from a CSV file to
+    establish a link between ITU country codes and country names.
+    The returned dict is shared, it must not be modified.
+    """
+    return country_codes_registry(filepath).names
+
+
+def read_version(connection):
+    """(d_create, version) of the ITU database, version being the first 7 characters of the srs_ooak comment."""
+    return ItuRepository(connection).version()
+
+
+def fetch_rows(connection, SQL):
+    """Run a single statement on a DB-API connection and return all rows."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(SQL)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+class ItuRepository:
+    """
+    All queries run on an ITU database connection (the local SQLite cache or ODBC).
+
+    Values are always passed as ? parameters, never formatted into the SQL text, so every
+    query has one fixed statement: sqlite3 keeps it in the statement cache of the connection
+    and ODBC drivers reuse the prepared statement of the cursor, which is kept open for the
+    life of the repository. Beam names with quotes need no escaping either.
+    Rows are returned as the namedtuples of this module, and timings holds QueryStats of
+    the number of calls, rows and seconds spent per query name.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.cursor = connection.cursor()
+        self.timings = {}
+
+    def close(self):
+        self.cursor.close()
+
+    def _count(self, name, rows, seconds):
+        stats = self.timings.get(name, QueryStats(0, 0, 0.0))
+        self.timings[name] = QueryStats(stats.calls + 1, stats.rows + rows, stats.seconds + seconds)
+
+    def rows(self, name, SQL, parameters=(), row_type=None):
+        """All rows of a statement, as row_type if given; the time it takes is counted under name."""
+        started = time.perf_counter()
+        self.cursor.execute(SQL, parameters)
+        rows = self.cursor.fetchall()
+        if row_type is not None:
+            rows = [row_type(*row) for row in rows]
+        self._count(name, len(rows), time.perf_counter() - started)
+        return rows
+
+    def iter_rows(self, name, SQL, parameters=(), batch_size=FETCH_BATCH_SIZE):
+        """
+        Stream the rows of a statement in batches. A cursor of its own is used, so other
+        queries can run while the rows are consumed; the time of the fetches is counted under name.
+        """
+        cursor = self.connection.cursor()
+        count, seconds = 0, 0.0
+        try:
+            started = time.perf_counter()
+            cursor.execute(SQL, parameters)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                seconds += time.perf_counter() - started
+                if not rows:
+                    break
+                count += len(rows)
+                yield from rows
+                started = time.perf_counter()
+        finally:
+            cursor.close()
+            self._count(name, count, seconds)
+
+    def timing_report(self):
+        """One line per query name, the most expensive first."""
+        return [f'{name}: {stats.calls} call(s), {stats.rows} row(s), {stats.seconds * 1000:.1f} ms'
+                for name, stats in sorted(self.timings.items(), key=lambda item: -item[1].seconds)]
+
+    def version(self):
+        """(d_create, version) of the database, version being the first 7 characters of the srs_ooak comment."""
+        d_create, comment = self.rows('version', "SELECT d_create, comment FROM srs_ooak")[0]
+        return d_create, comment[0:7]
+
+    def ras_notices(self):
+        """NoticeRow of every radio astronomy station, by administration and name."""
+        return self.rows('ras_notices',
+                         f"SELECT {', '.join(NOTICE_COLUMNS)} FROM com_el WHERE ntc_type='R' ORDER BY adm asc, stn_name asc;",
+                         row_type=NoticeRow)
+
+    def get_station(self, ntc_id):
+        """StationRow of a notice, or None."""
+        rows = self.rows('station', f"SELECT {', '.join(COM_EL_COLUMNS)} FROM com_el WHERE ntc_id=?;",
+                         (ntc_id,), StationRow)
+        return rows[0] if rows else None
+
+    def get_sites(self, ntc_id):
+        return self.rows('sites', f"SELECT {', '.join(E_STN_COLUMNS)} FROM e_stn WHERE ntc_id=?;", (ntc_id,), SiteRow)
+
+    def get_beams(self, ntc_id):
+        return self.rows('beams', f"SELECT {', '.join(E_ANT_COLUMNS)} FROM e_ant WHERE ntc_id=?;", (ntc_id,), BeamRow)
+
+    def get_groups(self, ntc_id, beam_name):
+        return self.rows('groups', f"SELECT {', '.join(GRP_COLUMNS)} FROM grp WHERE ntc_id=? AND beam_name=?;",
+                         (ntc_id, beam_name), GroupRow)
+
+    def get_frequencies(self, ntc_id, beam_name):
+        """freq_mhz values of a beam."""
+        return [row[0] for row in self.rows('frequencies', "SELECT freq_mhz FROM freq WHERE ntc_id=? AND beam_name=?;",
+                                            (ntc_id, beam_name))]
+
+    def get_pattern(self, pattern_id):
+        """Antenna pattern name of a pattern_id, or None."""
+        rows = self.rows('pattern', "SELECT pattern FROM ant_type WHERE pattern_id=?;", (pattern_id,))
+        return rows[0][0] if rows else None
+
+
+class ItuSnapshot:
+    """
+    In-memory indexes of the RAS-relevant ITU tables.
+
+    Each of com_el, e_stn, e_ant, grp, freq and ant_type is read with one query.
+    Rows are kept in the order the database returns them, which is the order the
+    per-station queries used to see, so positional pairing (e.g. grp and freq rows
+    of a beam) stays the same. connection may also be an ItuRepository, whose timings
+    then include the extraction queries.
+    """
+    def __init__(self, connection):
+        repository = connection if isinstance(connection, ItuRepository) else ItuRepository(connection)
+        self.stations = repository.rows(
+            'snapshot com_el',
+            f"SELECT {', '.join(COM_EL_COLUMNS)} FROM com_el WHERE ntc_type='R' ORDER BY adm asc, stn_name asc;",
+            row_type=StationRow)
+
+        # ntc_id -> [SiteRow, ...]
+        self.sites = {}
+        for row in repository.rows('snapshot e_stn',
+                                   f"SELECT ntc_id, {', '.join(E_STN_COLUMNS)} FROM e_stn WHERE ntc_id IN ({RAS_NOTICES});"):
+            self.sites.setdefault(row[0], []).append(SiteRow(*row[1:]))
+
+        # ntc_id -> [BeamRow, ...]
+        self.beams = {}
+        for row in repository.rows('snapshot e_ant',
+                                   f"SELECT ntc_id, {', '.join(E_ANT_COLUMNS)} FROM e_ant WHERE ntc_id IN ({RAS_NOTICES});"):
+            self.beams.setdefault(row[0], []).append(BeamRow(*row[1:]))
+
+        # (ntc_id, beam_name) -> [GroupRow, ...]
+        self.groups = {}
+        for row in repository.rows('snapshot grp',
+                                   f"SELECT ntc_id, beam_name, {', '.join(GRP_COLUMNS)} FROM grp WHERE ntc_id IN ({RAS_NOTICES});"):
+            self.groups.setdefault((row[0], row[1]), []).append(GroupRow(*row[2:]))
+
+        # (ntc_id, beam_name) -> [freq_mhz, ...]
+        self.frequencies = {}
+        for row in repository.rows('snapshot freq',
+                                   f"SELECT ntc_id, beam_name, freq_mhz FROM freq WHERE ntc_id IN ({RAS_NOTICES});"):
+            self.frequencies.setdefault((row[0], row[1]), []).append(row[2])
+
+        # pattern_id -> pattern
+        self.patterns = {}
+        for row in repository.rows('snapshot ant_type',
+                                   f"SELECT pattern_id, pattern FROM ant_type WHERE pattern_id IN "
+                                   f"(SELECT pattern_id FROM e_ant WHERE ntc_id IN ({RAS_NOTICES}));"):
+            self.patterns.setdefault(row[0], row[1])
+
+    def __len__(self):
+        return len(self.stations)
+
+    def sites_of(self, ntc_id):
+        return self.sites.get(ntc_id, [])
+
+    def beams_of(self, ntc_id):
+        return self.beams.get(ntc_id, [])
+
+    def groups_of(self, ntc_id, beam_name):
+        return self.groups.get((ntc_id, beam_name), [])
+
+    def frequencies_of(self, ntc_id, beam_name):
+        return self.frequencies.get((ntc_id, beam_name), [])
+
+    def antenna_name(self, beam):
+        """Antenna pattern name of a beam, or the NonTypical description pointing to the IFIC attachment."""
+        if beam.pattern_id is not None and beam.pattern_id in self.patterns:
+            return self.patterns[beam.pattern_id]
+        if beam.ant_diam is None:
+            return 'NonTypical, see attachment {} to the relevant IFIC for details.'.format(beam.attch_e)
+        return 'NonTypical, submitted diameter is {} meters, see attachment {} to the relevant IFIC for details.'.format(
+            beam.ant_diam, beam.attch_e)
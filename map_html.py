@@ -0,0 +1,589 @@
+# -*- coding: utf-8 -*-
+"""
+HTML of the Leaflet station maps.
+
+Station data is handed to the page as one GeoJSON FeatureCollection; markers are created
+in the browser by L.geoJSON and added to the cluster group in chunks, and popup HTML is
+only built (and escaped) in the browser when a marker is clicked.
+
+The Site Link Wizard page is loaded once and receives each entry as a small JSON update.
+
+Large station sets (more than CANVAS_MARKER_THRESHOLD, which the RAS_DB_MAP_CANVAS_THRESHOLD
+environment variable sets) are drawn as dots on canvas tiles, with a spatial grid to find
+the station under the mouse for popups.
+
+Generated station map pages are kept in a small least recently used cache keyed by a hash of
+their inputs, so showing the same stations again does not generate the page again. Pages
+are published in that cache under rasmap://app/pages/ and loaded from there, as
+QWebEngineView.setHtml does not take pages over 2 MB (the GeoJSON of some ten thousand
+stations already exceeds that).
+
+@author: boris.sorokin@skao.int
+"""
+import base64
+import functools
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from map_resources import LOCAL_MAP_URLS, MAP_BASE_URL, PAGES_PATH
+
+MAP_PAGE_CACHE_SIZE = 8
+
+
+def _canvas_marker_threshold(default=5000):
+    try:
+        return int(os.environ.get('RAS_DB_MAP_CANVAS_THRESHOLD', default))
+    except ValueError:
+        return default
+
+
+# Number of stations above which maps draw dots on canvas tiles instead of DOM markers
+CANVAS_MARKER_THRESHOLD = _canvas_marker_threshold()
+
+
+@functools.lru_cache(maxsize=16)
+def _file_base64(path, mtime_ns, size):
+    with open(path, 'rb') as file:
+        return base64.b64encode(file.read()).decode('ascii')
+
+
+def file_base64(path):
+    """Base64 text of a file such as a marker icon, encoded again only when the file changes."""
+    stat = os.stat(path)
+    return _file_base64(path, stat.st_mtime_ns, stat.st_size)
+
+
+def map_page_fingerprint(station_data, *parameters):
+    """Hash of the station tuples and the other inputs of a map page."""
+    digest = hashlib.blake2b(repr(parameters).encode('utf-8'), digest_size=20)
+    digest.update(repr(station_data).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class MapPageCache:
+    """Map pages by fingerprint; beyond max_pages pages the least recently used one is dropped."""
+
+    def __init__(self, max_pages=MAP_PAGE_CACHE_SIZE):
+        self.max_pages = max_pages
+        self.pages = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.pages)
+
+    def get(self, key):
+        with self.lock:
+            return self.pages.get(key)
+
+    def page(self, key, build):
+        """Cached page of key, or the page returned by build(), which is then cached."""
+        with self.lock:
+            html = self.pages.get(key)
+            if html is not None:
+                self.pages.move_to_end(key)
+                return html
+        html = build()
+        with self.lock:
+            self.pages[key] = html
+            self.pages.move_to_end(key)
+            while len(self.pages) > self.max_pages:
+                self.pages.popitem(last=False)
+        return html
+
+
+_map_pages = MapPageCache()
+
+
+def stations_feature_collection(station_data):
+    """
+    GeoJSON FeatureCollection of (name, adm, ctr, lat, lon) station tuples. Stations without
+    numeric coordinates cannot be placed on the map and are left out.
+    """
+    features = []
+    for name, adm, ctr, lat, lon in station_data:
+        try:
+            coordinates = [float(lon), float(lat)]
+        except (TypeError, ValueError):
+            continue
+        features.append({
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': coordinates},
+            'properties': {'name': name, 'adm': adm, 'ctr': ctr},
+        })
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def json_for_script(value):
+    """Compact JSON that can be embedded in a <script> element."""
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False).replace('</', '<\\/')
+
+
+def stations_map_html(station_data, mode, icon_base64, urls=LOCAL_MAP_URLS, canvas_threshold=None):
+    """
+    Page showing the stations clustered on an OpenStreetMap map; mode is 'ITU' or 'WIKIDATA'.
+    urls are the map_resources.MapUrls the scripts, styles and tiles are loaded from. Above
+    canvas_threshold stations (CANVAS_MARKER_THRESHOLD by default) they are drawn as dots on
+    canvas tiles instead of clustered markers.
+    """
+    if canvas_threshold is None:
+        canvas_threshold = CANVAS_MARKER_THRESHOLD
+    stations_json = json_for_script(stations_feature_collection(station_data))
+    return f"""
+            <!DOCTYPE html>
+            <html>
+            <head>
+                <title>Full Widget Leaflet Map for Radio Astronomy Stations Database Tool</title>
+                <meta charset="utf-8" />
+                <link
+                    rel="stylesheet"
+                    href="{urls.leaflet_css}"
+                />
+                <link
+                    rel="stylesheet"
+                    href="{urls.markercluster_css}"
+                />
+                <link
+                    rel="stylesheet"
+                    href="{urls.markercluster_default_css}"
+                />
+                <script
+                    src="{urls.leaflet_js}">
+                </script>
+                <script
+                    src="{urls.markercluster_js}">
+                </script>
+                <style>
+                    body {{
+                        padding: 0;
+                        margin: 0;
+                    }}
+                    html, body, #map {{
+                        height: 100%;
+                        width: 100%;
+                    }}
+                    .custom-cluster-icon {{
+                        background: radial-gradient(circle, white 25%, transparent 75%);
+                        border-radius: 50%;
+                        border: 2px solid rgba(0, 0, 0, 0.5);
+                        text-align: center;
+                        color: black;
+                        font-size: 14px;
+                        font-weight: bold;
+                        width: 40px;
+                        height: 40px;
+                    }}
+                    .custom-cluster-icon img {{
+                        position: absolute;
+                        top: 50%;
+                        left: 50%;
+                        transform: translate(-50%, -50%);
+                        width: 30px;
+                        height: 30px;
+                    }}
+                    .custom-cluster-icon .cluster-count {{
+                        position: absolute;
+                        top: -10px;
+                        right: -10px;
+                        background: red;
+                        color: white;
+                        border-radius: 50%;
+                        width: 20px;
+                        height: 20px;
+                        display: flex;
+                        justify-content: center;
+                        align-items: center;
+                        font-size: 12px;
+                    }}
+                </style>
+            </head>
+            <body>
+                <div id="map"></div>
+
+                <script>
+                    var stations = {stations_json};
+                    var mode = {json_for_script(mode)};
+                    var iconUrl = 'data:image/webp;base64,{icon_base64}';
+                    var canvasThreshold = {int(canvas_threshold)};
+
+                    var map = L.map('map', {{attributionControl: false}}).setView([0, 0], 2);
+                    var myAttrControl = L.control.attribution().addTo(map);
+                    myAttrControl.setPrefix('<a href="https://leafletjs.com/">Leaflet</a>');
+
+                    L.tileLayer(
+                        '{urls.tiles}', {{
+                        attribution: 'Map data by &copy; <a href="http://www.openstreetmap.org/copyright">OpenStreetMap</a>, under <a href="https://opendatacommons.org/licenses/odbl/">ODbL.</a>',
+                        maxZoom: 18,
+                        }}).addTo(map);
+
+                    var customIcon = L.icon({{
+                        iconUrl: iconUrl,
+                        iconSize: [30, 30],
+                        iconAnchor: [15, 15],
+                        popupAnchor: [0, 0]
+                    }});
+
+                    function escapeHtml(value) {{
+                        return String(value === null || value === undefined ? '' : value)
+                            .replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;')
+                            .replace(/"/g, '&quot;').replace(/'/g, '&#39;');
+                    }}
+
+                    // Popups are built when they are opened, not for every station up front
+                    function stationPopup(station) {{
+                        var name = '<b>' + escapeHtml(station.name) + '</b><br>';
+                        if (mode === 'WIKIDATA') {{
+                            var source = escapeHtml(station.adm);
+                            var link = /^https?:\\/\\//i.test(station.adm)
+                                ? '<a href="' + source + '" target="_blank" rel="noopener noreferrer">' + source + '</a>'
+                                : source;
+                            return name + 'Geographical area: <b>' + escapeHtml(station.ctr) + '</b><br>'
+                                + 'Wikidata source: ' + link;
+                        }}
+                        return name + 'Region country code: <b>' + escapeHtml(station.ctr) + '</b><br>'
+                            + 'Responsible administration: <b>' + escapeHtml(station.adm) + '</b>';
+                    }}
+
+                    function addMarkerLayer() {{
+                        var markers = L.markerClusterGroup({{
+                            maxClusterRadius: 50,
+                            chunkedLoading: true,
+                            iconCreateFunction: function(cluster) {{
+                                var childCount = cluster.getChildCount();
+                                return L.divIcon({{
+                                    html: '<div><img src="' + iconUrl + '" alt="cluster-icon"/><div class="cluster-count">' + childCount + '</div></div>',
+                                    className: 'custom-cluster-icon',
+                                    iconSize: [40, 40]
+                                }});
+                            }}
+                        }});
+                        markers.bindPopup(function(layer) {{
+                            return stationPopup(layer.feature.properties);
+                        }});
+
+                        var stationLayer = L.geoJSON(stations, {{
+                            pointToLayer: function(feature, latlng) {{
+                                return L.marker(latlng, {{icon: customIcon}});
+                            }}
+                        }});
+                        markers.addLayers(stationLayer.getLayers());
+                        map.addLayer(markers);
+                    }}
+
+                    // Many stations: dots drawn on canvas tiles instead of one DOM marker each. Stations
+                    // are bucketed in a grid of GRID_DEGREES cells, which gives the stations to draw on a
+                    // tile and the stations near the mouse for popups without looking at all of them.
+                    function addCanvasLayer() {{
+                        var GRID_DEGREES = 1, RADIUS = 4, HIT_RADIUS = 8;
+                        var color = mode === 'WIKIDATA' ? '#1f77b4' : '#d62728';
+                        var features = stations.features;
+                        var grid = {{}};
+                        features.forEach(function(feature, index) {{
+                            var coordinates = feature.geometry.coordinates;
+                            var key = Math.floor(coordinates[1] / GRID_DEGREES) + ',' + Math.floor(coordinates[0] / GRID_DEGREES);
+                            (grid[key] = grid[key] || []).push(index);
+                        }});
+
+                        function latLngOf(index) {{
+                            var coordinates = features[index].geometry.coordinates;
+                            return L.latLng(coordinates[1], coordinates[0]);
+                        }}
+
+                        // Stations in the grid cells overlapping the box between two corners
+                        function stationsIn(northWest, southEast) {{
+                            var found = [];
+                            var firstRow = Math.floor(Math.max(southEast.lat, -90) / GRID_DEGREES);
+                            var lastRow = Math.floor(Math.min(northWest.lat, 90) / GRID_DEGREES);
+                            var firstColumn = Math.floor(Math.max(northWest.lng, -180) / GRID_DEGREES);
+                            var lastColumn = Math.floor(Math.min(southEast.lng, 180) / GRID_DEGREES);
+                            for (var row = firstRow; row <= lastRow; row++) {{
+                                for (var column = firstColumn; column <= lastColumn; column++) {{
+                                    var cell = grid[row + ',' + column];
+                                    for (var i = 0; cell && i < cell.length; i++) {{
+                                        found.push(cell[i]);
+                                    }}
+                                }}
+                            }}
+                            return found;
+                        }}
+
+                        var CanvasLayer = L.GridLayer.extend({{
+                            createTile: function(coords) {{
+                                var tile = L.DomUtil.create('canvas', 'leaflet-tile');
+                                var size = this.getTileSize();
+                                tile.width = size.x;
+                                tile.height = size.y;
+                                var origin = coords.scaleBy(size);
+                                // Dots of stations just outside the tile reach into it
+                                var northWest = map.unproject(origin.subtract([RADIUS, RADIUS]), coords.z);
+                                var southEast = map.unproject(origin.add(size).add([RADIUS, RADIUS]), coords.z);
+                                var context = tile.getContext('2d');
+                                context.fillStyle = color;
+                                context.strokeStyle = 'white';
+                                context.beginPath();
+                                stationsIn(northWest, southEast).forEach(function(index) {{
+                                    var point = map.project(latLngOf(index), coords.z).subtract(origin);
+                                    context.moveTo(point.x + RADIUS, point.y);
+                                    context.arc(point.x, point.y, RADIUS, 0, 2 * Math.PI);
+                                }});
+                                context.fill();
+                                context.stroke();
+                                return tile;
+                            }}
+                        }});
+                        new CanvasLayer({{updateWhenZooming: false, zIndex: 10}}).addTo(map);
+
+                        // Closest station within HIT_RADIUS pixels of a position, or -1
+                        function stationAt(latlng) {{
+                            var zoom = map.getZoom();
+                            var position = map.project(latlng, zoom);
+                            var northWest = map.unproject(position.subtract([HIT_RADIUS, HIT_RADIUS]), zoom);
+                            var southEast = map.unproject(position.add([HIT_RADIUS, HIT_RADIUS]), zoom);
+                            var closest = -1, closestDistance = HIT_RADIUS;
+                            stationsIn(northWest, southEast).forEach(function(index) {{
+                                var distance = map.project(latLngOf(index), zoom).distanceTo(position);
+                                if (distance <= closestDistance) {{
+                                    closest = index;
+                                    closestDistance = distance;
+                                }}
+                            }});
+                            return closest;
+                        }}
+
+                        map.on('mousemove', function(event) {{
+                            map.getContainer().style.cursor = stationAt(event.latlng.wrap()) >= 0 ? 'pointer' : '';
+                        }});
+                        map.on('click', function(event) {{
+                            var latlng = event.latlng.wrap();
+                            var index = stationAt(latlng);
+                            if (index >= 0) {{
+                                // Open the popup on the copy of the world that was clicked
+                                var station = latLngOf(index);
+                                L.popup()
+                                    .setLatLng([station.lat, station.lng + event.latlng.lng - latlng.lng])
+                                    .setContent(stationPopup(features[index].properties))
+                                    .openOn(map);
+                            }}
+                        }});
+                    }}
+
+                    if (stations.features.length > canvasThreshold) {{
+                        addCanvasLayer();
+                    }} else {{
+                        addMarkerLayer();
+                    }}
+                </script>
+            </body>
+            </html>
+            """
+
+
+def cached_stations_map_html(station_data, mode, icon_path, urls=LOCAL_MAP_URLS, canvas_threshold=None):
+    """stations_map_html with the icon of a file, only generated if the same page is not cached yet."""
+    if canvas_threshold is None:
+        canvas_threshold = CANVAS_MARKER_THRESHOLD
+    icon_base64 = file_base64(icon_path)
+    key = map_page_fingerprint(station_data, mode, icon_base64, urls, canvas_threshold)
+    return _map_pages.page(key, lambda: stations_map_html(station_data, mode, icon_base64, urls, canvas_threshold))
+
+
+def publish_map_page(html):
+    """URL under which the map scheme serves the page, to load it with QWebEngineView.setUrl."""
+    key = hashlib.blake2b(html.encode('utf-8'), digest_size=20).hexdigest()
+    _map_pages.page(key, lambda: html)
+    return f'{MAP_BASE_URL}{PAGES_PATH[1:]}{key}.html'
+
+
+def published_map_page(path):
+    """UTF-8 HTML of a page published under PAGES_PATH, or None if it is unknown or no longer cached."""
+    if not (path.startswith(PAGES_PATH) and path.endswith('.html')):
+        return None
+    html = _map_pages.get(path[len(PAGES_PATH):-len('.html')])
+    return None if html is None else html.encode('utf-8')
+
+
+def wizard_entry_payload(station_data):
+    """
+    Update of the Site Link Wizard map for showEntry(): station_data holds the Wikidata entry as
+    (name, source, country, lat, lon) followed by the candidate ITU stations as (name, adm, ctr, lat, lon).
+    The Wikidata entry is None when it has no coordinates.
+    """
+    name, _, country, lat, lon = station_data[0]
+    try:
+        wikidata = {'name': name, 'country': country, 'lat': float(lat), 'lon': float(lon)}
+    except (TypeError, ValueError):
+        wikidata = None
+    stations = []
+    for name, adm, ctr, lat, lon in station_data[1:]:
+        try:
+            stations.append({'name': name, 'adm': adm, 'ctr': ctr, 'lat': float(lat), 'lon': float(lon)})
+        except (TypeError, ValueError):
+            continue
+    return {'wikidata': wikidata, 'stations': stations}
+
+
+def wizard_map_html(icon_base64, urls=LOCAL_MAP_URLS):
+    """
+    Page of the Site Link Wizard map. It is loaded once and every entry is then shown by
+    calling showEntry() with a wizard_entry_payload, which replaces the markers and moves the view.
+    """
+    return f"""
+            <!DOCTYPE html>
+            <html>
+            <head>
+                <title>Full Widget Leaflet Map for Site Link Wizard</title>
+                <meta charset="utf-8" />
+                <link
+                    rel="stylesheet"
+                    href="{urls.leaflet_css}"
+                />
+                <link
+                    rel="stylesheet"
+                    href="{urls.markercluster_css}"
+                />
+                <link
+                    rel="stylesheet"
+                    href="{urls.markercluster_default_css}"
+                />
+                <script
+                    src="{urls.leaflet_js}">
+                </script>
+                <script
+                    src="{urls.markercluster_js}">
+                </script>
+                <style>
+                    body {{
+                        padding: 0;
+                        margin: 0;
+                    }}
+                    html, body, #map {{
+                        height: 100%;
+                        width: 100%;
+                    }}
+                    #message {{
+                        display: none;
+                        position: absolute;
+                        top: 0;
+                        left: 0;
+                        right: 0;
+                        bottom: 0;
+                        z-index: 1000;
+                        padding: 1em;
+                        background: white;
+                    }}
+                    .custom-cluster-icon {{
+                        background: radial-gradient(circle, white 25%, transparent 75%);
+                        border-radius: 50%;
+                        border: 2px solid rgba(0, 0, 0, 0.5);
+                        text-align: center;
+                        color: black;
+                        font-size: 14px;
+                        font-weight: bold;
+                        width: 40px;
+                        height: 40px;
+                    }}
+                    .custom-cluster-icon img {{
+                        position: absolute;
+                        top: 50%;
+                        left: 50%;
+                        transform: translate(-50%, -50%);
+                        width: 30px;
+                        height: 30px;
+                    }}
+                    .custom-cluster-icon .cluster-count {{
+                        position: absolute;
+                        top: -10px;
+                        right: -10px;
+                        background: red;
+                        color: white;
+                        border-radius: 50%;
+                        width: 20px;
+                        height: 20px;
+                        display: flex;
+                        justify-content: center;
+                        align-items: center;
+                        font-size: 12px;
+                    }}
+                </style>
+            </head>
+            <body>
+                <div id="map"></div>
+                <div id="message">No coordinates for wikidata station to show the map</div>
+
+                <script>
+                    var iconUrl = 'data:image/webp;base64,{icon_base64}';
+
+                    var map = L.map('map', {{attributionControl: false}}).setView([0, 0], 2);
+                    var myAttrControl = L.control.attribution().addTo(map);
+                    myAttrControl.setPrefix('<a href="https://leafletjs.com/">Leaflet</a>');
+
+                    L.tileLayer(
+                        '{urls.tiles}', {{
+                        attribution: 'Map data by &copy; <a href="http://www.openstreetmap.org/copyright">OpenStreetMap</a>, under <a href="https://opendatacommons.org/licenses/odbl/">ODbL.</a>',
+                        maxZoom: 18,
+                        }}).addTo(map);
+
+                    var redIcon = new L.Icon({{
+                        iconUrl: '{urls.red_marker}',
+                        shadowUrl: '{urls.marker_shadow}',
+                        iconSize: [25, 41],
+                        iconAnchor: [12, 41],
+                        popupAnchor: [1, -34],
+                        shadowSize: [41, 41]
+                    }});
+
+                    var customIcon = L.icon({{
+                        iconUrl: iconUrl,
+                        iconSize: [30, 30],
+                        iconAnchor: [15, 15],
+                        popupAnchor: [0, 0]
+                    }});
+
+                    var markers = L.markerClusterGroup({{
+                        maxClusterRadius: 50,
+                        iconCreateFunction: function(cluster) {{
+                            var childCount = cluster.getChildCount();
+                            return L.divIcon({{
+                                html: '<div><img src="' + iconUrl + '" alt="cluster-icon"/><div class="cluster-count">' + childCount + '</div></div>',
+                                className: 'custom-cluster-icon',
+                                iconSize: [40, 40]
+                            }});
+                        }}
+                    }});
+                    map.addLayer(markers);
+                    var wikidataMarker = null;
+
+                    function escapeHtml(value) {{
+                        return String(value === null || value === undefined ? '' : value)
+                            .replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;')
+                            .replace(/"/g, '&quot;').replace(/'/g, '&#39;');
+                    }}
+
+                    // Called by the wizard for every entry, the page itself is never reloaded
+                    function showEntry(entry) {{
+                        markers.clearLayers();
+                        if (wikidataMarker) {{
+                            map.removeLayer(wikidataMarker);
+                            wikidataMarker = null;
+                        }}
+                        var wikidata = entry.wikidata;
+                        document.getElementById('message').style.display = wikidata ? 'none' : 'block';
+                        if (!wikidata) {{
+                            return;
+                        }}
+                        markers.addLayers(entry.stations.map(function(station) {{
+                            return L.marker([station.lat, station.lon], {{icon: customIcon}}).bindPopup(
+                                'ITU station: <b>' + escapeHtml(station.name) + '</b><br>Region country code:<b>'
+                                + escapeHtml(station.ctr) + '</b><br>Responsible administration: <b>' + escapeHtml(station.adm) + '</b>');
+                        }}));
+                        map.setView([wikidata.lat, wikidata.lon], 16, {{animate: false}});
+                        wikidataMarker = L.marker([wikidata.lat, wikidata.lon], {{icon: redIcon}}).addTo(map).bindPopup(
+                            'Wikidata station: <b>' + escapeHtml(wikidata.name) + '</b><br>Country:<b>' + escapeHtml(wikidata.country) + '</b>'
+                        ).openPopup();
+                    }}
+                </script>
+            </body>
+            </html>
+            """
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+Local copies of everything the Leaflet map pages load: the Leaflet and MarkerCluster
+scripts and styles, marker images and OpenStreetMap tiles.
+
+Map pages refer to them under rasmap://app/ (see map_scheme.py, which serves that scheme
+to QtWebEngine, together with the generated map pages under PAGES_PATH). Scripts and
+styles come from the web_assets folder next to this file when they were bundled there
+(python map_resources.py downloads them), else from the assets folder of the local cache,
+where they are stored the first time they are fetched from the CDN. Tiles are kept in a
+disk cache with least recently used eviction, so repeated map opens do not touch the network.
+
+@author: boris.sorokin@skao.int
+"""
+import os
+import re
+import sys
+import threading
+import urllib.request
+from collections import OrderedDict, namedtuple
+
+from itu_cache import default_cache_dir
+
+MAP_SCHEME = 'rasmap'
+MAP_BASE_URL = f'{MAP_SCHEME}://app/'
+ASSETS_PATH = '/assets/'
+TILES_PATH = '/tiles/'
+PAGES_PATH = '/pages/'
+
+BUNDLED_ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'web_assets')
+
+LEAFLET_CDN = 'https://unpkg.com/leaflet@1.9.4/dist/'
+MARKERCLUSTER_CDN = 'https://unpkg.com/leaflet.markercluster@1.5.3/dist/'
+COLOR_MARKERS_CDN = 'https://raw.githubusercontent.com/pointhi/leaflet-color-markers/master/img/'
+OSM_TILE_URL = 'https://tile.openstreetmap.org/{z}/{x}/{y}.png'
+MAX_ZOOM = 19
+
+# Name under ASSETS_PATH -> CDN URL of every file the map pages use
+MAP_ASSETS = {
+    'leaflet.css': LEAFLET_CDN + 'leaflet.css',
+    'leaflet.js': LEAFLET_CDN + 'leaflet.js',
+    # Referenced by leaflet.css relative to itself
+    'images/layers.png': LEAFLET_CDN + 'images/layers.png',
+    'images/layers-2x.png': LEAFLET_CDN + 'images/layers-2x.png',
+    'images/marker-icon.png': LEAFLET_CDN + 'images/marker-icon.png',
+    'images/marker-icon-2x.png': LEAFLET_CDN + 'images/marker-icon-2x.png',
+    'images/marker-shadow.png': LEAFLET_CDN + 'images/marker-shadow.png',
+    'MarkerCluster.css': MARKERCLUSTER_CDN + 'MarkerCluster.css',
+    'MarkerCluster.Default.css': MARKERCLUSTER_CDN + 'MarkerCluster.Default.css',
+    'leaflet.markercluster.js': MARKERCLUSTER_CDN + 'leaflet.markercluster.js',
+    'marker-icon-red.png': COLOR_MARKERS_CDN + 'marker-icon-red.png',
+}
+
+CONTENT_TYPES = {'.js': 'application/javascript', '.css': 'text/css', '.png': 'image/png', '.html': 'text/html'}
+USER_AGENT = 'ITU-RAS-DB-Tool (https://github.com/iausathub/ITU-RAS-DB-Tool)'
+
+MapUrls = namedtuple('MapUrls', 'leaflet_css leaflet_js markercluster_css markercluster_default_css '
+                                'markercluster_js red_marker marker_shadow tiles')
+
+
+def map_urls(local=True):
+    """URLs of the map resources, under MAP_BASE_URL if local, else on the CDNs and OpenStreetMap."""
+    def asset(name):
+        return MAP_BASE_URL + ASSETS_PATH[1:] + name if local else MAP_ASSETS[name]
+    return MapUrls(asset('leaflet.css'), asset('leaflet.js'), asset('MarkerCluster.css'),
+                   asset('MarkerCluster.Default.css'), asset('leaflet.markercluster.js'),
+                   asset('marker-icon-red.png'), asset('images/marker-shadow.png'),
+                   MAP_BASE_URL + TILES_PATH[1:] + '{z}/{x}/{y}.png' if local else OSM_TILE_URL)
+
+
+LOCAL_MAP_URLS = map_urls(local=True)
+CDN_MAP_URLS = map_urls(local=False)
+
+
+def portable_html(html):
+    """Map page HTML with the local resource URLs replaced by the public ones, e.g. to save it to a file."""
+    for local, public in zip(LOCAL_MAP_URLS, CDN_MAP_URLS):
+        html = html.replace(local, public)
+    return html
+
+
+def register_map_scheme():
+    """
+    Declare the scheme to QtWebEngine (Qt 5.12 and later), to be called before QApplication
+    is created. Only QWebEngineUrlScheme is imported here, the handler (map_scheme.py) and
+    the network stack are imported with the first web view. Older versions of Qt accept the
+    handler without registration.
+    """
+    try:
+        from PyQt5.QtWebEngineCore import QWebEngineUrlScheme
+    except ImportError:
+        return
+    scheme = QWebEngineUrlScheme(MAP_SCHEME.encode())
+    scheme.setSyntax(QWebEngineUrlScheme.Syntax.Host)
+    scheme.setFlags(QWebEngineUrlScheme.SecureScheme | QWebEngineUrlScheme.CorsEnabled)
+    QWebEngineUrlScheme.registerScheme(scheme)
+
+
+def content_type(path):
+    return CONTENT_TYPES.get(os.path.splitext(path)[1].lower(), 'application/octet-stream')
+
+
+def fetch(url, timeout=30):
+    """Body of a GET request, with the User-Agent the OpenStreetMap tile usage policy asks for."""
+    request = urllib.request.Request(url, headers={'User-Agent': USER_AGENT})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.read()
+
+
+def _write_file(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(data)
+    os.replace(temporary, path)
+
+
+class TileCache:
+    """
+    Map tiles on disk as <directory>/<z>/<x>/<y>.png. Once the cache holds more than max_tiles
+    tiles or max_bytes bytes, the least recently used ones are deleted. Every hit updates the
+    modification time of the file, so the order of use survives restarts.
+    """
+
+    def __init__(self, directory, max_bytes=256 << 20, max_tiles=50_000):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_tiles = max_tiles
+        self.lock = threading.Lock()
+        # path -> size, least recently used first; read from the directory on first use
+        self.entries = None
+        self.total_bytes = 0
+
+    def _load(self):
+        if self.entries is not None:
+            return
+        found = []
+        for folder, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith('.png'):
+                    continue
+                path = os.path.join(folder, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                found.append((stat.st_mtime_ns, path, stat.st_size))
+        found.sort()
+        self.entries = OrderedDict((path, size) for _, path, size in found)
+        self.total_bytes = sum(self.entries.values())
+        self._evict()
+
+    def path(self, z, x, y):
+        return os.path.join(self.directory, str(z), str(x), f'{y}.png')
+
+    def __len__(self):
+        with self.lock:
+            self._load()
+            return len(self.entries)
+
+    def get(self, z, x, y):
+        """Tile data, or None if the tile is not cached."""
+        path = self.path(z, x, y)
+        with self.lock:
+            self._load()
+            if path not in self.entries:
+                return None
+            try:
+                with open(path, 'rb') as file:
+                    data = file.read()
+                os.utime(path)
+            except OSError:
+                self.total_bytes -= self.entries.pop(path)
+                return None
+            self.entries.move_to_end(path)
+            return data
+
+    def put(self, z, x, y, data):
+        path = self.path(z, x, y)
+        with self.lock:
+            self._load()
+            _write_file(path, data)
+            self.total_bytes += len(data) - self.entries.pop(path, 0)
+            self.entries[path] = len(data)
+            self._evict()
+
+    def _evict(self):
+        while self.entries and (len(self.entries) > self.max_tiles or self.total_bytes > self.max_bytes):
+            path, size = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class MapResources:
+    """
+    Resolves the paths requested under MAP_BASE_URL (ASSETS_PATH + asset name, or
+    TILES_PATH + z/x/y.png) to cached data and, on a miss, to the public URL to fetch.
+    Paths that are not known assets or valid tile coordinates resolve to nothing.
+    """
+
+    def __init__(self, cache_dir=None, bundled_dir=BUNDLED_ASSETS_DIR, max_tile_bytes=256 << 20, max_tiles=50_000):
+        cache_dir = cache_dir or default_cache_dir()
+        self.bundled_dir = bundled_dir
+        self.assets_dir = os.path.join(cache_dir, 'map_assets')
+        self.tiles = TileCache(os.path.join(cache_dir, 'map_tiles'), max_tile_bytes, max_tiles)
+
+    def _resolve(self, path):
+        """('asset', name), ('tile', (z, x, y)) or (None, None)."""
+        if path.startswith(ASSETS_PATH) and path[len(ASSETS_PATH):] in MAP_ASSETS:
+            return 'asset', path[len(ASSETS_PATH):]
+        match = re.fullmatch(re.escape(TILES_PATH) + r'(\d+)/(\d+)/(\d+)\.png', path)
+        if match:
+            z, x, y = map(int, match.groups())
+            if z <= MAX_ZOOM and x < 2 ** z and y < 2 ** z:
+                return 'tile', (z, x, y)
+        return None, None
+
+    def remote_url(self, path):
+        kind, key = self._resolve(path)
+        if kind == 'asset':
+            return MAP_ASSETS[key]
+        if kind == 'tile':
+            return OSM_TILE_URL.format(z=key[0], x=key[1], y=key[2])
+        return None
+
+    def cached(self, path):
+        """Data of a resource if it is bundled or cached, else None."""
+        kind, key = self._resolve(path)
+        if kind == 'tile':
+            return self.tiles.get(*key)
+        if kind == 'asset':
+            for directory in (self.bundled_dir, self.assets_dir):
+                try:
+                    with open(os.path.join(directory, *key.split('/')), 'rb') as file:
+                        return file.read()
+                except OSError:
+                    pass
+        return None
+
+    def store(self, path, data):
+        """Keep the fetched data of a resource for the next requests."""
+        kind, key = self._resolve(path)
+        if kind == 'tile':
+            self.tiles.put(*key, data)
+        elif kind == 'asset':
+            _write_file(os.path.join(self.assets_dir, *key.split('/')), data)
+
+
+def download_assets(directory=BUNDLED_ASSETS_DIR):
+    """Fetch all MAP_ASSETS into directory, e.g. to bundle them for hosts without internet access."""
+    for name, url in MAP_ASSETS.items():
+        _write_file(os.path.join(directory, *name.split('/')), fetch(url))
+        print(f'{url} -> {name}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    download_assets(*sys.argv[1:2])
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+QtWebEngine handler of the rasmap: scheme, serving the map pages from MapResources.
+
+Cached resources are read from disk on worker threads, so neither the tile cache index
+(built on first use from the files of the cache) nor the reads block the GUI thread.
+Misses are fetched asynchronously with QNetworkAccessManager, stored and then answered;
+concurrent requests of the same resource share one lookup and download. This module
+imports QtWebEngine and QtNetwork, so it is only imported together with the first web
+view (the scheme is declared before QApplication by map_resources.register_map_scheme).
+
+@author: boris.sorokin@skao.int
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5 import sip
+from PyQt5.QtCore import QBuffer, QIODevice, QUrl, pyqtSignal
+from PyQt5.QtNetwork import QNetworkAccessManager, QNetworkReply, QNetworkRequest
+from PyQt5.QtWebEngineCore import QWebEngineUrlRequestJob, QWebEngineUrlSchemeHandler
+
+from map_html import published_map_page
+from map_resources import MAP_SCHEME, PAGES_PATH, USER_AGENT, MapResources, content_type
+
+
+class MapSchemeHandler(QWebEngineUrlSchemeHandler):
+    # path, cached data or None; emitted from the disk threads, handled on the GUI thread
+    lookedUp = pyqtSignal(str, object)
+
+    def __init__(self, resources=None, parent=None):
+        super().__init__(parent)
+        self.resources = resources or MapResources()
+        self.network = QNetworkAccessManager(self)
+        self.disk = ThreadPoolExecutor(max_workers=2, thread_name_prefix='rasmap')
+        self.lookedUp.connect(self._lookedUp)
+        # path -> jobs waiting for its lookup or download
+        self.pending = {}
+        # Index the tile cache before the first map asks for tiles
+        self.disk.submit(len, self.resources.tiles)
+
+    def requestStarted(self, job):
+        path = job.requestUrl().path()
+        # Generated map pages are in memory
+        if path.startswith(PAGES_PATH):
+            data = published_map_page(path)
+            if data is None:
+                job.fail(QWebEngineUrlRequestJob.UrlNotFound)
+            else:
+                self._reply(job, path, data)
+            return
+        if path in self.pending:
+            self.pending[path].append(job)
+            return
+        self.pending[path] = [job]
+        self.disk.submit(self._lookup, path)
+
+    def _lookup(self, path):
+        try:
+            data = self.resources.cached(path)
+        except OSError:
+            data = None
+        self.lookedUp.emit(path, data)
+
+    def _store(self, path, data):
+        try:
+            self.resources.store(path, data)
+        except OSError:
+            pass
+
+    def _lookedUp(self, path, data):
+        if data is not None:
+            self._finish(path, data)
+            return
+        url = self.resources.remote_url(path)
+        if url is None:
+            self._finish(path, None, QWebEngineUrlRequestJob.UrlNotFound)
+            return
+        request = QNetworkRequest(QUrl(url))
+        request.setRawHeader(b'User-Agent', USER_AGENT.encode())
+        request.setAttribute(QNetworkRequest.FollowRedirectsAttribute, True)
+        reply = self.network.get(request)
+        reply.finished.connect(lambda: self._fetched(path, reply))
+
+    def _fetched(self, path, reply):
+        reply.deleteLater()
+        data = None
+        if reply.error() == QNetworkReply.NoError:
+            data = bytes(reply.readAll())
+            self.disk.submit(self._store, path, data)
+        self._finish(path, data)
+
+    def _finish(self, path, data, error=QWebEngineUrlRequestJob.RequestFailed):
+        for job in self.pending.pop(path, []):
+            # Jobs of pages closed in the meantime are already deleted
+            if sip.isdeleted(job):
+                continue
+            if data is None:
+                job.fail(error)
+            else:
+                self._reply(job, path, data)
+
+    def _reply(self, job, path, data):
+        # The buffer has to outlive the reply, it is deleted with the job
+        buffer = QBuffer(job)
+        buffer.setData(data)
+        buffer.open(QIODevice.ReadOnly)
+        job.reply(content_type(path).encode(), buffer)
+
+
+_handler = None
+
+
+def install_map_scheme():
+    """Serve the scheme for the web views of the default profile (done once)."""
+    global _handler
+    if _handler is None:
+        from PyQt5.QtWebEngineWidgets import QWebEngineProfile
+
+        _handler = MapSchemeHandler()
+        QWebEngineProfile.defaultProfile().installUrlSchemeHandler(MAP_SCHEME.encode(), _handler)
+    return _handler
@@ -0,0 +1,416 @@
+# -*- coding: utf-8 -*-
+"""
+Pure-Python reader for Jet4 (Access 2000-2003) .mdb files.
+
+Tables are decoded straight from the file, one 4 KiB page at a time, and rows are
+yielded from a generator, so memory stays flat even for multi-GB IFIC snapshots and
+no Microsoft Access ODBC driver is needed. Only reading is supported; Jet3 files and
+encrypted databases are rejected.
+
+The file layout follows the description of the format published by the mdbtools project.
+
+@author: boris.sorokin@skao.int
+"""
+import datetime
+import decimal
+import functools
+import struct
+import uuid
+
+PAGE_SIZE = 4096
+
+PAGE_DATA = 0x01
+PAGE_TDEF = 0x02
+PAGE_USAGE_MAP = 0x05
+
+# Table definition of the system catalog
+CATALOG_PAGE = 2
+
+# Column types
+COL_BOOL = 0x01
+COL_BYTE = 0x02
+COL_INT = 0x03
+COL_LONGINT = 0x04
+COL_MONEY = 0x05
+COL_FLOAT = 0x06
+COL_DOUBLE = 0x07
+COL_DATETIME = 0x08
+COL_BINARY = 0x09
+COL_TEXT = 0x0A
+COL_OLE = 0x0B
+COL_MEMO = 0x0C
+COL_GUID = 0x0F
+COL_NUMERIC = 0x10
+COL_COMPLEX = 0x12
+
+COLUMN_PYTHON_TYPES = {
+    COL_BOOL: bool, COL_BYTE: int, COL_INT: int, COL_LONGINT: int, COL_MONEY: decimal.Decimal,
+    COL_FLOAT: float, COL_DOUBLE: float, COL_DATETIME: datetime.datetime, COL_BINARY: bytes,
+    COL_TEXT: str, COL_OLE: bytes, COL_MEMO: str, COL_GUID: str, COL_NUMERIC: decimal.Decimal,
+    COL_COMPLEX: int,
+}
+
+COLUMN_FLAG_FIXED = 0x01
+
+# Flags in the row offset table of data pages
+ROW_DELETED = 0x8000
+ROW_OVERFLOW = 0x4000
+ROW_OFFSET_MASK = 0x1FFF
+
+# Flags in the length field of memo/OLE values
+LVAL_INLINE = 0x80000000
+LVAL_SINGLE_PAGE = 0x40000000
+LVAL_LENGTH_MASK = 0x3FFFFFFF
+
+JET_EPOCH = datetime.datetime(1899, 12, 30)
+
+
+class MdbFormatError(Exception):
+    pass
+
+
+def _u16(buffer, offset):
+    return buffer[offset] | (buffer[offset + 1] << 8)
+
+
+def _u24(buffer, offset):
+    return buffer[offset] | (buffer[offset + 1] << 8) | (buffer[offset + 2] << 16)
+
+
+def _u32(buffer, offset):
+    return struct.unpack_from('<I', buffer, offset)[0]
+
+
+def decode_text(data):
+    """Decode Jet4 text, which is UCS-2 optionally using the 0xFF 0xFE 'compressed unicode' scheme."""
+    data = bytes(data)
+    if data[:2] != b'\xff\xfe':
+        return data.decode('utf-16-le', errors='replace')
+    # Compressed text alternates between 1-byte and 2-byte runs, a 0x00 byte toggles the mode
+    characters = []
+    compressed = True
+    index, length = 2, len(data)
+    while index < length:
+        if compressed:
+            end = data.find(b'\x00', index)
+            if end < 0:
+                end = length
+            characters.append(data[index:end].decode('latin-1'))
+            index = end + 1
+            compressed = False
+        elif data[index] == 0:
+            index += 1
+            compressed = True
+        elif index + 1 < length:
+            characters.append(data[index:index + 2].decode('utf-16-le', errors='replace'))
+            index += 2
+        else:
+            break
+    return ''.join(characters)
+
+
+def decode_datetime(value):
+    """Access dates are days since 1899-12-30; the time of day is the absolute fractional part."""
+    days = int(value)
+    seconds = round(abs(value - days) * 86400)
+    return JET_EPOCH + datetime.timedelta(days=days, seconds=seconds)
+
+
+def decode_numeric(data, scale):
+    # Sign byte followed by four little-endian 32-bit words, most significant word first
+    magnitude = 0
+    for word in struct.unpack_from('<4I', data, 1):
+        magnitude = (magnitude << 32) | word
+    value = decimal.Decimal(magnitude).scaleb(-scale)
+    return -value if data[0] & 0x80 else value
+
+
+class MdbColumn:
+    def __init__(self, entry, name):
+        self.name = name
+        self.type = entry[0]
+        self.number = _u16(entry, 5)
+        self.var_index = _u16(entry, 7)
+        self.precision = entry[11]
+        self.scale = entry[12]
+        self.flags = entry[15]
+        self.fixed_offset = _u16(entry, 21)
+        self.length = _u16(entry, 23)
+        self.is_fixed = bool(self.flags & COLUMN_FLAG_FIXED)
+
+    @property
+    def python_type(self):
+        return COLUMN_PYTHON_TYPES.get(self.type, bytes)
+
+    def __repr__(self):
+        return f'MdbColumn({self.name!r}, type=0x{self.type:02x})'
+
+
+class MdbTable:
+    def __init__(self, name, page, columns, num_rows, num_var_cols, usage_map):
+        self.name = name
+        self.page = page
+        self.columns = columns
+        self.num_rows = num_rows
+        self.num_var_cols = num_var_cols
+        self.usage_map = usage_map
+
+    def column_names(self):
+        return [column.name for column in self.columns]
+
+
+class MdbFile:
+    """
+    Read-only access to a Jet4 database file.
+
+        with MdbFile('ific.mdb') as mdb:
+            for row in mdb.iter_rows('com_el', ['ntc_id', 'stn_name']):
+                ...
+    """
+    def __init__(self, filepath, page_cache_size=256):
+        self.filepath = filepath
+        self._file = open(filepath, 'rb')
+        # Usage-map and memo pages are revisited often, data pages are streamed once
+        self._page = functools.lru_cache(maxsize=page_cache_size)(self._read_page)
+        header = self._read_page(0)
+        if header[0] != 0 or header[4:19] not in (b'Standard Jet DB', b'Standard ACE DB'):
+            self.close()
+            raise MdbFormatError(f'{filepath} is not an Access database')
+        if header[0x14] == 0:
+            self.close()
+            raise MdbFormatError('Jet3 (Access 97) databases are not supported')
+        self._tables = {}
+        self._catalog = None
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _read_page(self, page_number):
+        self._file.seek(page_number * PAGE_SIZE)
+        page = self._file.read(PAGE_SIZE)
+        if len(page) != PAGE_SIZE:
+            raise MdbFormatError(f'Page {page_number} is beyond the end of the file')
+        return page
+
+    @staticmethod
+    def _row_bounds(page, row):
+        """(start, end, flags) of a row on a data page; rows are stored from the end of the page backwards."""
+        if row >= _u16(page, 12):
+            raise MdbFormatError(f'Row {row} does not exist on the page')
+        raw_start = _u16(page, 14 + 2 * row)
+        end = PAGE_SIZE if row == 0 else _u16(page, 14 + 2 * (row - 1)) & ROW_OFFSET_MASK
+        return raw_start & ROW_OFFSET_MASK, end, raw_start & (ROW_DELETED | ROW_OVERFLOW)
+
+    def _row_data(self, page_number, row):
+        page = self._page(page_number)
+        start, end, _ = self._row_bounds(page, row)
+        return page[start:end]
+
+    def _read_table_definition(self, name, page_number):
+        page = self._page(page_number)
+        if page[0] != PAGE_TDEF:
+            raise MdbFormatError(f'Page {page_number} is not a table definition')
+        buffer = bytearray(page)
+        next_page = _u32(page, 4)
+        while next_page:
+            continuation = self._page(next_page)
+            buffer += continuation[8:]
+            next_page = _u32(continuation, 4)
+
+        num_rows = _u32(buffer, 16)
+        num_var_cols = _u16(buffer, 43)
+        num_cols = _u16(buffer, 45)
+        num_real_idx = _u32(buffer, 51)
+        usage_map = (buffer[55], _u24(buffer, 56))
+
+        offset = 63 + 12 * num_real_idx
+        entries = []
+        for _ in range(num_cols):
+            entries.append(bytes(buffer[offset:offset + 25]))
+            offset += 25
+        columns = []
+        for entry in entries:
+            name_length = _u16(buffer, offset)
+            column_name = decode_text(buffer[offset + 2:offset + 2 + name_length])
+            offset += 2 + name_length
+            columns.append(MdbColumn(entry, column_name))
+        columns.sort(key=lambda column: column.number)
+        return MdbTable(name, page_number, columns, num_rows, num_var_cols, usage_map)
+
+    def _owned_pages(self, table):
+        """Data pages of a table in ascending order, read from its usage map."""
+        row, page_number = table.usage_map
+        usage_map = self._row_data(page_number, row)
+        if usage_map[0] == 0:
+            # Inline map: start page followed by a bitmap
+            bitmaps = [(_u32(usage_map, 1), usage_map[5:])]
+        elif usage_map[0] == 1:
+            # Reference map: pointers to bitmap pages each covering (PAGE_SIZE - 4) * 8 pages
+            pages_per_map = (PAGE_SIZE - 4) * 8
+            bitmaps = []
+            for index in range((len(usage_map) - 1) // 4):
+                map_page = _u32(usage_map, 1 + 4 * index)
+                if map_page:
+                    map_data = self._page(map_page)
+                    if map_data[0] != PAGE_USAGE_MAP:
+                        raise MdbFormatError(f'Page {map_page} is not a usage map page')
+                    bitmaps.append((index * pages_per_map, map_data[4:]))
+        else:
+            raise MdbFormatError(f'Unknown usage map type {usage_map[0]}')
+
+        for first_page, bitmap in bitmaps:
+            for byte_index, byte in enumerate(bitmap):
+                if byte:
+                    for bit in range(8):
+                        if byte & (1 << bit):
+                            yield first_page + byte_index * 8 + bit
+
+    def _catalog_entries(self):
+        if self._catalog is None:
+            catalog = self._read_table_definition('MSysObjects', CATALOG_PAGE)
+            self._catalog = {}
+            for object_id, name, object_type in self._iter_table(catalog, ['Id', 'Name', 'Type']):
+                # Type 1 is a local table, the low three bytes of the Id are its definition page
+                if name is not None and object_type is not None and object_type & 0x7F == 1:
+                    self._catalog[name.lower()] = (name, object_id & 0x00FFFFFF)
+        return self._catalog
+
+    def table_names(self):
+        return [name for name, _ in self._catalog_entries().values() if not name.startswith('MSys')]
+
+    def table(self, name):
+        """Definition of a table, looked up case-insensitively as Access does."""
+        key = name.lower()
+        if key not in self._tables:
+            try:
+                table_name, page_number = self._catalog_entries()[key]
+            except KeyError:
+                raise MdbFormatError(f'Table {name} does not exist') from None
+            self._tables[key] = self._read_table_definition(table_name, page_number)
+        return self._tables[key]
+
+    def iter_rows(self, table_name, columns=None):
+        """Yield the rows of a table as tuples of the requested columns (all columns by default)."""
+        return self._iter_table(self.table(table_name), columns)
+
+    def _iter_table(self, table, columns=None):
+        if columns is None:
+            selected = list(range(len(table.columns)))
+        else:
+            positions = {column.name.lower(): index for index, column in enumerate(table.columns)}
+            try:
+                selected = [positions[name.lower()] for name in columns]
+            except KeyError as e:
+                raise MdbFormatError(f'Column {e.args[0]} does not exist in table {table.name}') from None
+
+        overflow_rows = set()
+        for page_number in self._owned_pages(table):
+            page = self._page(page_number) if page_number == table.page else self._read_page(page_number)
+            if page[0] != PAGE_DATA or _u32(page, 4) != table.page:
+                continue
+            for row in range(_u16(page, 12)):
+                start, end, flags = self._row_bounds(page, row)
+                if flags & ROW_DELETED or (page_number, row) in overflow_rows:
+                    continue
+                if flags & ROW_OVERFLOW:
+                    # The row was moved, the slot only holds a pointer to its new location
+                    target_row, target_page = page[start], _u24(page, start + 1)
+                    overflow_rows.add((target_page, target_row))
+                    target = self._read_page(target_page)
+                    target_start, target_end, _ = self._row_bounds(target, target_row)
+                    values = self._decode_row(table, target[target_start:target_end])
+                else:
+                    values = self._decode_row(table, page[start:end])
+                yield tuple(values[index] for index in selected)
+
+    def _decode_row(self, table, row):
+        row_cols = _u16(row, 0)
+        bitmask_size = (row_cols + 7) // 8
+        null_mask = row[len(row) - bitmask_size:]
+        if table.num_var_cols:
+            var_end = len(row) - bitmask_size - 2
+            row_var_cols = _u16(row, var_end)
+            var_offsets = [_u16(row, var_end - 2 - 2 * index) for index in range(row_var_cols + 1)]
+        else:
+            row_var_cols, var_offsets = 0, []
+        row_fixed_cols = row_cols - row_var_cols
+
+        values = []
+        fixed_found = 0
+        for column in table.columns:
+            byte_index, bit = divmod(column.number, 8)
+            present = byte_index < len(null_mask) and bool(null_mask[byte_index] & (1 << bit))
+            if column.type == COL_BOOL:
+                values.append(present)
+                if column.is_fixed:
+                    fixed_found += 1
+                continue
+            if column.is_fixed:
+                in_row = fixed_found < row_fixed_cols
+                fixed_found += 1
+                if not (in_row and present):
+                    values.append(None)
+                    continue
+                data = row[2 + column.fixed_offset:2 + column.fixed_offset + column.length]
+            else:
+                if not (column.var_index < row_var_cols and present):
+                    values.append(None)
+                    continue
+                data = row[var_offsets[column.var_index]:var_offsets[column.var_index + 1]]
+            values.append(self._decode_value(column, data))
+        return values
+
+    def _decode_value(self, column, data):
+        column_type = column.type
+        if column_type == COL_TEXT:
+            return decode_text(data)
+        if column_type == COL_LONGINT:
+            return struct.unpack_from('<i', data)[0]
+        if column_type == COL_DOUBLE:
+            return struct.unpack_from('<d', data)[0]
+        if column_type == COL_DATETIME:
+            return decode_datetime(struct.unpack_from('<d', data)[0])
+        if column_type == COL_INT:
+            return struct.unpack_from('<h', data)[0]
+        if column_type == COL_BYTE:
+            return data[0]
+        if column_type == COL_FLOAT:
+            return struct.unpack_from('<f', data)[0]
+        if column_type == COL_MONEY:
+            return decimal.Decimal(struct.unpack_from('<q', data)[0]).scaleb(-4)
+        if column_type == COL_MEMO:
+            return decode_text(self._read_long_value(data))
+        if column_type == COL_OLE:
+            return self._read_long_value(data)
+        if column_type == COL_NUMERIC:
+            return decode_numeric(data, column.scale)
+        if column_type == COL_GUID:
+            return '{' + str(uuid.UUID(bytes_le=bytes(data[:16]))).upper() + '}'
+        if column_type == COL_COMPLEX:
+            return struct.unpack_from('<i', data)[0]
+        return bytes(data)
+
+    def _read_long_value(self, data):
+        """Memo/OLE value: stored inline, in one row of an LVAL page, or in a chain of LVAL rows."""
+        length_field = _u32(data, 0)
+        length = length_field & LVAL_LENGTH_MASK
+        if length_field & LVAL_INLINE:
+            return bytes(data[12:12 + length])
+        row, page_number = data[4], _u24(data, 5)
+        if length_field & LVAL_SINGLE_PAGE:
+            return bytes(self._row_data(page_number, row)[:length])
+        chunks = []
+        remaining = length
+        while page_number and remaining > 0:
+            chunk = self._row_data(page_number, row)
+            # Each row of the chain starts with the pointer to the next one
+            row, page_number = chunk[0], _u24(chunk, 1)
+            chunks.append(chunk[4:4 + remaining])
+            remaining -= len(chunks[-1])
+        return b''.join(chunks)
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Headless batch exports of the RAS station database, without Qt.
+
+    python -m ras_db_cli export --mdb IFIC_2024.mdb --out-dir exports --formats csv,docx,sqlite
+
+The .mdb (or a cache file made from it) goes through the same extraction and export code
+as the GUI and the output files get the same default names. Progress is reported on stderr.
+
+@author: boris.sorokin@skao.int
+"""
+import argparse
+import os
+import sys
+import time
+
+from itu_cache import open_itu_database
+from itu_extract import ItuRepository, ItuSnapshot, load_country_codes
+from ras_exporters import DEFAULT_EXPORT_FORMATS, EXPORT_SINKS, export_all
+from wikidata_harvest import RecordedTransport, WikidataHarvester, sparqlwrapper_transport
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def progress_reporter(label, step=10):
+    """Progress callback printing every `step` percent of the stations processed."""
+    last = [-step]
+
+    def report(done, total):
+        percent = 100 * done // total if total else 100
+        if percent >= last[0] + step or done == total:
+            last[0] = percent
+            log(f'  {label}: {done} of {total} stations ({percent}%)')
+    return report
+
+
+def export_snapshot(database_path, out_dir, formats, cache_dir=None, backend=None,
+                    country_codes_file=None, wikidata=True, jobs=1, threaded=True, query_timings=False):
+    """
+    Export one ITU database to out_dir in the given formats and return the written paths.
+    The database is extracted once and the formats are written from that snapshot.
+    wikidata is True, False or the WikidataHarvester of the SQLite export.
+    """
+    if wikidata is True:
+        wikidata = WikidataHarvester(cache_dir=cache_dir)
+    started = time.perf_counter()
+
+    def report_import(done, total, table):
+        if table:
+            log(f'  importing table {table} ({done+1} of {total}) into local cache')
+
+    log(f'Opening {database_path}')
+    connection, cache_path = open_itu_database(database_path, cache_dir, report_import, backend)
+    try:
+        repository = ItuRepository(connection)
+        database_date, database_version = repository.version()
+        log(f'Database {database_version} published on {database_date.date()} (cache {cache_path})')
+        snapshot = ItuSnapshot(repository)
+        repository.close()
+    finally:
+        connection.close()
+    if query_timings:
+        for line in repository.timing_report():
+            log(f'  query {line}')
+    country_codes_to_names = load_country_codes(country_codes_file)
+
+    reporters = {name: progress_reporter(name) for name in formats}
+
+    def report_export(name, done, total):
+        reporters[name](done, total)
+
+    written = export_all(snapshot, country_codes_to_names, out_dir, f'{database_version}_{database_date.date()}',
+                         formats, report_export, threaded, jobs=jobs, wikidata=wikidata)
+    for filePath in written.values():
+        log(f'Wrote {filePath}')
+    if wikidata and wikidata.stats:
+        stats = wikidata.stats
+        if stats.from_cache:
+            log(f'  Wikidata: {stats.items} stations from the cache')
+        else:
+            log(f'  Wikidata: {stats.items} stations, {stats.fetched} new or modified, {stats.removed} removed')
+    log(f'Done with {database_path} in {time.perf_counter() - started:.1f} s')
+    return list(written.values())
+
+
+def parse_formats(value):
+    formats = [item.strip().lower() for item in value.split(',') if item.strip()]
+    unknown = [item for item in formats if item not in EXPORT_SINKS]
+    if unknown or not formats:
+        raise argparse.ArgumentTypeError(
+            f"unknown format(s) {', '.join(unknown) or value!r}, choose from {', '.join(EXPORT_SINKS)}")
+    return formats
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='ras_db_cli', description=__doc__.split('\n\n')[0].strip())
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export = commands.add_parser('export', help='export ITU databases to CSV, DOCX, CPS SQLite, Parquet and/or Arrow')
+    export.add_argument('--mdb', required=True, action='append',
+                        help='ITU .mdb snapshot or its .sqlite cache; can be given several times')
+    export.add_argument('--out-dir', required=True, help='directory the exports are written to')
+    export.add_argument('--formats', type=parse_formats, default=list(DEFAULT_EXPORT_FORMATS),
+                        help=f"comma separated list of {', '.join(EXPORT_SINKS)} (default: {','.join(DEFAULT_EXPORT_FORMATS)}); "
+                             "parquet and arrow need pyarrow")
+    export.add_argument('--cache-dir', help='location of the local cache (default: ~/.ras_db_cache)')
+    export.add_argument('--backend', choices=('auto', 'odbc', 'mdb'),
+                        help='how to read an .mdb that is not cached yet (default: auto)')
+    export.add_argument('--country-codes', help='ITU geographical areas CSV (default: the one shipped with the tool)')
+    export.add_argument('--no-wikidata', dest='wikidata', action='store_false',
+                        help='do not query Wikidata for the SQLite export')
+    export.add_argument('--wikidata-max-age', type=float, default=24,
+                        help='hours the harvested Wikidata stations are used without checking Wikidata for changes, '
+                             '0 to always check (default: 24)')
+    responses = export.add_mutually_exclusive_group()
+    responses.add_argument('--wikidata-replay', metavar='DIR',
+                           help='answer the Wikidata queries from the responses recorded in DIR instead of Wikidata')
+    responses.add_argument('--wikidata-record', metavar='DIR',
+                           help='record the responses of Wikidata to DIR, for --wikidata-replay')
+    export.add_argument('--jobs', type=int, default=1,
+                        help='worker processes rendering the DOCX annex, 0 for one per CPU core (default: 1)')
+    export.add_argument('--sequential', dest='threaded', action='store_false',
+                        help='write the formats one after the other instead of each on its own thread')
+    export.add_argument('--query-timings', action='store_true',
+                        help='report the number of calls, rows and time of each ITU query')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count() or 1
+    wikidata = False
+    if args.wikidata:
+        if args.wikidata_replay:
+            transport = RecordedTransport(args.wikidata_replay)
+        elif args.wikidata_record:
+            transport = RecordedTransport(args.wikidata_record, sparqlwrapper_transport())
+        else:
+            transport = None
+        wikidata = WikidataHarvester(transport, args.cache_dir, args.wikidata_max_age * 3600)
+    failed = 0
+    for database_path in args.mdb:
+        try:
+            export_snapshot(database_path, args.out_dir, args.formats, args.cache_dir, args.backend,
+                            args.country_codes, wikidata, jobs, args.threaded, args.query_timings)
+        except Exception as e:
+            log(f'Export of {database_path} failed: {e}')
+            failed += 1
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
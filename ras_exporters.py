@@ -0,0 +1,613 @@
+# -*- coding: utf-8 -*-
+"""
+Export writers for the RAS station data extracted from the ITU database.
+
+The writers only consume an ItuSnapshot (see itu_extract.py) and plain file objects,
+so they issue no queries of their own.
+
+@author: boris.sorokin@skao.int
+"""
+import collections
+import contextlib
+import csv
+import multiprocessing
+import os
+import re
+import shutil
+import sqlite3
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from docx_stream import StreamingDocument, paragraph_xml, heading_xml, PAGE_BREAK_XML
+
+CSV_FIELDS = ['Notice ID', 'Administration', 'Region/Location', 'Station name',
+              'Longitude', 'Latitude', 'Longitude Degrees',
+              'Longitude East/West', 'Longitude minutes', 'Longitude seconds',
+              'Latitude Degrees', 'Latitude North/South', 'Latitude minutes',
+              'Latitude seconds', 'Elevation minimum', 'Elevation maximum',
+              'Azimuth from', 'Azimuth to', 'Beam name', 'Antenna pattern ID',
+              'Antenna pattern Name', 'Centre frequency, MHz',
+              'Group ID', 'Noise Temp, K', 'Frequency minimum, MHz',
+              'Frequency maximum, MHz', 'Date brought into use', 'Date received',
+              'IFIC no (wic_no)', 'Date updated', 'VLBI Support code']
+
+# Number of station-level columns (com_el + e_stn) left blank on continuation rows
+CSV_STATION_COLUMNS = 18
+
+
+@contextlib.contextmanager
+def partial_output(filePath):
+    """
+    Temporary path to write an export (a file or a directory) to. It replaces filePath once the
+    block completes and is deleted if the block fails or is cancelled, so no truncated export
+    is ever left behind.
+    """
+    partial_path = filePath + '.partial'
+    try:
+        yield partial_path
+        if os.path.isdir(partial_path) and os.path.isdir(filePath):
+            shutil.rmtree(filePath)
+        os.replace(partial_path, filePath)
+    finally:
+        if os.path.isdir(partial_path):
+            shutil.rmtree(partial_path)
+        elif os.path.exists(partial_path):
+            os.remove(partial_path)
+
+
+def write_full_csv(snapshot, csv_writer, progress=None):
+    """
+    Write the flattened station/beam/group table. The first row of every station carries
+    the com_el and e_stn columns, the following rows of the same station leave them blank.
+    The e_stn columns of a notice without an e_stn row, and the frequency of a group without
+    a freq row, are left blank as well.
+    """
+    csv_writer.writerow(CSV_FIELDS)
+    station_number = len(snapshot.stations)
+    for index, station in enumerate(snapshot.stations):
+        ntc_id = station.ntc_id
+        for subindex_beam, beam in enumerate(snapshot.beams_of(ntc_id)):
+            ant_name = snapshot.antenna_name(beam)
+            freq_rows = snapshot.frequencies_of(ntc_id, beam.beam_name)
+            for subindex_group, grp_row in enumerate(snapshot.groups_of(ntc_id, beam.beam_name)):
+                frequency = str(freq_rows[subindex_group]) if subindex_group < len(freq_rows) else ''
+                beam_part = [beam.beam_name, beam.pattern_id, ant_name, frequency] + list(grp_row)
+                if subindex_beam == 0 and subindex_group == 0:
+                    sites = snapshot.sites_of(ntc_id)
+                    site_part = list(sites[0]) if sites else [''] * CSV_STATION_COLUMNS
+                    station_part = list(station) + site_part[:CSV_STATION_COLUMNS - len(station)]
+                else:
+                    station_part = [''] * CSV_STATION_COLUMNS
+                csv_writer.writerow(station_part + beam_part)
+        if progress:
+            progress(index + 1, station_number)
+
+
+CPS_SCHEMA = (
+    """
+    CREATE TABLE "Stations" (
+        "CPS Station ID"	INTEGER NOT NULL UNIQUE,
+        "Country"	TEXT,
+        "Short Name"	TEXT NOT NULL,
+        "Long Name"	TEXT,
+        "Type"	TEXT CHECK("Type" IN ('single dish', 'array', 'mixed', 'unknown')),
+        "Station longitude [deg]"	NUMERIC,
+        "Station latitude [deg]"	NUMERIC,
+        "Station altitude (amsl) [m]"	NUMERIC,
+        "Operational"	INTEGER,
+        "Used for science"	INTEGER,
+        "Min station frequency [MHz]"	NUMERIC,
+        "Max station frequency [MHz]"	NUMERIC,
+        "Contact / Website"	TEXT,
+        "Contact / Address"	TEXT,
+        "Contact / Phone"	TEXT,
+        "Contact / Email"	TEXT,
+        "Registered at ITU"	INTEGER,
+        "ITU Notice ID"	INTEGER,
+        "ITU responsible Administration"	TEXT,
+        PRIMARY KEY("CPS Station ID" AUTOINCREMENT)
+    );
+    """,
+    """
+    CREATE TABLE "Antennas" (
+    	"CPS Station ID"	INTEGER,
+    	"CPS Antenna ID"	INTEGER NOT NULL UNIQUE,
+    	"Antenna longitude [deg]"	NUMERIC,
+    	"Antenna latitude [deg]"	NUMERIC,
+    	"Antenna altitude (WGS84) [m]"	NUMERIC,
+    	"Antenna altitude (amsl) [m]"	NUMERIC,
+    	"Feed/Rx height above ground [m]"	NUMERIC,
+    	"Antenna diameter [m]"	NUMERIC,
+    	"Minimum elevation [deg]"	NUMERIC,
+    	"Minimum frequency [MHz]"	NUMERIC,
+    	"Maximum frequency [MHz]"	NUMERIC,
+    	FOREIGN KEY("CPS Station ID") REFERENCES "Stations"("CPS Station ID"),
+    	PRIMARY KEY("CPS Antenna ID" AUTOINCREMENT)
+    );
+    """,
+    """
+    CREATE TABLE "Frequency_Bands" (
+    	"CPS Station ID"	INTEGER,
+    	"CPS Antenna ID"	INTEGER,
+    	"CPS Band ID"	INTEGER NOT NULL UNIQUE,
+    	"Band start [MHz]"	NUMERIC,
+    	"Band stop [MHz]"	NUMERIC,
+    	"Antenna eff. Area [m^2]"	NUMERIC,
+    	"Cryo-cooled"	INTEGER,
+    	"Polarisation"	TEXT,
+    	"Supports RAS mode continuum"	INTEGER,
+    	"Supports RAS mode spectroscopy"	INTEGER,
+    	"Supports RAS mode VLBI"	INTEGER,
+    	"Noise temperature [K]"	NUMERIC,
+    	FOREIGN KEY("CPS Station ID") REFERENCES "Stations"("CPS Station ID"),
+    	FOREIGN KEY("CPS Antenna ID") REFERENCES "Antennas",
+    	PRIMARY KEY("CPS Band ID" AUTOINCREMENT)
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS wikidata (
+        "CPS Wiki ID" INTEGER,
+        Name TEXT,
+        Country TEXT,
+        "Station longitude [deg]"	NUMERIC,
+        "Station latitude [deg]"	NUMERIC,
+        source TEXT,
+        "Linked ITU" INTEGER,
+    	PRIMARY KEY("CPS Wiki ID")
+    );
+    """,
+)
+
+# Columns populated from the ITU snapshot, in the order of the staged rows
+CPS_STATION_COLUMNS = ("CPS Station ID", "ITU Notice ID", "ITU responsible Administration", "Country", "Short Name",
+                       "Station longitude [deg]", "Station latitude [deg]", "Registered at ITU",
+                       "Min station frequency [MHz]", "Max station frequency [MHz]")
+CPS_ANTENNA_COLUMNS = ("CPS Station ID", "CPS Antenna ID", "Antenna diameter [m]", "Minimum elevation [deg]",
+                       "Antenna longitude [deg]", "Antenna latitude [deg]",
+                       "Minimum frequency [MHz]", "Maximum frequency [MHz]")
+CPS_BAND_COLUMNS = ("CPS Station ID", "CPS Antenna ID", "CPS Band ID", "Band start [MHz]", "Band stop [MHz]",
+                    "Supports RAS mode VLBI", "Noise temperature [K]")
+
+# The CPS file is rebuilt from scratch on every export, so durability is traded for speed
+CPS_BUILD_PRAGMAS = ('PRAGMA journal_mode=OFF;', 'PRAGMA synchronous=OFF;',
+                     'PRAGMA cache_size=-65536;', 'PRAGMA temp_store=MEMORY;')
+
+
+class CpsTables:
+    """Rows of the CPS Stations, Antennas and Frequency_Bands tables staged in memory, IDs already assigned."""
+    def __init__(self, stations, antennas, bands):
+        self.stations = stations
+        self.antennas = antennas
+        self.bands = bands
+
+
+def _grouped_fmin_fmax(values_min, values_max, group_sizes):
+    """
+    Min of values_min and max of values_max per consecutive group of the given sizes,
+    NaN (missing values) ignored. Empty or all-NaN groups give None.
+    """
+    group_sizes = np.asarray(group_sizes, dtype=np.int64)
+    group_min = np.full(len(group_sizes), np.nan)
+    group_max = np.full(len(group_sizes), np.nan)
+    not_empty = group_sizes > 0
+    if np.any(not_empty):
+        starts = (np.cumsum(group_sizes) - group_sizes)[not_empty]
+        group_min[not_empty] = np.fmin.reduceat(values_min, starts)
+        group_max[not_empty] = np.fmax.reduceat(values_max, starts)
+    return ([None if np.isnan(value) else value for value in group_min.tolist()],
+            [None if np.isnan(value) else value for value in group_max.tolist()])
+
+
+def stage_cps_tables(snapshot, country_codes_to_names, progress=None):
+    """
+    Build the CPS table rows from an ItuSnapshot. Stations, antennas and bands get consecutive
+    IDs starting at 1 in the order they used to be inserted; frequency limits of antennas and
+    stations are computed afterwards in one vectorized pass over all bands.
+    """
+    stations, antennas, bands = [], [], []
+    antennas_per_station, bands_per_antenna = [], []
+    station_number = len(snapshot.stations)
+
+    for index, station in enumerate(snapshot.stations):
+        cps_station_id = index + 1
+        country_name = country_codes_to_names.get(station.ctry, 'Unknown')
+        stations.append([cps_station_id, station.ntc_id, station.adm, country_name, station.stn_name,
+                         station.long_dec, station.lat_dec, 1])
+
+        sites = snapshot.sites_of(station.ntc_id)
+        elev_min = sites[0].elev_min if sites else None
+        beams = snapshot.beams_of(station.ntc_id)
+        antennas_per_station.append(len(beams))
+        for beam in beams:
+            cps_antenna_id = len(antennas) + 1
+            antennas.append([cps_station_id, cps_antenna_id, beam.ant_diam, elev_min,
+                             station.long_dec, station.lat_dec])
+            groups = snapshot.groups_of(station.ntc_id, beam.beam_name)
+            bands_per_antenna.append(len(groups))
+            for group in groups:
+                vlbi_key = 1 if group.ra_stn_type == 'V' else 0
+                bands.append((cps_station_id, cps_antenna_id, len(bands) + 1,
+                              group.freq_min, group.freq_max, vlbi_key, group.noise_t))
+        if progress:
+            progress(index + 1, station_number)
+
+    # Limits cover both band edges, as before: min/max over all band starts and stops
+    band_start = np.array([np.nan if band[3] is None else band[3] for band in bands], dtype=float)
+    band_stop = np.array([np.nan if band[4] is None else band[4] for band in bands], dtype=float)
+    antenna_min, antenna_max = _grouped_fmin_fmax(np.fmin(band_start, band_stop), np.fmax(band_start, band_stop),
+                                                  bands_per_antenna)
+    for antenna, freq_min, freq_max in zip(antennas, antenna_min, antenna_max):
+        antenna.extend((freq_min, freq_max))
+
+    antenna_min = np.array([np.nan if value is None else value for value in antenna_min], dtype=float)
+    antenna_max = np.array([np.nan if value is None else value for value in antenna_max], dtype=float)
+    station_min, station_max = _grouped_fmin_fmax(antenna_min, antenna_max, antennas_per_station)
+    for station, freq_min, freq_max in zip(stations, station_min, station_max):
+        station.extend((freq_min, freq_max))
+
+    return CpsTables(stations, antennas, bands)
+
+
+def create_cps_database(filePath):
+    """Create an empty CPS database file (replacing any existing one) tuned for a bulk load."""
+    if os.path.exists(filePath):
+        os.remove(filePath)
+    conn = sqlite3.connect(filePath, timeout=90)
+    for pragma in CPS_BUILD_PRAGMAS:
+        conn.execute(pragma)
+    for create_table in CPS_SCHEMA:
+        conn.execute(create_table)
+    return conn
+
+
+def _insert_statement(table, columns):
+    column_list = ', '.join(f'"{column}"' for column in columns)
+    return f'INSERT INTO "{table}" ({column_list}) VALUES ({", ".join("?" * len(columns))});'
+
+
+def load_cps_tables(conn, tables):
+    """
+    Insert the staged rows with one executemany per table. The rows are left in the open
+    transaction, the caller commits once everything else (e.g. Wikidata) is in.
+    """
+    cursor = conn.cursor()
+    cursor.executemany(_insert_statement('Stations', CPS_STATION_COLUMNS), tables.stations)
+    cursor.executemany(_insert_statement('Antennas', CPS_ANTENNA_COLUMNS), tables.antennas)
+    cursor.executemany(_insert_statement('Frequency_Bands', CPS_BAND_COLUMNS), tables.bands)
+    return cursor
+
+
+def _or_na(value):
+    return 'N/A' if value is None else value
+
+
+# Paragraphs of the annex that are the same for every station
+_ANNEX_LONG_NAME_AND_TYPE = paragraph_xml('Station long: name "N/A"') + paragraph_xml('Station type: "N/A"')
+_ANNEX_OPERATIONAL_AND_SCIENCE = paragraph_xml('Operational "N/A"') + paragraph_xml('Used for science "N/A"')
+_ANNEX_CONTACTS = ''.join(paragraph_xml(text) for text in (
+    'Contact (website) "N/A"', 'Contact (address) "N/A"', 'Contact (phone) "N/A"', 'Contact (e-mail) "N/A"'))
+_ANNEX_ANTENNA_INFORMATION = heading_xml('Antenna information', level=3)
+_ANNEX_FEED_HEIGHT = paragraph_xml('Feed/Rx height above ground [m] "N/A"')
+_ANNEX_ANTENNA_MODES = ''.join(paragraph_xml(text) for text in (
+    'Cryocooled: "N/A"', 'Supports RAS mode continuum: "N/A"', 'Supports RAS mode spectroscopy: "N/A"'))
+# 'S' stands for single dish and 'V' for VLBI
+_ANNEX_VLBI_SUPPORT = {'V': paragraph_xml('Supports RAS mode VLBI: "Yes"'),
+                       'S': paragraph_xml('Supports RAS mode VLBI: "No"')}
+_ANNEX_VLBI_UNKNOWN = paragraph_xml('Supports RAS mode VLBI: "N/A"')
+
+# Smallest number of stations rendered by one worker process of a parallel annex export
+ANNEX_MIN_SHARD = 25
+
+
+def annex_jobs():
+    """Worker processes of the annex for interactive exports: RAS_DB_ANNEX_JOBS if set, else one per CPU core."""
+    try:
+        jobs = int(os.environ.get('RAS_DB_ANNEX_JOBS', 0))
+    except ValueError:
+        jobs = 0
+    return jobs if jobs > 0 else os.cpu_count() or 1
+
+
+def annex_station_records(snapshot, country_codes_to_names):
+    """
+    Everything the annex shows of each station, in snapshot order, as plain picklable tuples of
+    (station, site, beams, groups of each beam, admin_name, country_name) so stations can be rendered
+    in other processes. site is None for a notice without an e_stn row.
+    """
+    records = []
+    for station in snapshot.stations:
+        sites = snapshot.sites_of(station.ntc_id)
+        beams = snapshot.beams_of(station.ntc_id)
+        groups = [snapshot.groups_of(station.ntc_id, beam.beam_name) for beam in beams]
+        records.append((station, sites[0] if sites else None, beams, groups,
+                        country_codes_to_names.get(station.adm, 'Unknown'),
+                        country_codes_to_names.get(station.ctry, 'Unknown')))
+    return records
+
+
+def _limit(values, pick):
+    """min or max of the known values, None if there are none."""
+    values = [value for value in values if value is not None]
+    return pick(values) if values else None
+
+
+def _vlbi_support(groups):
+    types = {group.ra_stn_type for group in groups}
+    if 'V' in types:
+        return _ANNEX_VLBI_SUPPORT['V']
+    return _ANNEX_VLBI_SUPPORT['S'] if 'S' in types else _ANNEX_VLBI_UNKNOWN
+
+
+def station_section_xml(record, station_number):
+    """
+    Body XML of one station of the annex, ending with a page break. Values missing from the
+    ITU data (no site, no groups, NULL columns) are shown as "N/A".
+    """
+    station, site, beams, beam_groups, admin_name, country_name = record
+    all_groups = [group for groups in beam_groups for group in groups]
+    station_freq_min = _limit((group.freq_min for group in all_groups), min)
+    station_freq_max = _limit((group.freq_max for group in all_groups), max)
+
+    xml = [
+        heading_xml(f'Station "{station.stn_name}"', level=2),
+        heading_xml('Overview', level=3),
+        paragraph_xml(f'Station number: {station_number}'),
+        paragraph_xml(f'Responsible administration: "{admin_name}"'),
+        paragraph_xml(f'Country/region location: "{country_name}"'),
+        paragraph_xml(f'Station short name: "{station.stn_name}'),
+        _ANNEX_LONG_NAME_AND_TYPE,
+        paragraph_xml(f'Station longitude [deg]: "{station.long_dec}"'),
+        paragraph_xml(f'Station latitude [deg]: "{station.lat_dec}"'),
+        paragraph_xml(f'Station altitude (AMSL) "{_or_na(site.ant_alt if site else None)}"'),
+        paragraph_xml(f'Minimum elevation [deg]: "{_or_na(site.elev_min if site else None)}"'),
+        _ANNEX_OPERATIONAL_AND_SCIENCE,
+        paragraph_xml('Minimum Station Frequency [MHz]: '
+                      + ('"N/A"' if station_freq_min is None else f'"{station_freq_min} MHz"')),
+        paragraph_xml('Maximum Station Frequency [MHz]: '
+                      + ('"N/A"' if station_freq_max is None else f'"{station_freq_max} MHz"')),
+        _ANNEX_CONTACTS,
+        _ANNEX_ANTENNA_INFORMATION,
+    ]
+
+    # Each antenna shows its own groups: every noise temperature, the frequency range they cover
+    for beam_index, (beam, groups) in enumerate(zip(beams, beam_groups)):
+        noise_temperatures = ', '.join(dict.fromkeys(str(group.noise_t) for group in groups
+                                                     if group.noise_t is not None))
+        xml += [
+            heading_xml(f'Antenna #{beam_index+1}', level=4),
+            _ANNEX_FEED_HEIGHT,
+            paragraph_xml(f'Noise temparature [K]: "{noise_temperatures or "N/A"}"'),
+            paragraph_xml(f'Antenna diameter [m]: "{_or_na(beam.ant_diam)}"'),
+            paragraph_xml(f'Maximum antenna gain [dBi]: "{_or_na(beam.gain)}"'),
+            paragraph_xml(f'Minimim antenna frequency [MHz]: "{_or_na(_limit((group.freq_min for group in groups), min))}"'),
+            paragraph_xml(f'Maximum antenna frequency [MHz]: "{_or_na(_limit((group.freq_max for group in groups), max))}"'),
+            _ANNEX_ANTENNA_MODES,
+            _vlbi_support(groups),
+        ]
+    xml.append(PAGE_BREAK_XML)
+    return ''.join(xml)
+
+
+def _render_annex_shard(shard):
+    records, first_number = shard
+    return ''.join(station_section_xml(record, number) for number, record in enumerate(records, first_number))
+
+
+def _set_portrait(document):
+    from docx.enum.section import WD_ORIENT
+
+    document.sections[0].orientation = WD_ORIENT.PORTRAIT
+
+
+def write_station_annex(snapshot, country_codes_to_names, filePath, progress=None, jobs=1):
+    """
+    Write the Word annex listing every RAS station with its antennas. The document is streamed
+    into the .docx file station by station (see docx_stream.py). With jobs > 1 the stations are
+    split into shards rendered by that many worker processes and written back in their order.
+    python-docx is only needed here, so the other exports work without it.
+    """
+    records = annex_station_records(snapshot, country_codes_to_names)
+    station_number = len(records)
+
+    with StreamingDocument(filePath, _set_portrait) as doc:
+        doc.heading(
+            "Annex 1. The list of radio astronomy stations known to the IAU CPS", level=1)
+        doc.paragraph("This list is based on ITU-R IFIC database.")
+
+        if jobs > 1 and station_number > ANNEX_MIN_SHARD:
+            shard_size = max(ANNEX_MIN_SHARD, -(-station_number // (jobs * 4)))
+            shards = [(records[start:start + shard_size], start + 1)
+                      for start in range(0, station_number, shard_size)]
+            # Spawned rather than forked workers, the GUI calls this from a thread
+            executor = ProcessPoolExecutor(min(jobs, len(shards)), mp_context=multiprocessing.get_context('spawn'))
+            pending = collections.deque()
+
+            def write_next_shard():
+                future, stations_written = pending.popleft()
+                doc.write(future.result())
+                if progress:
+                    progress(stations_written, station_number)
+
+            try:
+                # A few shards per worker are in flight, finished ones are written in station order
+                for shard in shards:
+                    pending.append((executor.submit(_render_annex_shard, shard), shard[1] + len(shard[0]) - 1))
+                    if len(pending) >= 2 * jobs:
+                        write_next_shard()
+                while pending:
+                    write_next_shard()
+            finally:
+                executor.shutdown(wait=True, cancel_futures=True)
+        else:
+            for index, record in enumerate(records):
+                doc.write(station_section_xml(record, index + 1))
+                if progress:
+                    progress(index + 1, station_number)
+
+
+WIKIDATA_INSERT = """
+INSERT INTO wikidata (Name, Country, "Station longitude [deg]", "Station latitude [deg]", source)
+VALUES (?, ?, ?, ?, ?)
+"""
+
+
+def add_wiki_data(cursor_CPS, rows=None):
+    """Fill the wikidata table with the radio telescopes and observatories of Wikidata (harvested if rows are not given)."""
+    if rows is None:
+        from wikidata_harvest import WikidataHarvester
+
+        rows = WikidataHarvester().rows()
+    cursor_CPS.executemany(WIKIDATA_INSERT, rows)
+
+
+def write_cps_database(snapshot, country_codes_to_names, filePath, progress=None, wikidata=True):
+    """
+    Build the complete CPS SQLite database: ITU stations, antennas, bands and (optionally) Wikidata stations.
+    wikidata is True, False or the WikidataHarvester to use; the harvest runs while the ITU tables are staged.
+    While the harvest is awaited progress is still called, so a cancelling progress callback is honoured;
+    on any failure the harvest is cancelled and not waited for.
+    """
+    cancelled = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        harvest = None
+        if wikidata:
+            from wikidata_harvest import WikidataHarvester
+
+            harvester = WikidataHarvester() if wikidata is True else wikidata
+            harvest = executor.submit(harvester.rows, cancelled)
+        tables = stage_cps_tables(snapshot, country_codes_to_names, progress)
+        conn = create_cps_database(filePath)
+        try:
+            cursor = load_cps_tables(conn, tables)
+            if harvest:
+                station_number = len(snapshot.stations)
+                while True:
+                    try:
+                        rows = harvest.result(timeout=0.2)
+                        break
+                    except TimeoutError:
+                        if progress:
+                            progress(station_number, station_number)
+                add_wiki_data(cursor, rows)
+            conn.commit()
+        finally:
+            conn.close()
+    finally:
+        cancelled.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+# File extension of each columnar format
+COLUMNAR_FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+
+def cps_column_types(table):
+    """Declared type (INTEGER, NUMERIC or TEXT) of each column of a CPS table, from CPS_SCHEMA."""
+    create_table = next(statement for statement in CPS_SCHEMA if f'TABLE "{table}"' in statement)
+    return dict(re.findall(r'^\s*"([^"]+)"\s+(INTEGER|NUMERIC|TEXT)', create_table, re.MULTILINE))
+
+
+def write_columnar_tables(snapshot, country_codes_to_names, dirPath, progress=None, file_format='parquet',
+                          compression='zstd'):
+    """
+    Write the CPS Stations, Antennas and Frequency_Bands tables, as staged for the SQLite export,
+    as one compressed Parquet or Arrow IPC (memory-mappable) file per table in dirPath. Columns
+    keep their CPS names and get the Arrow type of their declared type (int64, float64 or string).
+    pyarrow is only imported here, it is not needed by the other exports.
+    """
+    import pyarrow as pa
+
+    arrow_types = {'INTEGER': pa.int64(), 'NUMERIC': pa.float64(), 'TEXT': pa.string()}
+    tables = stage_cps_tables(snapshot, country_codes_to_names, progress)
+    os.makedirs(dirPath, exist_ok=True)
+    for table, columns, rows in (('Stations', CPS_STATION_COLUMNS, tables.stations),
+                                 ('Antennas', CPS_ANTENNA_COLUMNS, tables.antennas),
+                                 ('Frequency_Bands', CPS_BAND_COLUMNS, tables.bands)):
+        types = cps_column_types(table)
+        values = list(zip(*rows)) if rows else [()] * len(columns)
+        arrow_table = pa.table({column: pa.array(column_values, type=arrow_types[types[column]])
+                                for column, column_values in zip(columns, values)})
+        filePath = os.path.join(dirPath, table + COLUMNAR_FORMATS[file_format])
+        if file_format == 'parquet':
+            import pyarrow.parquet as pq
+
+            pq.write_table(arrow_table, filePath, compression=compression)
+        else:
+            import pyarrow.ipc as ipc
+
+            options = ipc.IpcWriteOptions(compression=compression)
+            with pa.OSFile(filePath, 'wb') as sink, ipc.new_file(sink, arrow_table.schema, options=options) as writer:
+                writer.write_table(arrow_table)
+
+
+# An export format of export_all: write(snapshot, country_codes_to_names, filePath, progress, options)
+# writes the file, file_name is formatted with the database version and date suffix
+ExportSink = namedtuple('ExportSink', 'name file_name write')
+
+EXPORT_SINKS = {}
+
+
+def register_export_sink(name, file_name, write):
+    EXPORT_SINKS[name] = ExportSink(name, file_name, write)
+
+
+def _write_csv_sink(snapshot, country_codes_to_names, filePath, progress, options):
+    with open(filePath, 'w', newline='') as file:
+        write_full_csv(snapshot, csv.writer(file, delimiter=','), progress)
+
+
+def _write_docx_sink(snapshot, country_codes_to_names, filePath, progress, options):
+    write_station_annex(snapshot, country_codes_to_names, filePath, progress, options.get('jobs', 1))
+
+
+def _write_sqlite_sink(snapshot, country_codes_to_names, filePath, progress, options):
+    write_cps_database(snapshot, country_codes_to_names, filePath, progress, options.get('wikidata', True))
+
+
+def _write_parquet_sink(snapshot, country_codes_to_names, filePath, progress, options):
+    write_columnar_tables(snapshot, country_codes_to_names, filePath, progress, 'parquet')
+
+
+def _write_arrow_sink(snapshot, country_codes_to_names, filePath, progress, options):
+    write_columnar_tables(snapshot, country_codes_to_names, filePath, progress, 'arrow')
+
+
+register_export_sink('csv', 'RAS_DB_FULL_CSV_{suffix}.csv', _write_csv_sink)
+register_export_sink('docx', 'RAS_DB_FULL_DOCX_{suffix}.docx', _write_docx_sink)
+register_export_sink('sqlite', 'CPS_RAS_DB_FULL_SQLite_{suffix}.db', _write_sqlite_sink)
+# Directories with one file per CPS table, they need pyarrow
+register_export_sink('parquet', 'CPS_RAS_DB_FULL_Parquet_{suffix}', _write_parquet_sink)
+register_export_sink('arrow', 'CPS_RAS_DB_FULL_Arrow_{suffix}', _write_arrow_sink)
+
+# Formats written when none are asked for
+DEFAULT_EXPORT_FORMATS = ('csv', 'docx', 'sqlite')
+
+
+def export_all(snapshot, country_codes_to_names, out_dir, suffix, formats=None, progress=None, threaded=True, **options):
+    """
+    Write one snapshot, extracted once, in several formats (DEFAULT_EXPORT_FORMATS by default) to out_dir.
+    With threaded the formats are written concurrently, each on its own thread, and the call returns
+    once all are done; the first failure is raised after the other formats finished. progress is called
+    as progress(format, done, total). options are handed to the sinks (jobs, wikidata).
+    Returns the written path of each format.
+    """
+    formats = list(formats or DEFAULT_EXPORT_FORMATS)
+    os.makedirs(out_dir, exist_ok=True)
+
+    def export(name):
+        sink = EXPORT_SINKS[name]
+        filePath = os.path.join(out_dir, sink.file_name.format(suffix=suffix))
+        report = (lambda done, total: progress(name, done, total)) if progress else None
+        with partial_output(filePath) as partial_path:
+            sink.write(snapshot, country_codes_to_names, partial_path, report, options)
+        return filePath
+
+    if not threaded or len(formats) < 2:
+        return {name: export(name) for name in formats}
+    with ThreadPoolExecutor(len(formats), thread_name_prefix='export') as executor:
+        futures = {name: executor.submit(export, name) for name in formats}
+    return {name: future.result() for name, future in futures.items()}
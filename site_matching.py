@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Batch pre-matching of Wikidata entries to ITU stations in a CPS database.
+
+Every Wikidata entry is compared with every station in one vectorized pass over the
+Wikidata x Stations distance matrix, computed in chunks of rows so memory stays bounded.
+The closest stations are then scored by name similarity. Entries with a close station of
+a similar name are confident matches that can be linked without review; all other
+entries are left for the Site Link Wizard.
+
+@author: boris.sorokin@skao.int
+"""
+import re
+import unicodedata
+from collections import namedtuple
+from difflib import SequenceMatcher
+
+import numpy as np
+
+from station_index import unit_vectors, chord_to_km
+
+# Columns of the CPS wikidata and Stations tables as fetched with SELECT *
+WIKI_ID, WIKI_NAME, WIKI_LONGITUDE, WIKI_LATITUDE = 0, 1, 3, 4
+STATION_ID, STATION_SHORT_NAME, STATION_LONG_NAME, STATION_LONGITUDE, STATION_LATITUDE = 0, 2, 3, 5, 6
+
+Candidate = namedtuple('Candidate', 'station distance_km similarity')
+PrematchResult = namedtuple('PrematchResult', 'links confident review')
+
+
+def normalize_name(name):
+    """Lower case ASCII words and numbers of a station name, accents and punctuation dropped."""
+    name = unicodedata.normalize('NFKD', str(name or '')).encode('ascii', 'ignore').decode('ascii')
+    return re.findall(r'[a-z]+|[0-9]+', name.lower())
+
+
+def name_similarity(first, second):
+    """
+    Similarity of two station names between 0 and 1: the best of the character ratio of the
+    whole names and the share of words of the shorter name found in the other one. ITU site
+    names are short and often truncated, so a word also matches a longer word it starts
+    (letters only). Names that both carry numbers but not the same ones are different sites.
+    """
+    first_words, second_words = normalize_name(first), normalize_name(second)
+    if not first_words or not second_words:
+        return 0.0
+    first_numbers = {word for word in first_words if word.isdigit()}
+    second_numbers = {word for word in second_words if word.isdigit()}
+    if first_numbers and second_numbers and first_numbers != second_numbers:
+        return 0.0
+    ratio = SequenceMatcher(None, ' '.join(first_words), ' '.join(second_words)).ratio()
+    if len(first_words) > len(second_words):
+        first_words, second_words = second_words, first_words
+    found = sum(1 for word in first_words
+                if any(other == word or (min(len(word), len(other)) >= 4 and word.isalpha() and other.isalpha() and
+                                         (other.startswith(word) or word.startswith(other)))
+                       for other in second_words))
+    return max(ratio, found / len(first_words))
+
+
+def _coordinates(rows, latitude_column, longitude_column):
+    latitudes, longitudes = [], []
+    for row in rows:
+        try:
+            latitude, longitude = float(row[latitude_column]), float(row[longitude_column])
+        except (TypeError, ValueError):
+            latitude = longitude = np.nan
+        latitudes.append(latitude)
+        longitudes.append(longitude)
+    return np.array(latitudes, dtype=float), np.array(longitudes, dtype=float)
+
+
+def nearest_stations(wikidata_entries, stations_entries, k=10, chunk_elements=4_000_000):
+    """
+    Indices and distances in km of the k stations closest to every Wikidata entry, closest first,
+    from the Wikidata x Stations distance matrix evaluated chunk_elements cells at a time.
+    Rows of entries without coordinates are all -1 / inf.
+    """
+    wiki_latitudes, wiki_longitudes = _coordinates(wikidata_entries, WIKI_LATITUDE, WIKI_LONGITUDE)
+    station_latitudes, station_longitudes = _coordinates(stations_entries, STATION_LATITUDE, STATION_LONGITUDE)
+    stations_valid = np.flatnonzero(np.isfinite(station_latitudes) & np.isfinite(station_longitudes))
+    stations = unit_vectors(station_latitudes[stations_valid], station_longitudes[stations_valid])
+
+    k = min(k, len(stations))
+    indices = np.full((len(wikidata_entries), k), -1, dtype=int)
+    distances = np.full((len(wikidata_entries), k), np.inf)
+    wiki_valid = np.flatnonzero(np.isfinite(wiki_latitudes) & np.isfinite(wiki_longitudes))
+    if k == 0 or len(wiki_valid) == 0:
+        return indices, distances
+
+    chunk_rows = max(1, chunk_elements // len(stations))
+    for start in range(0, len(wiki_valid), chunk_rows):
+        rows = wiki_valid[start:start + chunk_rows]
+        points = unit_vectors(wiki_latitudes[rows], wiki_longitudes[rows])
+        # Squared chord length between unit vectors: |a - b|^2 = 2 - 2 a.b
+        chords2 = np.maximum(2.0 - 2.0 * (points @ stations.T), 0.0)
+        if k < len(stations):
+            closest = np.argpartition(chords2, k - 1, axis=1)[:, :k]
+        else:
+            closest = np.broadcast_to(np.arange(k), (len(rows), k))
+        closest2 = np.take_along_axis(chords2, closest, axis=1)
+        order = np.argsort(closest2, axis=1, kind='stable')
+        indices[rows] = stations_valid[np.take_along_axis(closest, order, axis=1)]
+        distances[rows] = chord_to_km(np.sqrt(np.take_along_axis(closest2, order, axis=1)))
+    return indices, distances
+
+
+def prematch(wikidata_entries, stations_entries, k=10, max_distance_km=5.0, min_similarity=0.8):
+    """
+    Split Wikidata entries into confident matches and entries needing review.
+
+    An entry is a confident match when at least one of its k closest stations lies within
+    max_distance_km and has a name similarity of at least min_similarity; it is linked to all
+    such stations, as an ITU site is often notified several times. Returns a PrematchResult of
+    the (CPS Wiki ID, CPS Station ID) links to write, the confident entries and the entries to review.
+    """
+    indices, distances = nearest_stations(wikidata_entries, stations_entries, k)
+    links, confident, review = [], [], []
+    for entry, station_indices, station_distances in zip(wikidata_entries, indices, distances):
+        matches = []
+        for index, distance in zip(station_indices, station_distances):
+            if index < 0 or distance > max_distance_km:
+                break
+            station = stations_entries[index]
+            similarity = max(name_similarity(entry[WIKI_NAME], station[STATION_SHORT_NAME]),
+                             name_similarity(entry[WIKI_NAME], station[STATION_LONG_NAME]))
+            if similarity >= min_similarity:
+                matches.append(Candidate(station, float(distance), similarity))
+        if matches:
+            confident.append(entry)
+            links.extend((entry[WIKI_ID], match.station[STATION_ID]) for match in matches)
+        else:
+            review.append(entry)
+    return PrematchResult(links, confident, review)
+
+
+def write_links(connection, links):
+    """Store pre-matched links and flag their Wikidata entries as linked, all in one transaction."""
+    with connection:
+        connection.executemany(
+            'INSERT INTO wikidata_stations_link ("CPS Wiki ID", "CPS Station ID") VALUES (?, ?)', links)
+        connection.executemany(
+            'UPDATE wikidata SET "Linked ITU" = 1 WHERE "CPS Wiki ID" = ?',
+            [(wiki_id,) for wiki_id in dict.fromkeys(wiki_id for wiki_id, _ in links)])
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Startup profiling for the GUI (--profile-startup).
+
+ImportTimer records how long every module takes to import, in the spirit of
+python -X importtime, plus named milestones such as the first window being shown.
+The report goes to stderr so it can be captured and compared between versions.
+
+@author: boris.sorokin@skao.int
+"""
+import builtins
+import sys
+import time
+
+PROFILE_FLAG = '--profile-startup'
+
+
+class ImportTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.records = []
+        self.milestones = []
+        self._stack = []
+        self._original_import = None
+
+    @classmethod
+    def from_argv(cls, argv):
+        """Installed timer if the profiling flag is on the command line (the flag is removed), else None."""
+        if PROFILE_FLAG not in argv:
+            return None
+        argv.remove(PROFILE_FLAG)
+        timer = cls()
+        timer.install()
+        return timer
+
+    def install(self):
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    def uninstall(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        # Only first imports cost anything, relative imports are resolved by the originals
+        if level or name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+        self._stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            self.records.append((len(self._stack), name, elapsed - children, elapsed))
+
+    def mark(self, label):
+        """Record a milestone, timed from the creation of the timer."""
+        self.milestones.append((label, time.perf_counter() - self.started))
+
+    def report(self, stream=None, top=25):
+        stream = stream or sys.stderr
+        print('import time: self [us] | cumulative | imported package', file=stream)
+        for depth, name, own, cumulative in self.records:
+            print(f'import time: {own * 1e6:9.0f} | {cumulative * 1e6:10.0f} | {"  " * depth}{name}', file=stream)
+        print('\nSlowest top-level imports:', file=stream)
+        top_level = sorted((record for record in self.records if record[0] == 0), key=lambda record: -record[3])
+        for _, name, _, cumulative in top_level[:top]:
+            print(f'  {cumulative * 1e3:8.1f} ms  {name}', file=stream)
+        print('\nStartup milestones:', file=stream)
+        for label, elapsed in self.milestones:
+            print(f'  {elapsed * 1e3:8.1f} ms  {label}', file=stream)
+        stream.flush()
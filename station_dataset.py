@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Typed column store of the stations listed in a window.
+
+The windows build one StationDataset from the rows they load, and the map reads it
+instead of scraping (and re-parsing) the display text of the table cells.
+
+@author: boris.sorokin@skao.int
+"""
+import numpy as np
+
+
+def coordinate_array(values):
+    """Float array of coordinates in degrees, NaN where a value is missing or not a number."""
+    def coordinate(value):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return np.nan
+    return np.fromiter((coordinate(value) for value in values), dtype=float)
+
+
+class StationDataset:
+    """Station names, administrations and countries as lists, latitudes and longitudes as float arrays."""
+
+    def __init__(self, names, administrations, countries, latitudes, longitudes):
+        self.names = list(names)
+        self.administrations = list(administrations)
+        self.countries = list(countries)
+        self.latitudes = coordinate_array(latitudes)
+        self.longitudes = coordinate_array(longitudes)
+
+    @classmethod
+    def from_rows(cls, rows, name, administration, country, latitude, longitude):
+        """Dataset of query result rows, the arguments are the column numbers of each field."""
+        if not rows:
+            return cls([], [], [], [], [])
+        columns = list(zip(*rows))
+        return cls(columns[name], columns[administration], columns[country], columns[latitude], columns[longitude])
+
+    def __len__(self):
+        return len(self.names)
+
+    def has_coordinates(self):
+        return np.isfinite(self.latitudes) & np.isfinite(self.longitudes)
+
+    def map_stations(self, administration_label=None, country_label=None):
+        """
+        (name, administration, country, latitude, longitude) tuples of the stations with coordinates,
+        as taken by map_html.stations_map_html. The optional label functions turn administration and
+        country values into the text shown on the map; each distinct value is converted only once.
+        """
+        rows = np.flatnonzero(self.has_coordinates())
+        administrations = _labels([self.administrations[row] for row in rows], administration_label)
+        countries = _labels([self.countries[row] for row in rows], country_label)
+        return list(zip([self.names[row] for row in rows], administrations, countries,
+                        self.latitudes[rows].tolist(), self.longitudes[rows].tolist()))
+
+
+def _labels(values, label):
+    if label is None:
+        return values
+    labels = {value: label(value) for value in set(values)}
+    return [labels[value] for value in values]
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Spatial index of station positions for nearest-station searches.
+
+Stations are stored as unit vectors on the sphere, so the straight-line (chord) distance
+between two vectors is a monotonic function of the great-circle distance and ordinary
+Euclidean KD-tree pruning gives exact great-circle neighbours. Small station sets, or
+indexes built with use_tree=False, are searched by brute force with np.argpartition.
+
+@author: boris.sorokin@skao.int
+"""
+import heapq
+
+import numpy as np
+
+from station_dataset import coordinate_array
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def unit_vectors(latitudes, longitudes):
+    """(n, 3) array of Cartesian unit vectors for latitudes/longitudes in degrees."""
+    lat = np.radians(np.asarray(latitudes, dtype=float))
+    lon = np.radians(np.asarray(longitudes, dtype=float))
+    cos_lat = np.cos(lat)
+    return np.stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)), axis=-1)
+
+
+def chord_to_km(chord):
+    """Great-circle distance in km for a chord length on the unit sphere."""
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0.0, 1.0))
+
+
+def km_to_chord(distance_km):
+    """Chord length on the unit sphere for a great-circle distance in km."""
+    return 2 * np.sin(np.clip(distance_km / (2 * EARTH_RADIUS_KM), 0.0, np.pi / 2))
+
+
+class StationIndex:
+    """
+    k-nearest and radius queries over station coordinates. Results are positions in the
+    latitude/longitude sequences the index was built from, closest first, together with
+    their great-circle distances in km. Stations without numeric coordinates are never returned.
+    """
+
+    def __init__(self, latitudes, longitudes, leaf_size=32, use_tree=True):
+        latitudes = coordinate_array(latitudes)
+        longitudes = coordinate_array(longitudes)
+        # Positions of the indexed stations in the input, in the order of self.points
+        self.positions = np.flatnonzero(np.isfinite(latitudes) & np.isfinite(longitudes))
+        self.points = unit_vectors(latitudes[self.positions], longitudes[self.positions])
+        self.leaf_size = max(1, int(leaf_size))
+        self.nodes = []
+        if use_tree and len(self.points) > self.leaf_size:
+            order = np.arange(len(self.points))
+            self._build(order, 0, len(order))
+            self.positions = self.positions[order]
+            self.points = self.points[order]
+
+    def __len__(self):
+        return len(self.points)
+
+    @property
+    def uses_tree(self):
+        return bool(self.nodes)
+
+    def _build(self, order, start, end):
+        """Append the node for order[start:end] and its children; returns the node number."""
+        points = self.points[order[start:end]]
+        lower, upper = points.min(axis=0), points.max(axis=0)
+        node = len(self.nodes)
+        self.nodes.append([start, end, lower, upper, -1, -1])
+        if end - start > self.leaf_size:
+            axis = int(np.argmax(upper - lower))
+            middle = (end - start) // 2
+            split = np.argpartition(points[:, axis], middle)
+            order[start:end] = order[start:end][split]
+            self.nodes[node][4] = self._build(order, start, start + middle)
+            self.nodes[node][5] = self._build(order, start + middle, end)
+        return node
+
+    def _box_distance2(self, node, point):
+        """Squared distance from point to the bounding box of a node (0 inside the box)."""
+        _, _, lower, upper, _, _ = self.nodes[node]
+        gap = np.maximum(lower - point, 0.0) + np.maximum(point - upper, 0.0)
+        return float(gap @ gap)
+
+    def _distances2(self, start, end, point):
+        difference = self.points[start:end] - point
+        return np.einsum('ij,ij->i', difference, difference)
+
+    def nearest(self, latitude, longitude, k=10):
+        """Positions and distances in km of the k stations closest to the given point."""
+        k = min(int(k), len(self.points))
+        if k <= 0:
+            return np.empty(0, dtype=int), np.empty(0)
+        point = unit_vectors(latitude, longitude)
+        if not self.nodes:
+            distances2 = self._distances2(0, len(self.points), point)
+            best = np.argpartition(distances2, k - 1)[:k] if k < len(distances2) else np.arange(k)
+            return self._result(best, distances2[best])
+
+        best = np.empty(0, dtype=int)
+        best2 = np.empty(0)
+        worst2 = np.inf
+        queue = [(0.0, 0)]
+        while queue:
+            box2, node = heapq.heappop(queue)
+            if box2 > worst2:
+                break
+            start, end, _, _, left, right = self.nodes[node]
+            if left >= 0:
+                for child in (left, right):
+                    child2 = self._box_distance2(child, point)
+                    if child2 <= worst2:
+                        heapq.heappush(queue, (child2, child))
+                continue
+            best = np.concatenate((best, np.arange(start, end)))
+            best2 = np.concatenate((best2, self._distances2(start, end, point)))
+            if len(best) > k:
+                keep = np.argpartition(best2, k - 1)[:k]
+                best, best2 = best[keep], best2[keep]
+            if len(best) == k:
+                worst2 = float(best2.max())
+        return self._result(best, best2)
+
+    def within(self, latitude, longitude, radius_km):
+        """Positions and distances in km of all stations within radius_km of the given point."""
+        point = unit_vectors(latitude, longitude)
+        radius2 = float(km_to_chord(radius_km)) ** 2
+        if not self.nodes:
+            distances2 = self._distances2(0, len(self.points), point)
+            found = np.flatnonzero(distances2 <= radius2)
+            return self._result(found, distances2[found])
+
+        found, found2 = [], []
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if self._box_distance2(node, point) > radius2:
+                continue
+            start, end, _, _, left, right = self.nodes[node]
+            if left >= 0:
+                stack.extend((left, right))
+                continue
+            distances2 = self._distances2(start, end, point)
+            inside = np.flatnonzero(distances2 <= radius2)
+            found.append(start + inside)
+            found2.append(distances2[inside])
+        if not found:
+            return np.empty(0, dtype=int), np.empty(0)
+        return self._result(np.concatenate(found), np.concatenate(found2))
+
+    def _result(self, slots, distances2):
+        order = np.argsort(distances2, kind='stable')
+        return self.positions[slots[order]], chord_to_km(np.sqrt(distances2[order]))
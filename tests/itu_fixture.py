@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Small ITU IFIC database in SQLite, with the tables and columns the tool reads, for the tests.
+
+Besides regular stations it holds the cases the exporters have to cope with: a notice
+without an e_stn row, a beam without groups, a group without a freq row, NULL values,
+a beam name with a quote and notices that are not of radio astronomy stations.
+
+@author: boris.sorokin@skao.int
+"""
+import sqlite3
+
+ITU_SCHEMA = """
+CREATE TABLE com_el(ntc_id INTEGER, ntc_type TEXT, adm TEXT, ctry TEXT, stn_name TEXT, long_dec REAL,
+                    lat_dec REAL, prov TEXT, d_rcv TIMESTAMP);
+CREATE TABLE e_stn(ntc_id INTEGER, long_deg INTEGER, long_ew TEXT, long_min INTEGER, long_sec REAL,
+                   lat_deg INTEGER, lat_ns TEXT, lat_min INTEGER, lat_sec REAL, elev_min REAL, elev_max REAL,
+                   azm_fr REAL, azm_to REAL, ant_alt REAL);
+CREATE TABLE e_ant(ntc_id INTEGER, beam_name TEXT, pattern_id INTEGER, ant_diam REAL, gain REAL, attch_e TEXT);
+CREATE TABLE grp(ntc_id INTEGER, beam_name TEXT, grp_id INTEGER, noise_t REAL, freq_min REAL, freq_max REAL,
+                 d_inuse TIMESTAMP, d_rcv TIMESTAMP, wic_no INTEGER, d_upd TIMESTAMP, ra_stn_type TEXT);
+CREATE TABLE freq(ntc_id INTEGER, beam_name TEXT, freq_mhz REAL);
+CREATE TABLE ant_type(pattern_id INTEGER, pattern TEXT);
+CREATE TABLE srs_ooak(d_create TIMESTAMP, comment TEXT);
+"""
+
+ADMINISTRATIONS = ['F', 'D', 'AUS', 'USA', 'G', 'J']
+FREQUENCIES = [1400.0, 1610.6, 4990.0, 10600.0, 22000.0]
+
+# ntc_id of the special cases
+NO_SITE = 1003
+NO_GROUPS = 1004
+NO_FREQ = 1005
+NOT_RAS = 1007
+
+
+def make_itu_database(path, stations=12):
+    """Write the database to path and return the list of ntc_id of its radio astronomy stations."""
+    connection = sqlite3.connect(path)
+    try:
+        connection.executescript(ITU_SCHEMA)
+        connection.execute("INSERT INTO srs_ooak VALUES (?, ?)", ('2024-05-01 00:00:00', 'IFIC2990 test'))
+        connection.executemany("INSERT INTO ant_type VALUES (?, ?)",
+                               [(pattern, f'PAT{pattern}') for pattern in (1, 2, 3)])
+        ras = []
+        grp_id = 1
+        for index in range(stations):
+            ntc_id = 1000 + index
+            ntc_type = 'T' if ntc_id == NOT_RAS else 'R'
+            if ntc_type == 'R':
+                ras.append(ntc_id)
+            adm = ADMINISTRATIONS[index % len(ADMINISTRATIONS)]
+            connection.execute("INSERT INTO com_el VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                               (ntc_id, ntc_type, adm, adm, f"ST{index}'s" if index == 2 else f'ST{index}',
+                                -170.0 + 29.0 * index, -80.0 + 13.0 * index, 'p', '2020-01-02 00:00:00'))
+            if ntc_id != NO_SITE:
+                connection.execute("INSERT INTO e_stn VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                   (ntc_id, index, 'E', 2, 3.5, index, 'N', 5, 6.25, None if index % 2 else 5.0,
+                                    90.0, 0.0, 360.0, None if index % 3 == 0 else 100.0 + index))
+            for beam in range(1 + index % 3):
+                beam_name = "B'1" if index == 2 and beam == 1 else f'B{beam}'
+                connection.execute("INSERT INTO e_ant VALUES (?, ?, ?, ?, ?, ?)",
+                                   (ntc_id, beam_name, [None, 1, 2, 9][(index + beam) % 4],
+                                    None if beam else 25.0 + index, None if index % 4 == 1 else 60.0, 'A1'))
+                if ntc_id == NO_GROUPS and beam == 0:
+                    continue
+                for group in range(1 + (index + beam) % 2):
+                    freq_min = FREQUENCIES[(index + beam + group) % len(FREQUENCIES)]
+                    connection.execute("INSERT INTO grp VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                       (ntc_id, beam_name, grp_id, None if group else 20.0 + index, freq_min,
+                                        freq_min + 27.0, None, '2020-01-02 00:00:00', 2900 + index, None,
+                                        ['S', 'V', None][(index + group) % 3]))
+                    if not (ntc_id == NO_FREQ and beam == group == 0):
+                        connection.execute("INSERT INTO freq VALUES (?, ?, ?)", (ntc_id, beam_name, freq_min + 5.0))
+                    grp_id += 1
+        connection.commit()
+        return ras
+    finally:
+        connection.close()
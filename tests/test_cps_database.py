@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the set-based CPS database build against a station by station walk of the ITU queries.
+
+@author: boris.sorokin@skao.int
+"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from itu_extract import ItuRepository, ItuSnapshot
+from ras_exporters import write_cps_database
+from tests.itu_fixture import NO_GROUPS, make_itu_database
+
+COUNTRY_NAMES = {'F': 'France', 'D': 'Germany'}
+
+
+def _limits(values):
+    values = [value for value in values if value is not None]
+    return (min(values), max(values)) if values else (None, None)
+
+
+def expected_tables(repository):
+    """Stations, Antennas and Frequency_Bands rows as the former per-row build inserted them."""
+    stations, antennas, bands = [], [], []
+    for notice in repository.ras_notices():
+        station = repository.get_station(notice.ntc_id)
+        sites = repository.get_sites(station.ntc_id)
+        elev_min = sites[0].elev_min if sites else None
+        cps_station_id = len(stations) + 1
+        station_frequencies = []
+        for beam in repository.get_beams(station.ntc_id):
+            cps_antenna_id = len(antennas) + 1
+            antenna_frequencies = []
+            for group in repository.get_groups(station.ntc_id, beam.beam_name):
+                bands.append((cps_station_id, cps_antenna_id, len(bands) + 1, group.freq_min, group.freq_max,
+                              1 if group.ra_stn_type == 'V' else 0, group.noise_t))
+                antenna_frequencies += [group.freq_min, group.freq_max]
+            antennas.append((cps_station_id, cps_antenna_id, beam.ant_diam, elev_min, station.long_dec,
+                             station.lat_dec) + _limits(antenna_frequencies))
+            station_frequencies += antenna_frequencies
+        stations.append((cps_station_id, station.ntc_id, station.adm, COUNTRY_NAMES.get(station.ctry, 'Unknown'),
+                         station.stn_name, station.long_dec, station.lat_dec, 1) + _limits(station_frequencies))
+    return stations, antennas, bands
+
+
+class CpsDatabaseTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        itu_path = os.path.join(self.directory, 'itu.sqlite')
+        make_itu_database(itu_path, stations=30)
+        self.itu = sqlite3.connect(itu_path)
+        self.addCleanup(self.itu.close)
+
+    def read(self, connection, statement):
+        return [tuple(row) for row in connection.execute(statement)]
+
+    def test_tables_match_the_per_station_build(self):
+        path = os.path.join(self.directory, 'cps.db')
+        write_cps_database(ItuSnapshot(self.itu), COUNTRY_NAMES, path, wikidata=False)
+        stations, antennas, bands = expected_tables(ItuRepository(self.itu))
+
+        cps = sqlite3.connect(path)
+        self.addCleanup(cps.close)
+        self.assertEqual(self.read(cps, '''
+            SELECT "CPS Station ID", "ITU Notice ID", "ITU responsible Administration", "Country", "Short Name",
+                   "Station longitude [deg]", "Station latitude [deg]", "Registered at ITU",
+                   "Min station frequency [MHz]", "Max station frequency [MHz]"
+            FROM Stations ORDER BY "CPS Station ID";'''), stations)
+        self.assertEqual(self.read(cps, '''
+            SELECT "CPS Station ID", "CPS Antenna ID", "Antenna diameter [m]", "Minimum elevation [deg]",
+                   "Antenna longitude [deg]", "Antenna latitude [deg]",
+                   "Minimum frequency [MHz]", "Maximum frequency [MHz]"
+            FROM Antennas ORDER BY "CPS Antenna ID";'''), antennas)
+        self.assertEqual(self.read(cps, '''
+            SELECT "CPS Station ID", "CPS Antenna ID", "CPS Band ID", "Band start [MHz]", "Band stop [MHz]",
+                   "Supports RAS mode VLBI", "Noise temperature [K]"
+            FROM Frequency_Bands ORDER BY "CPS Band ID";'''), bands)
+        self.assertEqual(dict(self.read(cps, 'SELECT name, seq FROM sqlite_sequence;')),
+                         {'Stations': len(stations), 'Antennas': len(antennas), 'Frequency_Bands': len(bands)})
+        self.assertEqual(self.read(cps, 'SELECT COUNT(*) FROM wikidata;'), [(0,)])
+
+    def test_antenna_without_groups_has_no_frequency_limits(self):
+        path = os.path.join(self.directory, 'cps.db')
+        write_cps_database(ItuSnapshot(self.itu), COUNTRY_NAMES, path, wikidata=False)
+        cps = sqlite3.connect(path)
+        self.addCleanup(cps.close)
+        limits = self.read(cps, f'''
+            SELECT "Minimum frequency [MHz]", "Maximum frequency [MHz]" FROM Antennas
+            WHERE "CPS Station ID" = (SELECT "CPS Station ID" FROM Stations WHERE "ITU Notice ID" = {NO_GROUPS})
+            ORDER BY "CPS Antenna ID";''')
+        self.assertEqual(limits[0], (None, None))
+        self.assertNotEqual(limits[1], (None, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
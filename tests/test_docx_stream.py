@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the streamed DOCX writer and of the station sections of the RAS annex.
+
+@author: boris.sorokin@skao.int
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+import docx
+
+from docx_stream import StreamingDocument
+from itu_extract import BeamRow, GroupRow, SiteRow, StationRow
+from ras_exporters import station_section_xml
+
+STATION = StationRow(101, 'F', 'FRA', 'NANCAY', 2.2, 47.4)
+SITE = SiteRow(2, 'E', 11, 50, 47, 'N', 22, 48, 5, 90, 0, 360, 137)
+BEAMS = [BeamRow('A', 1, 25.0, 40.5, None), BeamRow('B', None, None, None, None)]
+
+
+def group(noise_t, freq_min, freq_max, ra_stn_type='S'):
+    return GroupRow(1, noise_t, freq_min, freq_max, None, None, None, None, ra_stn_type)
+
+
+class StreamingDocumentTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, sections):
+        path = os.path.join(self.directory, 'annex.docx')
+        with StreamingDocument(path) as doc:
+            doc.heading('Annex', level=1)
+            doc.paragraph('A & B <tags>\tand a tab')
+            for number, record in enumerate(sections, 1):
+                doc.write(station_section_xml(record, number))
+        return docx.Document(path)
+
+    def test_python_docx_reopens_the_document(self):
+        document = self.write([])
+        self.assertEqual([(paragraph.style.name, paragraph.text) for paragraph in document.paragraphs],
+                         [('Heading 1', 'Annex'), ('Normal', 'A & B <tags>\tand a tab')])
+
+    def test_antennas_show_their_own_groups(self):
+        groups = [[group(20, 1400, 1427), group(25, 1610, 1613, 'V')], [group(30, 4990, 5000)]]
+        texts = [paragraph.text for paragraph in self.write([(STATION, SITE, BEAMS, groups, 'France', 'France')])
+                 .paragraphs]
+        self.assertIn('Minimum Station Frequency [MHz]: "1400 MHz"', texts)
+        self.assertIn('Maximum Station Frequency [MHz]: "5000 MHz"', texts)
+        antenna_b = texts.index('Antenna #2')
+        self.assertEqual(texts[texts.index('Antenna #1') + 2:antenna_b][:1], ['Noise temparature [K]: "20, 25"'])
+        self.assertIn('Supports RAS mode VLBI: "Yes"', texts[:antenna_b])
+        self.assertEqual(texts[antenna_b + 2:antenna_b + 7], [
+            'Noise temparature [K]: "30"', 'Antenna diameter [m]: "N/A"', 'Maximum antenna gain [dBi]: "N/A"',
+            'Minimim antenna frequency [MHz]: "4990"', 'Maximum antenna frequency [MHz]: "5000"'])
+        self.assertIn('Supports RAS mode VLBI: "No"', texts[antenna_b:])
+
+    def test_missing_site_and_groups_are_not_available(self):
+        groups = [[group(None, None, None, None)], []]
+        texts = [paragraph.text for paragraph in self.write([(STATION, None, BEAMS, groups, 'France', 'France')])
+                 .paragraphs]
+        self.assertIn('Station altitude (AMSL) "N/A"', texts)
+        self.assertIn('Minimum Station Frequency [MHz]: "N/A"', texts)
+        self.assertIn('Maximum Station Frequency [MHz]: "N/A"', texts)
+        self.assertEqual(texts.count('Noise temparature [K]: "N/A"'), 2)
+        self.assertEqual(texts.count('Supports RAS mode VLBI: "N/A"'), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the local SQLite mirror of the ITU database: what it keeps of the source, how it
+is found again and when it is imported anew.
+
+@author: boris.sorokin@skao.int
+"""
+import datetime
+import decimal
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from itu_cache import file_hash, find_cache, import_snapshot, open_cache, prepare_cache
+
+D_CREATE = datetime.datetime(2024, 5, 1, 12, 30, 15)
+
+
+class MemorySource:
+    """Source (see itu_cache.open_source) serving {table: ([(column, Python type), ...], rows)}."""
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+    def columns(self, table):
+        return self.tables[table][0]
+
+    def iter_rows(self, table, columns=None, where='', keep=None):
+        names = [name for name, _ in self.tables[table][0]]
+        for row in self.tables[table][1]:
+            if keep is None or row[names.index(keep[0])] in keep[1]:
+                yield tuple(row[names.index(name)] for name in columns) if columns else tuple(row)
+
+
+def itu_tables():
+    return {
+        'srs_ooak': ([('d_create', datetime.datetime), ('comment', str)], [(D_CREATE, 'IFIC2990 test')]),
+        'com_el': ([('ntc_id', int), ('ntc_type', str), ('adm', str), ('stn_name', str), ('d_rcv', datetime.date),
+                    ('long_dec', decimal.Decimal)],
+                   [(1, 'R', 'F', 'nancay', datetime.date(2020, 1, 2), decimal.Decimal('2.19')),
+                    (2, 'R', 'F', 'Bordeaux', None, decimal.Decimal('-0.53')),
+                    (3, 'T', 'D', 'Transmitter', None, None)]),
+        'e_stn': ([('ntc_id', int), ('elev_min', float)], [(1, 5.0), (3, 0.0)]),
+        'e_ant': ([('ntc_id', int), ('beam_name', str), ('pattern_id', int), ('attch_e', bytes)],
+                  [(1, 'A', 7, b'\x00\x01'), (2, 'B', None, None), (3, 'C', 8, None)]),
+        'grp': ([('ntc_id', int), ('beam_name', str), ('d_inuse', datetime.datetime), ('wic_no', bool)],
+                [(1, 'A', datetime.datetime(2001, 2, 3, 4, 5, 6), True)]),
+        'freq': ([('ntc_id', int), ('beam_name', str), ('freq_mhz', float)], [(1, 'A', 1420.4)]),
+        'ant_type': ([('pattern_id', int), ('pattern', str)], [(7, 'REC-580'), (8, 'APERR_001V01')]),
+    }
+
+
+class ItuCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.cache_dir = os.path.join(self.directory, 'cache')
+        self.mdb_path = self.write_mdb('IFIC2990.mdb', b'snapshot')
+
+    def write_mdb(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as file:
+            file.write(content)
+        return path
+
+    def import_mirror(self):
+        return import_snapshot(MemorySource(itu_tables()), self.mdb_path, self.cache_dir)
+
+    def test_mirror_keeps_types_dates_and_collation(self):
+        cache_path = self.import_mirror()
+        mdb_hash = file_hash(self.mdb_path, self.cache_dir)
+        self.assertEqual(os.path.basename(cache_path), f'ITU_IFIC299_{mdb_hash[:16]}.sqlite')
+        connection = open_cache(cache_path)
+        self.addCleanup(connection.close)
+        self.assertEqual(connection.execute('SELECT d_create, comment FROM srs_ooak').fetchall(),
+                         [(D_CREATE, 'IFIC2990 test')])
+        self.assertEqual(connection.execute('SELECT * FROM com_el ORDER BY ntc_id').fetchall(), [
+            (1, 'R', 'F', 'nancay', datetime.date(2020, 1, 2), 2.19), (2, 'R', 'F', 'Bordeaux', None, -0.53)])
+        self.assertEqual(connection.execute('SELECT * FROM grp').fetchall(),
+                         [(1, 'A', datetime.datetime(2001, 2, 3, 4, 5, 6), 1)])
+        self.assertEqual(connection.execute('SELECT attch_e FROM e_ant ORDER BY ntc_id').fetchall(),
+                         [(b'\x00\x01',), (None,)])
+        # Text compares without regard to case, as in Access
+        self.assertEqual(connection.execute("SELECT ntc_id FROM com_el WHERE stn_name = 'NANCAY'").fetchall(), [(1,)])
+        self.assertEqual([row[0] for row in connection.execute('SELECT stn_name FROM com_el ORDER BY stn_name')],
+                         ['Bordeaux', 'nancay'])
+
+    def test_mirror_only_keeps_ras_notices(self):
+        connection = open_cache(self.import_mirror())
+        self.addCleanup(connection.close)
+        self.assertEqual(connection.execute('SELECT ntc_id FROM e_stn').fetchall(), [(1,)])
+        self.assertEqual(connection.execute('SELECT ntc_id FROM e_ant ORDER BY ntc_id').fetchall(), [(1,), (2,)])
+        self.assertEqual(connection.execute('SELECT pattern FROM ant_type').fetchall(), [('REC-580',)])
+
+    def test_mirror_is_found_until_the_file_changes(self):
+        self.assertIsNone(find_cache(self.mdb_path, self.cache_dir))
+        cache_path = self.import_mirror()
+        self.assertEqual(find_cache(self.mdb_path, self.cache_dir), cache_path)
+        self.assertEqual(prepare_cache(self.mdb_path, self.cache_dir), cache_path)
+
+        with open(self.mdb_path, 'wb') as file:
+            file.write(b'next snapshot')
+        self.assertIsNone(find_cache(self.mdb_path, self.cache_dir))
+        self.assertNotEqual(self.import_mirror(), cache_path)
+
+    def test_hashes_of_concurrent_threads_are_all_kept(self):
+        paths = [self.write_mdb(f'{number}.mdb', bytes([number]) * 1000) for number in range(16)]
+        threads = [threading.Thread(target=file_hash, args=(path, self.cache_dir)) for path in paths]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with open(os.path.join(self.cache_dir, 'index.json'), encoding='utf-8') as index_file:
+            index = json.load(index_file)
+        self.assertEqual(set(index), {os.path.realpath(path) for path in paths})
+        self.assertEqual(os.listdir(self.cache_dir), ['index.json'])
+
+
+if __name__ == '__main__':
+    unittest.main()
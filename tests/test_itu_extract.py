@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the bulk ITU extraction against the per-station queries it replaces, and of the
+flattened CSV written from it.
+
+@author: boris.sorokin@skao.int
+"""
+import csv
+import io
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from itu_extract import ItuRepository, ItuSnapshot
+from ras_exporters import CSV_FIELDS, CSV_STATION_COLUMNS, write_full_csv
+from tests.itu_fixture import NO_FREQ, NO_GROUPS, NO_SITE, NOT_RAS, make_itu_database
+
+
+class ItuSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.ras = make_itu_database(os.path.join(directory, 'itu.sqlite'))
+        self.connection = sqlite3.connect(os.path.join(directory, 'itu.sqlite'))
+        self.addCleanup(self.connection.close)
+        self.repository = ItuRepository(self.connection)
+        self.snapshot = ItuSnapshot(self.connection)
+
+    def test_stations_are_the_ras_notices(self):
+        self.assertEqual([station.ntc_id for station in self.snapshot.stations],
+                         [notice.ntc_id for notice in self.repository.ras_notices()])
+        self.assertEqual(sorted(station.ntc_id for station in self.snapshot.stations), self.ras)
+        self.assertNotIn(NOT_RAS, self.snapshot.sites)
+
+    def test_snapshot_matches_the_per_station_queries(self):
+        for ntc_id in self.ras:
+            with self.subTest(ntc_id=ntc_id):
+                self.assertIn(self.repository.get_station(ntc_id), self.snapshot.stations)
+                self.assertEqual(self.snapshot.sites_of(ntc_id), self.repository.get_sites(ntc_id))
+                beams = self.repository.get_beams(ntc_id)
+                self.assertEqual(self.snapshot.beams_of(ntc_id), beams)
+                for beam in beams:
+                    self.assertEqual(self.snapshot.groups_of(ntc_id, beam.beam_name),
+                                     self.repository.get_groups(ntc_id, beam.beam_name))
+                    self.assertEqual(self.snapshot.frequencies_of(ntc_id, beam.beam_name),
+                                     self.repository.get_frequencies(ntc_id, beam.beam_name))
+                    if beam.pattern_id is not None and self.repository.get_pattern(beam.pattern_id):
+                        self.assertEqual(self.snapshot.antenna_name(beam),
+                                         self.repository.get_pattern(beam.pattern_id))
+                    else:
+                        self.assertTrue(self.snapshot.antenna_name(beam).startswith('NonTypical'))
+
+    def test_edge_cases_are_in_the_fixture(self):
+        self.assertEqual(self.snapshot.sites_of(NO_SITE), [])
+        self.assertEqual(self.snapshot.groups_of(NO_GROUPS, 'B0'), [])
+        self.assertEqual(len(self.snapshot.frequencies_of(NO_FREQ, 'B0')),
+                         len(self.snapshot.groups_of(NO_FREQ, 'B0')) - 1)
+        self.assertTrue(self.snapshot.groups_of(1002, "B'1"))
+
+    def test_full_csv(self):
+        output = io.StringIO()
+        write_full_csv(self.snapshot, csv.writer(output))
+        rows = list(csv.reader(io.StringIO(output.getvalue())))
+        self.assertEqual(rows[0], CSV_FIELDS)
+        self.assertTrue(all(len(row) == len(CSV_FIELDS) for row in rows))
+        groups = sum(len(self.snapshot.groups_of(ntc_id, beam.beam_name))
+                     for ntc_id in self.ras for beam in self.snapshot.beams_of(ntc_id))
+        self.assertEqual(len(rows) - 1, groups)
+
+        first_rows = {row[0]: row for row in rows[1:] if row[0]}
+        self.assertEqual(first_rows[str(NO_SITE)][6:CSV_STATION_COLUMNS], [''] * (CSV_STATION_COLUMNS - 6))
+        self.assertEqual(first_rows[str(NO_SITE)][3], 'ST3')
+        site = self.snapshot.sites_of(1001)[0]
+        self.assertEqual(first_rows['1001'][6:CSV_STATION_COLUMNS],
+                         ['' if value is None else str(value) for value in site[:CSV_STATION_COLUMNS - 6]])
+        # The group without a freq row of its beam is the last one, the rows are paired by position
+        self.assertEqual([row[CSV_STATION_COLUMNS + 4] for row in rows[1:] if row[CSV_STATION_COLUMNS + 3] == ''],
+                         [str(self.snapshot.groups_of(NO_FREQ, 'B0')[-1].grp_id)])
+
+
+if __name__ == '__main__':
+    unittest.main()
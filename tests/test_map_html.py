@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the station map pages and of how they are handed to QtWebEngine.
+
+@author: boris.sorokin@skao.int
+"""
+import os
+import unittest
+from urllib.parse import urlsplit
+
+from map_html import publish_map_page, published_map_page, stations_feature_collection, stations_map_html
+from map_resources import MAP_BASE_URL, PAGES_PATH
+
+# Largest page QWebEngineView.setHtml accepts
+SET_HTML_LIMIT = 2 * 1024 * 1024
+
+GUI_SOURCE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'DB_generator_GUI_QT.py')
+
+
+def synthetic_stations(count):
+    return [(f'Station {index}', 'ADM', 'CTR', -60 + (index % 1200) / 10, -180 + index / count * 360)
+            for index in range(count)]
+
+
+class MapPageTest(unittest.TestCase):
+    def test_large_page_is_served_through_the_scheme(self):
+        html = stations_map_html(synthetic_stations(50_000), 'ITU', '')
+        self.assertGreater(len(html.encode('utf-8')), SET_HTML_LIMIT)
+        url = publish_map_page(html)
+        self.assertTrue(url.startswith(MAP_BASE_URL + PAGES_PATH[1:]))
+        self.assertEqual(published_map_page(urlsplit(url).path), html.encode('utf-8'))
+
+    def test_unknown_page_is_not_found(self):
+        self.assertIsNone(published_map_page(PAGES_PATH + '0' * 40 + '.html'))
+        self.assertIsNone(published_map_page('/assets/leaflet.js'))
+
+    def test_gui_does_not_load_pages_with_set_html(self):
+        # setHtml silently fails on pages over 2 MB, all map pages go through publish_map_page
+        with open(GUI_SOURCE, encoding='utf-8') as file:
+            self.assertNotIn('.setHtml(', file.read())
+
+    def test_stations_without_coordinates_are_left_out(self):
+        collection = stations_feature_collection([('A', 'ADM', 'CTR', 1.5, 2.5), ('B', 'ADM', 'CTR', None, 'x')])
+        self.assertEqual([feature['properties']['name'] for feature in collection['features']], ['A'])
+        self.assertEqual(collection['features'][0]['geometry']['coordinates'], [2.5, 1.5])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the pure-Python .mdb reader on a small Jet4 database written by Access (see data/README.md)
+and of its value decoders.
+
+@author: boris.sorokin@skao.int
+"""
+import datetime
+import decimal
+import os
+import struct
+import tempfile
+import unittest
+
+from itu_cache import MdbSource
+from mdb_reader import MdbFile, MdbFormatError, decode_datetime, decode_numeric, decode_text
+
+MDB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'merchant_taylors.mdb')
+
+COLUMNS = [('Id No', int), ('Surname', str), ('Forenames', str), ('How Admitted', str),
+           ('Forenames_Master_or_Father', str), ('Surname_Master_or_Father', str), ('Notes', str),
+           ('Date of order of Court', datetime.datetime), ('Freedom', datetime.datetime),
+           ('Livery', datetime.datetime), ('Remarks', str), ('Source Ref', str)]
+
+
+class MdbFileTest(unittest.TestCase):
+    def setUp(self):
+        self.mdb = MdbFile(MDB_PATH)
+        self.addCleanup(self.mdb.close)
+
+    def test_tables_and_columns(self):
+        self.assertEqual(self.mdb.table_names(), ['merchant_taylors'])
+        table = self.mdb.table('MERCHANT_TAYLORS')
+        self.assertEqual([(column.name, column.python_type) for column in table.columns], COLUMNS)
+        self.assertEqual(table.num_rows, 20)
+
+    def test_rows(self):
+        rows = list(self.mdb.iter_rows('merchant_taylors'))
+        self.assertEqual(len(rows), 20)
+        self.assertEqual(rows[0], (1, 'Aaron', 'William', 'Redn.', None, None, 'Order of Court',
+                                   datetime.datetime(1760, 6, 5), datetime.datetime(1760, 7, 3), None, None, 'MF 324'))
+        self.assertEqual(rows[2][:4] + rows[2][7:10], (3, 'Abbis', 'John', None, None, None,
+                                                        datetime.datetime(1699, 3, 22)))
+        self.assertEqual(rows[-1], (25491, "'", 'Richard', 'Serv.', 'Samuel', 'Price', None, None,
+                                    datetime.datetime(1750, 11, 7), None, None, 'MF 324'))
+
+    def test_selected_columns(self):
+        rows = list(self.mdb.iter_rows('merchant_taylors', ['surname', 'Id No']))
+        self.assertEqual(rows[:2], [('Aaron', 1), ('Abbey', 2)])
+        with self.assertRaises(MdbFormatError):
+            list(self.mdb.iter_rows('merchant_taylors', ['ntc_id']))
+        with self.assertRaises(MdbFormatError):
+            self.mdb.table('com_el')
+
+    def test_source_for_the_mirror(self):
+        source = MdbSource(MDB_PATH)
+        self.addCleanup(source.close)
+        self.assertEqual(source.columns('merchant_taylors'), COLUMNS)
+        rows = source.iter_rows('merchant_taylors', ['Id No', 'Forenames'], keep=('Surname', {'Abbis'}))
+        self.assertEqual(list(rows), [(3, 'John'), (4, 'Thomas'), (5, 'James')])
+
+    def test_other_files_are_rejected(self):
+        with tempfile.NamedTemporaryFile(suffix='.mdb', delete=False) as file:
+            file.write(b'\x00' * 4096)
+        self.addCleanup(os.remove, file.name)
+        with self.assertRaises(MdbFormatError):
+            MdbFile(file.name)
+
+
+class DecoderTest(unittest.TestCase):
+    def test_text(self):
+        self.assertEqual(decode_text('Nançay'.encode('utf-16-le')), 'Nançay')
+        # Compressed unicode: 1-byte characters until a 0x00 byte switches to 2-byte ones
+        self.assertEqual(decode_text(b'\xff\xfeab\x00' + 'é€'.encode('utf-16-le') + b'\x00cd'), 'abé€cd')
+
+    def test_datetime(self):
+        self.assertEqual(decode_datetime(1.5), datetime.datetime(1899, 12, 31, 12))
+        # Before 1899-12-30 the day is negative but the time of day still counts forward
+        self.assertEqual(decode_datetime(-1.25), datetime.datetime(1899, 12, 29, 6))
+
+    def test_numeric(self):
+        self.assertEqual(decode_numeric(b'\x80' + struct.pack('<4I', 0, 0, 0, 12345), 2), decimal.Decimal('-123.45'))
+        self.assertEqual(decode_numeric(b'\x00' + struct.pack('<4I', 0, 0, 1, 0), 0), decimal.Decimal(2 ** 32))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the batch pre-matching of Wikidata entries to ITU stations at its distance and
+name similarity thresholds.
+
+@author: boris.sorokin@skao.int
+"""
+import sqlite3
+import unittest
+
+import numpy as np
+
+from site_matching import name_similarity, nearest_stations, prematch, write_links
+
+# Degrees of latitude just within and just beyond 5 km along a meridian
+WITHIN_5_KM = 0.0449
+BEYOND_5_KM = 0.0451
+
+
+def wiki(wiki_id, name, latitude, longitude):
+    """Row of the CPS wikidata table as fetched with SELECT *."""
+    return (wiki_id, name, 'Country', longitude, latitude, 'source', None)
+
+
+def station(station_id, short_name, latitude, longitude, long_name=None):
+    """Row of the CPS Stations table as fetched with SELECT *, up to the coordinates."""
+    return (station_id, 'Country', short_name, long_name, None, longitude, latitude)
+
+
+class NameSimilarityTest(unittest.TestCase):
+    def test_similarity(self):
+        self.assertEqual(name_similarity('Effelsberg 100m Radio Telescope', 'EFFELSBERG'), 1.0)
+        self.assertEqual(name_similarity('Nançay', 'NANCAY'), 1.0)
+        # Truncated ITU names match the words they start
+        self.assertEqual(name_similarity('Westerbork Synthesis Radio Telescope', 'WESTERB'), 1.0)
+        self.assertEqual(name_similarity('VLBA 1', 'VLBA 2'), 0.0)
+        self.assertEqual(name_similarity('', 'VLBA'), 0.0)
+        self.assertEqual(name_similarity('Alpha Bravo Charlie Delta Echo',
+                                         'Alpha Bravo Charlie Delta Observatoire Radioastronomique Kilimanjaro'), 0.8)
+
+
+class PrematchTest(unittest.TestCase):
+    def test_distance_threshold(self):
+        stations = [station(1, 'EFFELSBERG', 50.5248, 6.8836)]
+        entries = [wiki(10, 'Effelsberg', 50.5248 + WITHIN_5_KM, 6.8836),
+                   wiki(11, 'Effelsberg', 50.5248 - BEYOND_5_KM, 6.8836)]
+        result = prematch(entries, stations)
+        self.assertEqual(result.links, [(10, 1)])
+        self.assertEqual(result.confident, entries[:1])
+        self.assertEqual(result.review, entries[1:])
+
+    def test_similarity_threshold(self):
+        stations = [station(1, 'Alpha Bravo Charlie Delta Observatoire Radioastronomique Kilimanjaro', 0.0, 0.0),
+                    station(2, 'YEBES RT40', 40.52, -3.09)]
+        entries = [wiki(10, 'Alpha Bravo Charlie Delta Echo', 0.0, 0.0), wiki(11, 'Yebes 40m', 40.52, -3.09)]
+        self.assertLess(name_similarity('Yebes 40m', 'YEBES RT40'), 0.8)
+        result = prematch(entries, stations)
+        self.assertEqual(result.links, [(10, 1)])
+        self.assertEqual(result.review, entries[1:])
+        self.assertEqual(prematch(entries, stations, min_similarity=0.75).links, [(10, 1), (11, 2)])
+
+    def test_long_name_and_several_notices_of_one_site(self):
+        stations = [station(1, 'WSRT', 52.915, 6.604, 'Westerbork Synthesis Radio Telescope'),
+                    station(2, 'WESTERBORK', 52.916, 6.604),
+                    station(3, 'DWINGELOO', 52.812, 6.396)]
+        result = prematch([wiki(10, 'Westerbork Synthesis Radio Telescope', 52.915, 6.603)], stations)
+        self.assertEqual(result.links, [(10, 1), (10, 2)])
+
+    def test_only_the_k_closest_stations_are_scored(self):
+        stations = [station(number, f'OTHER {number}', 10.0 + number * 0.001, 20.0) for number in range(1, 4)]
+        stations.append(station(4, 'TARGET', 10.02, 20.0))
+        entry = wiki(10, 'Target', 10.0, 20.0)
+        self.assertEqual(prematch([entry], stations, k=3).review, [entry])
+        self.assertEqual(prematch([entry], stations, k=4).links, [(10, 4)])
+
+    def test_entries_and_stations_without_coordinates(self):
+        stations = [station(1, 'ALMA', None, None), station(2, 'ALMA', -23.02, -67.75)]
+        entries = [wiki(10, 'ALMA', 'N/A', -67.75), wiki(11, 'ALMA', -23.02, -67.75)]
+        indices, distances = nearest_stations(entries, stations, k=5)
+        self.assertEqual(indices.tolist(), [[-1], [1]])
+        result = prematch(entries, stations)
+        self.assertEqual(result.links, [(11, 2)])
+        self.assertEqual(result.review, entries[:1])
+
+    def test_chunked_distance_matrix(self):
+        stations = [station(number, f'S{number}', -80 + number, -170 + 3 * number) for number in range(50)]
+        entries = [wiki(number, f'W{number}', -79.5 + number, -169 + 3 * number) for number in range(40)]
+        whole = nearest_stations(entries, stations, k=3)
+        chunked = nearest_stations(entries, stations, k=3, chunk_elements=60)
+        self.assertEqual(whole[0].tolist(), chunked[0].tolist())
+        np.testing.assert_allclose(whole[1], chunked[1])
+
+    def test_links_are_written(self):
+        connection = sqlite3.connect(':memory:')
+        self.addCleanup(connection.close)
+        connection.execute('CREATE TABLE wikidata ("CPS Wiki ID" INTEGER PRIMARY KEY, "Linked ITU" INTEGER)')
+        connection.execute('CREATE TABLE wikidata_stations_link ("CPS Wiki ID" INTEGER, "CPS Station ID" INTEGER)')
+        connection.executemany('INSERT INTO wikidata VALUES (?, NULL)', [(10,), (11,)])
+        write_links(connection, [(10, 1), (10, 2)])
+        self.assertEqual(connection.execute('SELECT * FROM wikidata_stations_link').fetchall(), [(10, 1), (10, 2)])
+        self.assertEqual(connection.execute('SELECT * FROM wikidata').fetchall(), [(10, 1), (11, None)])
+
+
+if __name__ == '__main__':
+    unittest.main()
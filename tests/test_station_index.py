@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the station spatial index against a brute force great-circle search.
+
+@author: boris.sorokin@skao.int
+"""
+import math
+import unittest
+
+import numpy as np
+
+from station_index import EARTH_RADIUS_KM, StationIndex
+
+
+def haversine_km(latitude1, longitude1, latitude2, longitude2):
+    latitude1, longitude1, latitude2, longitude2 = map(math.radians, (latitude1, longitude1, latitude2, longitude2))
+    a = (math.sin((latitude2 - latitude1) / 2) ** 2
+         + math.cos(latitude1) * math.cos(latitude2) * math.sin((longitude2 - longitude1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class StationIndexTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        generator = np.random.default_rng(7)
+        count = 3000
+        cls.latitudes = list(np.degrees(np.arcsin(generator.uniform(-1, 1, count))))
+        cls.longitudes = list(generator.uniform(-180, 180, count))
+        # A cluster of sites a few hundred metres apart, and stations without usable coordinates
+        for offset in range(20):
+            cls.latitudes.append(47.38 + offset * 0.003)
+            cls.longitudes.append(2.19)
+        cls.latitudes += [None, 'N/A', 12.0, float('nan')]
+        cls.longitudes += [1.0, 2.0, '', 3.0]
+        cls.queries = [(0.0, 0.0), (89.9, 10.0), (-89.9, -170.0), (10.0, 179.95), (10.0, -179.95), (47.4, 2.19)]
+        cls.queries += list(zip(generator.uniform(-90, 90, 30), generator.uniform(-180, 180, 30)))
+
+    def brute_force(self, latitude, longitude):
+        """(distance, position) of every station with coordinates, closest first."""
+        distances = []
+        for position, (station_latitude, station_longitude) in enumerate(zip(self.latitudes, self.longitudes)):
+            try:
+                station_latitude, station_longitude = float(station_latitude), float(station_longitude)
+            except (TypeError, ValueError):
+                continue
+            if not (math.isnan(station_latitude) or math.isnan(station_longitude)):
+                distances.append((haversine_km(latitude, longitude, station_latitude, station_longitude), position))
+        return sorted(distances)
+
+    def indexes(self):
+        tree = StationIndex(self.latitudes, self.longitudes, leaf_size=16)
+        self.assertTrue(tree.uses_tree)
+        flat = StationIndex(self.latitudes, self.longitudes, use_tree=False)
+        self.assertFalse(flat.uses_tree)
+        self.assertEqual(len(tree), len(self.latitudes) - 4)
+        return tree, flat
+
+    def test_nearest_matches_brute_force(self):
+        for index in self.indexes():
+            for latitude, longitude in self.queries:
+                with self.subTest(tree=index.uses_tree, latitude=latitude, longitude=longitude):
+                    expected = self.brute_force(latitude, longitude)[:10]
+                    positions, distances = index.nearest(latitude, longitude, k=10)
+                    np.testing.assert_allclose(distances, [distance for distance, _ in expected], atol=1e-6)
+                    self.assertEqual(set(positions), {position for _, position in expected})
+
+    def test_within_matches_brute_force(self):
+        for index in self.indexes():
+            for latitude, longitude in self.queries:
+                for radius_km in (0.5, 300.0, 2000.0):
+                    with self.subTest(tree=index.uses_tree, latitude=latitude, longitude=longitude, radius=radius_km):
+                        expected = [(distance, position) for distance, position in self.brute_force(latitude, longitude)
+                                    if distance <= radius_km]
+                        positions, distances = index.within(latitude, longitude, radius_km)
+                        self.assertEqual(sorted(positions), sorted(position for _, position in expected))
+                        np.testing.assert_allclose(distances, [distance for distance, _ in expected], atol=1e-6)
+                        self.assertTrue(np.all(np.diff(distances) >= 0))
+
+    def test_more_neighbours_than_stations(self):
+        index = StationIndex([10.0, None, 20.0], [0.0, 0.0, 0.0])
+        positions, distances = index.nearest(10.0, 0.0, k=5)
+        self.assertEqual(list(positions), [0, 2])
+        self.assertAlmostEqual(distances[1], haversine_km(10.0, 0.0, 20.0, 0.0), places=6)
+        self.assertEqual(len(StationIndex([], []).nearest(0.0, 0.0)[0]), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the incremental Wikidata harvest against an in-memory stand-in of the endpoint.
+
+    python -m unittest discover tests
+
+@author: boris.sorokin@skao.int
+"""
+import re
+import shutil
+import tempfile
+import threading
+import unittest
+
+from wikidata_harvest import HarvestCancelled, RecordedTransport, WikidataHarvester
+
+ENTITY = 'http://www.wikidata.org/entity/'
+
+
+class FakeEndpoint:
+    """Answers the harvest queries from items = {IRI: modification date} and records the queries."""
+
+    def __init__(self, count):
+        self.items = {f'{ENTITY}Q{number}': '2024-01-01T00:00:00Z' for number in range(1, count + 1)}
+        self.queries = []
+        # Called with the listed page, e.g. to change the items between two pages
+        self.listed = None
+
+    def __call__(self, text):
+        page = re.search(r'STRSTARTS\(STR\(\?item\), "([^"]*)"\) && STR\(\?item\) > "([^"]*)".*LIMIT (\d+)', text,
+                         re.DOTALL)
+        if page:
+            prefix, last, limit = page.group(1), page.group(2), int(page.group(3))
+            self.queries.append(('list', (prefix, last)))
+            listed = [item for item in sorted(self.items) if item.startswith(prefix) and item > last][:limit]
+            bindings = [{'item': {'value': item}, 'modified': {'value': self.items[item]}} for item in listed]
+            if self.listed:
+                self.listed(listed)
+            return {'results': {'bindings': bindings}}
+        entities = re.findall(r'wd:(Q\d+)', text.split('VALUES ?item')[1])
+        self.queries.append(('details', entities))
+        return {'results': {'bindings': [{'item': {'value': ENTITY + entity},
+                                          'itemLabel': {'value': f'{entity} {self.items[ENTITY + entity]}'},
+                                          'countryLabel': {'value': 'Chile'},
+                                          'coordinate_location': {'value': 'Point(-67.75 -23.02)'}}
+                                         for entity in entities if ENTITY + entity in self.items]}}
+
+    def fetched(self):
+        return [entity for kind, entities in self.queries if kind == 'details' for entity in entities]
+
+
+class WikidataHarvesterTest(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        self.endpoint = FakeEndpoint(25)
+
+    def harvester(self, ttl=0):
+        return WikidataHarvester(self.endpoint, self.cache_dir, ttl, page_size=10, batch_size=7)
+
+    def test_first_harvest_fetches_all_items(self):
+        harvester = self.harvester()
+        rows = harvester.rows()
+        self.assertEqual(len(rows), 25)
+        self.assertEqual(rows, sorted(rows))
+        self.assertEqual(rows[0], ('Q1 2024-01-01T00:00:00Z', 'Chile', '-67.75', '-23.02', ENTITY + 'Q1'))
+        self.assertEqual(sorted(self.endpoint.fetched()), sorted(f'Q{number}' for number in range(1, 26)))
+        # Q1 and Q10 to Q19 take two pages, the second one following Q18
+        pages = [page for kind, page in self.endpoint.queries if kind == 'list']
+        self.assertEqual(len(pages), 10)
+        self.assertEqual([last for prefix, last in pages if prefix == ENTITY + 'Q1'], ['', ENTITY + 'Q18'])
+        self.assertEqual(harvester.stats, (25, 25, 0, 0, False))
+
+    def test_only_changed_items_are_fetched_again(self):
+        self.harvester().rows()
+        self.endpoint.items[ENTITY + 'Q3'] = '2025-06-01T00:00:00Z'
+        del self.endpoint.items[ENTITY + 'Q4']
+        self.endpoint.items[ENTITY + 'Q100'] = '2025-06-01T00:00:00Z'
+        self.endpoint.queries.clear()
+
+        harvester = self.harvester()
+        rows = harvester.rows()
+        self.assertEqual(sorted(self.endpoint.fetched()), ['Q100', 'Q3'])
+        self.assertEqual(harvester.stats, (25, 2, 23, 1, False))
+        sources = [row[4] for row in rows]
+        self.assertIn(ENTITY + 'Q100', sources)
+        self.assertNotIn(ENTITY + 'Q4', sources)
+        self.assertIn(('Q3 2025-06-01T00:00:00Z', 'Chile', '-67.75', '-23.02', ENTITY + 'Q3'), rows)
+
+    def test_items_deleted_while_paging_shift_no_page(self):
+        # With LIMIT/OFFSET paging, Q19 would move onto the first page once Q10 is gone and be missed
+        def delete_listed_item(listed):
+            if listed and listed[-1] == ENTITY + 'Q18':
+                del self.endpoint.items[ENTITY + 'Q10']
+        self.endpoint.listed = delete_listed_item
+
+        sources = {row[4] for row in self.harvester().rows()}
+        self.assertEqual(sources, {f'{ENTITY}Q{number}' for number in range(1, 26) if number != 10})
+
+    def test_no_query_within_time_to_live(self):
+        rows = self.harvester().rows()
+        self.endpoint.queries.clear()
+        harvester = self.harvester(ttl=3600)
+        self.assertEqual(harvester.rows(), rows)
+        self.assertEqual(self.endpoint.queries, [])
+        self.assertTrue(harvester.stats.from_cache)
+
+    def test_cancelled_harvest_makes_no_query(self):
+        cancelled = threading.Event()
+        cancelled.set()
+        with self.assertRaises(HarvestCancelled):
+            self.harvester().rows(cancelled)
+        self.assertEqual(self.endpoint.queries, [])
+
+    def test_recorded_responses_replay_the_harvest(self):
+        recordings = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, recordings)
+        rows = WikidataHarvester(RecordedTransport(recordings, self.endpoint), self.cache_dir, 0, page_size=10).rows()
+        shutil.rmtree(self.cache_dir)
+        replayed = WikidataHarvester(RecordedTransport(recordings), self.cache_dir, 0, page_size=10).rows()
+        self.assertEqual(replayed, rows)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+Harvest of the radio telescopes and observatories of Wikidata for the CPS database.
+
+The items are listed with their modification date, in pages each starting after the last
+item IRI of the previous one, so items deleted or added while paging never shift a page
+onto items of another. The IRIs are split by the first digit of their Q number into ranges
+listed a few at a time. Labels, countries and coordinates are then only queried for items
+that are new or were modified since the last harvest; all the others are taken from a JSON
+cache in the local cache directory. Within its time to live the cache is used without
+any query at all.
+
+Queries go through a transport, a callable taking the SPARQL text and returning the
+SPARQL JSON results. The default one posts to the Wikidata endpoint with SPARQLWrapper;
+RecordedTransport replays responses saved in a directory, e.g. for tests or offline builds.
+
+@author: boris.sorokin@skao.int
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from itu_cache import default_cache_dir
+
+WIKIDATA_ENDPOINT = "https://query.wikidata.org/sparql"
+WIKIDATA_USER_AGENT = 'IAU_CPS_RAS_DB_APP/1.0 (ras.database@cps.iau.org)'
+
+# Radio telescopes and radio observatories
+WIKIDATA_ITEMS = """
+VALUES ?val {
+    wd:Q184356
+    wd:Q349772
+}
+?item wdt:P31 ?val.
+"""
+# Items of a range whose IRI starts with the given prefix and sorts after the given IRI
+WIKIDATA_LIST_QUERY = """
+SELECT DISTINCT ?item ?modified WHERE {%s
+FILTER(STRSTARTS(STR(?item), "%%s") && STR(?item) > "%%s")
+OPTIONAL { ?item schema:dateModified ?modified. }
+}
+ORDER BY STR(?item)
+LIMIT %%d
+""" % WIKIDATA_ITEMS
+WIKIDATA_DETAILS_QUERY = """
+SELECT ?item ?itemLabel ?countryLabel ?coordinate_location WHERE {
+VALUES ?item { %s }
+SERVICE wikibase:label { bd:serviceParam wikibase:language "[AUTO_LANGUAGE],en,es,ja,ru". }
+OPTIONAL { ?item wdt:P625 ?coordinate_location. }
+OPTIONAL { ?item wdt:P17 ?country. }
+}
+"""
+
+WIKIDATA_CACHE_TTL = 24 * 3600
+CACHE_FORMAT = 1
+
+_ITEM_IRI = re.compile(r'^https?://www\.wikidata\.org/entity/(Q[0-9]+)$')
+# Item IRIs by the first digit of their Q number
+ITEM_RANGES = tuple(f'http://www.wikidata.org/entity/Q{digit}' for digit in range(1, 10))
+
+HarvestStats = namedtuple('HarvestStats', 'items fetched reused removed from_cache')
+
+
+class HarvestCancelled(Exception):
+    pass
+
+
+def sparqlwrapper_transport(endpoint=WIKIDATA_ENDPOINT, user_agent=WIKIDATA_USER_AGENT, timeout=60):
+    """
+    Transport posting the queries to a SPARQL endpoint (thread-safe, one SPARQLWrapper per query).
+    A query without an answer within timeout seconds fails, so a stalled connection is retried.
+    """
+    def query(text):
+        from SPARQLWrapper import SPARQLWrapper, JSON, POST
+
+        sparql = SPARQLWrapper(endpoint)
+        sparql.addCustomHttpHeader('User-Agent', user_agent)
+        sparql.setMethod(POST)
+        sparql.setQuery(text)
+        sparql.setReturnFormat(JSON)
+        sparql.setTimeout(timeout)
+        return sparql.query().convert()
+    return query
+
+
+def query_key(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class RecordedTransport:
+    """
+    Transport answering from <query_key(query)>.json files in a directory. With a live
+    transport, queries without a recorded response are run on it and their responses saved;
+    without one they raise LookupError.
+    """
+
+    def __init__(self, directory, live=None):
+        self.directory = directory
+        self.live = live
+
+    def __call__(self, text):
+        path = os.path.join(self.directory, query_key(text) + '.json')
+        try:
+            with open(path, encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            if self.live is None:
+                raise LookupError(f'No recorded response for query {query_key(text)}') from None
+        response = self.live(text)
+        _write_json(path, response)
+        return response
+
+
+def _write_json(path, value):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as file:
+        json.dump(value, file, ensure_ascii=False)
+    os.replace(temporary, path)
+
+
+def _value(binding, name):
+    return binding.get(name, {}).get('value', '')
+
+
+def station_row(binding):
+    """(name, country, longitude, latitude, source) of a details query result, coordinates as text or None."""
+    coordinates = _value(binding, 'coordinate_location')
+    if coordinates:
+        longitude, latitude = coordinates.strip('Point()').split()
+    else:
+        longitude, latitude = None, None
+    return (_value(binding, 'itemLabel'), _value(binding, 'countryLabel'), longitude, latitude, _value(binding, 'item'))
+
+
+class WikidataHarvester:
+    """
+    rows() returns the (name, country, longitude, latitude, source) rows of the wikidata
+    table, by name. An item with several countries or coordinates gives several rows.
+    stats describes the last harvest. rows(cancelled) takes an optional threading.Event;
+    once it is set, the harvest raises HarvestCancelled before its next query.
+    """
+
+    def __init__(self, transport=None, cache_dir=None, ttl=WIKIDATA_CACHE_TTL, page_size=500, batch_size=200,
+                 concurrency=4, retries=2):
+        self.transport = transport or sparqlwrapper_transport()
+        self.cache_path = os.path.join(cache_dir or default_cache_dir(), 'wikidata', 'stations.json')
+        self.ttl = ttl
+        self.page_size = page_size
+        self.batch_size = batch_size
+        # The Wikidata query service allows 5 parallel queries per client
+        self.concurrency = max(1, min(concurrency, 5))
+        self.retries = retries
+        self.stats = None
+
+    def _query(self, text, cancelled):
+        for attempt in range(self.retries + 1):
+            if cancelled.is_set():
+                raise HarvestCancelled()
+            try:
+                return self.transport(text)['results']['bindings']
+            except LookupError:
+                raise
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                cancelled.wait(2 ** attempt)
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path, encoding='utf-8') as file:
+                cache = json.load(file)
+        except (OSError, ValueError):
+            return None
+        # Responses of other queries are of no use
+        if cache.get('format') != CACHE_FORMAT or cache.get('query') != query_key(WIKIDATA_DETAILS_QUERY):
+            return None
+        return cache
+
+    def _list_range(self, prefix, cancelled):
+        """Bindings of the items whose IRI starts with prefix, a page at a time from the last IRI seen."""
+        bindings, last = [], ''
+        while True:
+            page = self._query(WIKIDATA_LIST_QUERY % (prefix, last, self.page_size), cancelled)
+            bindings += page
+            if len(page) < self.page_size:
+                return bindings
+            last = _value(page[-1], 'item')
+
+    def list_items(self, executor, cancelled):
+        """{item IRI: modification date} of all items, from ranges queried concurrently."""
+        items = {}
+        for bindings in executor.map(lambda prefix: self._list_range(prefix, cancelled), ITEM_RANGES):
+            for binding in bindings:
+                items[_value(binding, 'item')] = _value(binding, 'modified')
+        return items
+
+    def fetch_rows(self, items, executor, cancelled):
+        """{item IRI: [row, ...]} of the given items, queried in concurrent batches."""
+        entities = []
+        for item in items:
+            match = _ITEM_IRI.match(item)
+            if match:
+                entities.append('wd:' + match.group(1))
+        batches = [entities[start:start + self.batch_size] for start in range(0, len(entities), self.batch_size)]
+        rows = {item: [] for item in items}
+        for bindings in executor.map(lambda batch: self._query(WIKIDATA_DETAILS_QUERY % ' '.join(batch), cancelled),
+                                     batches):
+            for binding in bindings:
+                row = station_row(binding)
+                rows.setdefault(row[4], []).append(row)
+        return rows
+
+    def rows(self, cancelled=None):
+        cancelled = cancelled or threading.Event()
+        cache = self._load_cache()
+        if cache and time.time() - cache['refreshed'] < self.ttl:
+            stations = cache['items']
+            self.stats = HarvestStats(len(stations), 0, len(stations), 0, True)
+        else:
+            known = cache['items'] if cache else {}
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                listed = self.list_items(executor, cancelled)
+                changed = [item for item, modified in listed.items()
+                           if item not in known or not modified or known[item]['modified'] != modified]
+                fetched = self.fetch_rows(changed, executor, cancelled)
+            stations = {}
+            for item, modified in listed.items():
+                if item in fetched:
+                    stations[item] = {'modified': modified, 'rows': [list(row) for row in fetched[item]]}
+                else:
+                    stations[item] = known[item]
+            _write_json(self.cache_path, {'format': CACHE_FORMAT, 'query': query_key(WIKIDATA_DETAILS_QUERY),
+                                          'refreshed': time.time(), 'items': stations})
+            self.stats = HarvestStats(len(stations), len(changed), len(stations) - len(changed),
+                                      len(set(known) - set(listed)), False)
+        rows = [tuple(row) for station in stations.values() for row in station['rows']]
+        rows.sort(key=lambda row: (row[0], row[4]))
+        return rows